@@ -0,0 +1,202 @@
+# agregados.py - Agregados por hora e por dia das leituras de cada lote
+
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, and_, select
+
+from extensions import db
+from ingestao import COLUNAS_LEITURA, converter_data
+from models import Leitura, AgregadoHora, AgregadoDia
+
+GRANULARIDADES = {'hora': AgregadoHora, 'dia': AgregadoDia}
+METRICAS = ('temperatura', 'umidade', 'pressao')
+
+_POSICAO = {coluna: i for i, coluna in enumerate(COLUNAS_LEITURA)}
+
+# Formato de DateTime gravado pelo SQLAlchemy no SQLite
+_FORMATO_SQLITE = {'hora': '%Y-%m-%d %H:00:00.000000', 'dia': '%Y-%m-%d 00:00:00.000000'}
+
+
+def inicio_do_intervalo(data, granularidade):
+    if granularidade == 'hora':
+        return data.replace(minute=0, second=0, microsecond=0)
+    return data.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _agregado_vazio(lote, inicio):
+    valores = {'lote': lote, 'inicio': inicio, 'quantidade': 0}
+    for metrica in METRICAS:
+        valores.update({
+            f'{metrica}_n': 0,
+            f'{metrica}_soma': 0.0,
+            f'{metrica}_soma_q': 0.0,
+            f'{metrica}_min': None,
+            f'{metrica}_max': None
+        })
+    return valores
+
+
+def acumular(linhas, granularidade):
+    """
+    Agrega em memória as tuplas de leitura (ordem de COLUNAS_LEITURA) por
+    (lote, início do intervalo). Leituras sem lote ou sem data_inicial ficam de fora.
+    """
+    parciais = {}
+    i_lote = _POSICAO['lote']
+    i_data = _POSICAO['data_inicial']
+
+    for linha in linhas:
+        lote, data = linha[i_lote], linha[i_data]
+        if lote is None or data is None:
+            continue
+
+        chave = (lote, inicio_do_intervalo(data, granularidade))
+        agregado = parciais.get(chave)
+        if agregado is None:
+            agregado = parciais[chave] = _agregado_vazio(*chave)
+
+        agregado['quantidade'] += 1
+        for metrica in METRICAS:
+            valor = linha[_POSICAO[metrica]]
+            if valor is None:
+                continue
+            agregado[f'{metrica}_n'] += 1
+            agregado[f'{metrica}_soma'] += valor
+            agregado[f'{metrica}_soma_q'] += valor * valor
+            menor = agregado[f'{metrica}_min']
+            maior = agregado[f'{metrica}_max']
+            agregado[f'{metrica}_min'] = valor if menor is None else min(menor, valor)
+            agregado[f'{metrica}_max'] = valor if maior is None else max(maior, valor)
+
+    return parciais
+
+
+def atualizar_agregados(linhas):
+    """
+    Soma as leituras recém-inseridas aos agregados, na transação da sessão atual
+    (INSERT ... ON CONFLICT DO UPDATE, um comando por granularidade)
+    """
+    for granularidade, modelo in GRANULARIDADES.items():
+        parciais = acumular(linhas, granularidade)
+        if parciais:
+            _mesclar(modelo, list(parciais.values()))
+
+
+def _mesclar(modelo, valores):
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        menor, maior = func.least, func.greatest
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        menor, maior = func.min, func.max
+
+    comando = insert(modelo.__table__).values(valores)
+    atual = modelo.__table__.c
+    novo = comando.excluded
+
+    somar = ['quantidade'] + [f'{m}_{s}' for m in METRICAS for s in ('n', 'soma', 'soma_q')]
+    alteracoes = {coluna: atual[coluna] + novo[coluna] for coluna in somar}
+
+    for metrica in METRICAS:
+        for sufixo, funcao in (('min', menor), ('max', maior)):
+            coluna = f'{metrica}_{sufixo}'
+            # coalesce nos dois lados para que um NULL não apague o valor existente
+            alteracoes[coluna] = funcao(
+                func.coalesce(atual[coluna], novo[coluna]),
+                func.coalesce(novo[coluna], atual[coluna])
+            )
+
+    db.session.execute(comando.on_conflict_do_update(
+        index_elements=['lote', 'inicio'],
+        set_=alteracoes
+    ))
+
+
+def _expressao_intervalo(granularidade):
+    if db.engine.dialect.name == 'postgresql':
+        return func.date_trunc('hour' if granularidade == 'hora' else 'day', Leitura.data_inicial)
+    return func.strftime(_FORMATO_SQLITE[granularidade], Leitura.data_inicial)
+
+
+def reconstruir_agregados(lote=None, desde=None, ate=None):
+    """
+    Recalcula a partir das leituras brutas os agregados dos dias entre 'desde' e
+    'ate' (inteiros), para um lote ou todos. O commit fica a cargo de quem chama.
+    """
+    inicio = inicio_do_intervalo(desde, 'dia') if desde else None
+    fim = inicio_do_intervalo(ate, 'dia') + timedelta(days=1) if ate else None
+
+    for granularidade, modelo in GRANULARIDADES.items():
+        apagar = modelo.query
+        if lote is not None:
+            apagar = apagar.filter(modelo.lote == lote)
+        if inicio:
+            apagar = apagar.filter(modelo.inicio >= inicio)
+        if fim:
+            apagar = apagar.filter(modelo.inicio < fim)
+        apagar.delete(synchronize_session=False)
+
+        intervalo = _expressao_intervalo(granularidade).label('inicio')
+        colunas = [Leitura.lote, intervalo, func.count(Leitura.id)]
+        nomes = ['lote', 'inicio', 'quantidade']
+        for metrica in METRICAS:
+            campo = getattr(Leitura, metrica)
+            colunas += [func.count(campo), func.coalesce(func.sum(campo), 0.0),
+                        func.coalesce(func.sum(campo * campo), 0.0), func.min(campo), func.max(campo)]
+            nomes += [f'{metrica}_n', f'{metrica}_soma', f'{metrica}_soma_q', f'{metrica}_min', f'{metrica}_max']
+
+        filtros = [Leitura.lote.isnot(None), Leitura.data_inicial.isnot(None)]
+        if lote is not None:
+            filtros.append(Leitura.lote == lote)
+        if inicio:
+            filtros.append(Leitura.data_inicial >= inicio)
+        if fim:
+            filtros.append(Leitura.data_inicial < fim)
+
+        consulta = select(*colunas).where(and_(*filtros)).group_by(Leitura.lote, intervalo)
+        db.session.execute(modelo.__table__.insert().from_select(nomes, consulta))
+
+
+def reconstruir_dia_da_leitura(lote, data_inicial):
+    """
+    Recalcula os agregados do dia de uma leitura alterada ou removida
+    """
+    data_inicial = converter_data(data_inicial)
+    if lote is None or data_inicial is None:
+        return
+    reconstruir_agregados(lote, data_inicial, data_inicial)
+
+
+agregados_cli = AppGroup('agregados', help='Mantém as tabelas leituras_hourly e leituras_daily.')
+
+
+@agregados_cli.command('reconstruir')
+@click.option('--lote', default=None, help='Reconstrói apenas este lote.')
+@click.option('--desde', default=None, help='Data ISO inicial (padrão: primeira leitura).')
+@click.option('--ate', default=None, help='Data ISO final (padrão: última leitura).')
+def reconstruir_command(lote, desde, ate):
+    """Recalcula os agregados a partir das leituras, um mês por transação."""
+    desde = converter_data(desde)
+    ate = converter_data(ate)
+
+    if desde is None or ate is None:
+        menor, maior = db.session.query(
+            func.min(Leitura.data_inicial), func.max(Leitura.data_inicial)
+        ).one()
+        desde = desde or menor
+        ate = ate or maior
+
+    if desde is None:
+        click.echo('Nenhuma leitura encontrada.')
+        return
+
+    atual = inicio_do_intervalo(desde, 'dia')
+    while atual <= ate:
+        proximo = datetime(atual.year + atual.month // 12, atual.month % 12 + 1, 1)
+        fim = min(proximo - timedelta(days=1), ate)
+        reconstruir_agregados(lote, atual, fim)
+        db.session.commit()
+        click.echo(f'Agregados reconstruídos de {atual:%Y-%m-%d} a {fim:%Y-%m-%d}')
+        atual = proximo
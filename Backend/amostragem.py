@@ -0,0 +1,119 @@
+# amostragem.py - Redução de séries de leituras para os gráficos do dashboard
+
+import numpy as np
+
+SERIES_LEITURA = ('temperatura', 'umidade', 'pressao')
+METODOS = ('lttb', 'minmax')
+
+
+def lttb(x, y, pontos):
+    """
+    Largest-Triangle-Three-Buckets: devolve os índices dos pontos escolhidos.
+    x deve estar ordenado. As médias dos buckets são calculadas de uma vez com
+    somas acumuladas; só a escolha do ponto depende do bucket anterior.
+    """
+    n = len(x)
+    if pontos >= n:
+        return np.arange(n)
+    if pontos < 3:
+        # Sem bucket intermediário: o primeiro ponto e, com 2, o último
+        return np.array([0, n - 1][:pontos])
+
+    # pontos - 2 buckets entre o primeiro e o último ponto
+    bordas = np.floor(np.linspace(1, n - 1, pontos - 1)).astype(np.int64)
+    inicios = bordas[:-1]
+    fins = bordas[1:]
+
+    soma_x = np.concatenate(([0.0], np.cumsum(x)))
+    soma_y = np.concatenate(([0.0], np.cumsum(y)))
+
+    # Média do bucket seguinte de cada bucket (o último usa o ponto final)
+    prox_inicios = np.append(inicios[1:], n - 1)
+    prox_fins = np.append(fins[1:], n)
+    tamanhos = prox_fins - prox_inicios
+    media_x = (soma_x[prox_fins] - soma_x[prox_inicios]) / tamanhos
+    media_y = (soma_y[prox_fins] - soma_y[prox_inicios]) / tamanhos
+
+    indices = np.empty(pontos, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+
+    for i in range(pontos - 2):
+        bx = x[inicios[i]:fins[i]]
+        by = y[inicios[i]:fins[i]]
+        areas = np.abs((x[a] - media_x[i]) * (by - y[a]) - (x[a] - bx) * (media_y[i] - y[a]))
+        a = inicios[i] + int(np.argmax(areas))
+        indices[i + 1] = a
+
+    return indices
+
+
+def buckets_min_max(x, y, buckets):
+    """
+    Agrupa os pontos em buckets de tempo de mesma largura e devolve
+    (início do bucket, mínimo, máximo, média, contagem) por bucket não vazio
+    """
+    n = len(x)
+    if n == 0:
+        vazio = np.array([])
+        return vazio, vazio, vazio, vazio, vazio.astype(np.int64)
+
+    inicio, fim = x[0], x[-1]
+    largura = (fim - inicio) / buckets if fim > inicio else 1.0
+    ids = np.minimum(((x - inicio) // largura).astype(np.int64), buckets - 1)
+
+    cortes = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+    contagens = np.diff(np.append(cortes, n))
+
+    return (
+        inicio + ids[cortes] * largura,
+        np.minimum.reduceat(y, cortes),
+        np.maximum.reduceat(y, cortes),
+        np.add.reduceat(y, cortes) / contagens,
+        contagens
+    )
+
+
+def _datas_iso(ms):
+    return np.datetime_as_string(np.asarray(ms, dtype=np.int64).astype('datetime64[ms]'), unit='s').tolist()
+
+
+def reduzir_series(linhas, pontos, metodo='lttb'):
+    """
+    Recebe linhas (data_inicial, temperatura, umidade, pressao) ordenadas por data
+    e devolve cada série com no máximo 'pontos' pontos
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método inválido: {metodo}. Use {', '.join(METODOS)}")
+
+    if not linhas:
+        colunas = [[] for _ in range(len(SERIES_LEITURA) + 1)]
+    else:
+        colunas = list(zip(*linhas))
+
+    tempos = np.array(colunas[0], dtype='datetime64[ms]').astype(np.int64).astype(np.float64)
+    series = {}
+
+    for nome, valores in zip(SERIES_LEITURA, colunas[1:]):
+        y = np.array(valores, dtype=np.float64)
+        validos = np.isfinite(y)
+        x, y = tempos[validos], y[validos]
+
+        if metodo == 'lttb':
+            indices = lttb(x, y, pontos)
+            series[nome] = {
+                't': _datas_iso(x[indices]),
+                'v': y[indices].tolist()
+            }
+        else:
+            inicios, minimos, maximos, medias, contagens = buckets_min_max(x, y, pontos)
+            series[nome] = {
+                't': _datas_iso(inicios),
+                'min': minimos.tolist(),
+                'max': maximos.tolist(),
+                'avg': medias.tolist(),
+                'count': contagens.tolist()
+            }
+
+    return series
@@ -0,0 +1,158 @@
+# anomalias.py - Detector contínuo de picos, sensores travados e deriva por lote
+
+import math
+from datetime import datetime
+
+from flask import current_app
+
+from extensions import db
+from ingestao import COLUNAS_LEITURA
+from models import EstadoAnomalia, AnomaliaLeitura
+
+METRICAS = ('temperatura', 'umidade', 'pressao')
+TIPOS = ('pico', 'travado', 'deriva')
+
+_POSICAO = {coluna: i for i, coluna in enumerate(COLUNAS_LEITURA)}
+
+
+def configuracao():
+    config = current_app.config
+    return {
+        'alfa': config['ANOMALIA_ALFA'],
+        'janela': config['ANOMALIA_JANELA'],
+        'aquecimento': config['ANOMALIA_AQUECIMENTO'],
+        'k_pico': config['ANOMALIA_K_PICO'],
+        'k_deriva': config['ANOMALIA_K_DERIVA'],
+        'travado_n': config['ANOMALIA_TRAVADO_N']
+    }
+
+
+def avaliar(estado, valor, cfg):
+    """
+    Compara 'valor' com o histórico do estado e em seguida o incorpora.
+    Devolve a lista de (tipo, referencia, escore) detectados.
+
+    - pico: distância à EWMA acima de k_pico desvios padrão exponenciais
+    - travado: travado_n valores idênticos seguidos (marcado uma vez por sequência)
+    - deriva: EWMA afastada da média de longo prazo (Welford) por mais de
+      k_deriva desvios padrão (marcado ao entrar na deriva)
+    """
+    anomalias = []
+    aquecido = estado.n >= cfg['aquecimento']
+
+    if aquecido and estado.ewm_var > 0:
+        escore = abs(valor - estado.ewma) / math.sqrt(estado.ewm_var)
+        if escore > cfg['k_pico']:
+            anomalias.append(('pico', estado.ewma, escore))
+
+    if estado.ultimo is not None and valor == estado.ultimo:
+        estado.repeticoes += 1
+        if estado.repeticoes + 1 == cfg['travado_n']:
+            anomalias.append(('travado', estado.ultimo, float(cfg['travado_n'])))
+    else:
+        estado.repeticoes = 0
+    estado.ultimo = valor
+
+    _atualizar_welford(estado, valor, cfg['janela'])
+    _atualizar_ewma(estado, valor, cfg['alfa'])
+
+    if aquecido and estado.n > 1 and estado.m2 > 0:
+        escore = abs(estado.ewma - estado.media) / math.sqrt(estado.m2 / (estado.n - 1))
+        em_deriva = escore > cfg['k_deriva']
+        if em_deriva and not estado.em_deriva:
+            anomalias.append(('deriva', estado.media, escore))
+        estado.em_deriva = em_deriva
+
+    return anomalias
+
+
+def _atualizar_welford(estado, valor, janela):
+    # Welford com janela efetiva: passado o tamanho da janela, n deixa de crescer
+    # e m2 perde o peso de uma amostra, aproximando uma média móvel em O(1)
+    if estado.n >= janela:
+        estado.m2 *= (janela - 1) / janela
+    n = min(estado.n + 1, janela)
+
+    delta = valor - estado.media
+    estado.media += delta / n
+    estado.m2 += delta * (valor - estado.media)
+    estado.n = n
+
+
+def _atualizar_ewma(estado, valor, alfa):
+    if estado.ewma is None:
+        estado.ewma = valor
+        estado.ewm_var = 0.0
+        return
+
+    diferenca = valor - estado.ewma
+    incremento = alfa * diferenca
+    estado.ewma += incremento
+    estado.ewm_var = (1 - alfa) * (estado.ewm_var + diferenca * incremento)
+
+
+def _carregar_estados(lotes):
+    """
+    Estados dos lotes, criados se ainda não existem e travados até o commit
+    (no PostgreSQL), para que duas requisições simultâneas do mesmo lote não se percam
+    """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    db.session.execute(insert(EstadoAnomalia.__table__).values([
+        {'lote': lote, 'metrica': metrica, 'n': 0, 'media': 0.0, 'm2': 0.0,
+         'ewm_var': 0.0, 'repeticoes': 0, 'em_deriva': False}
+        for lote in lotes for metrica in METRICAS
+    ]).on_conflict_do_nothing(index_elements=['lote', 'metrica']))
+
+    # Ordem fixa de travamento evita deadlock entre requisições concorrentes
+    estados = EstadoAnomalia.query.filter(
+        EstadoAnomalia.lote.in_(lotes)
+    ).order_by(EstadoAnomalia.lote, EstadoAnomalia.metrica).with_for_update().all()
+    return {(e.lote, e.metrica): e for e in estados}
+
+
+def detectar_anomalias(linhas):
+    """
+    Passa as tuplas recém-inseridas (ordem de COLUNAS_LEITURA) pelo detector,
+    em ordem de data_inicial, gravando as anomalias e o novo estado na
+    transação da sessão atual. Retorna a quantidade de anomalias.
+    """
+    i_lote, i_data = _POSICAO['lote'], _POSICAO['data_inicial']
+    linhas = [linha for linha in linhas if linha[i_lote] is not None]
+    if not linhas:
+        return 0
+
+    cfg = configuracao()
+    estados = _carregar_estados(sorted({linha[i_lote] for linha in linhas}))
+    agora = datetime.utcnow()
+
+    # Sem data_inicial, a leitura conta como a mais recente do lote
+    ordenadas = sorted(linhas, key=lambda linha: (linha[i_data] is None, linha[i_data] or agora))
+
+    anomalias = []
+    for linha in ordenadas:
+        for metrica in METRICAS:
+            valor = linha[_POSICAO[metrica]]
+            if valor is None:
+                continue
+
+            estado = estados[(linha[i_lote], metrica)]
+            for tipo, referencia, escore in avaliar(estado, valor, cfg):
+                anomalias.append({
+                    'lote': linha[i_lote],
+                    'data_inicial': linha[i_data],
+                    'metrica': metrica,
+                    'tipo': tipo,
+                    'valor': valor,
+                    'referencia': referencia,
+                    'escore': escore,
+                    'criado_em': agora
+                })
+            estado.atualizado_em = agora
+
+    if anomalias:
+        db.session.execute(AnomaliaLeitura.__table__.insert(), anomalias)
+    return len(anomalias)
@@ -1,7 +1,9 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, g
+from flask import Flask, request, jsonify, render_template, redirect, url_for, g, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from werkzeug.security import generate_password_hash
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.middleware.proxy_fix import ProxyFix
 import jwt
 import datetime
 from functools import wraps
@@ -13,6 +15,7 @@ import secrets
 import os
 import json
 
+from sqlalchemy import func
 from sqlalchemy.sql import text
 from datetime import timedelta
 
@@ -22,7 +25,42 @@ from logging_utils import (
     log_acesso_tela, log_crud_operation, registrar_log_atividade
 )
 
-from models import User, Item, Leitura, Parametro, Log
+from models import (User, Item, Leitura, Parametro, Log, AlarmeLeitura, AnomaliaLeitura, EstadoAnomalia,
+                    Dispositivo)
+from log_sink import log_sink
+from ingestao import (normalizar_leituras, inserir_leituras, converter_data, formato_aceito,
+                      decodificar_corpo, converter_numero, CAMPOS_NUMERICOS)
+from paginacao import codificar_cursor, aplicar_cursor, ordenar_recentes, obter_limite
+from amostragem import reduzir_series
+from exportacao import (consulta_exportacao, gerar_ndjson, gerar_json, arrow_disponivel,
+                        FORMATOS_COLUNARES, GERADORES_COLUNARES)
+import auth_cache
+import cache_parametros
+import idempotencia
+import compressao
+import lote_offline
+import dispositivos
+import login
+import revogacao
+from dispositivos import registro_dispositivos, gerar_chave, eh_chave_dispositivo, autenticar_chave
+from lote_offline import (validar_bloco, travar_sequencia, bloco_recebido, confirmar_bloco,
+                          resumo_sequencia, consultar_sequencia, rejeitar_bloco)
+from compressao import comprimir
+from revogacao import revogacao_cli, token_revogado, revogar_token
+from login import (pool_verificacao, VerificacaoIndisponivel, espera_tentativa, registrar_falha,
+                   registrar_sucesso, retry_after)
+from idempotencia import reservar_chave, registrar_resposta
+from cache_parametros import listar_empresas, listar_lotes, invalidar_parametros, registro_parametros
+from auth_cache import obter_usuario_autenticado
+from particoes import particoes_cli
+from transmissao import hub_leituras, gerar_eventos
+from versoes import condicional
+from desvios import registrar_alarmes
+from anomalias import detectar_anomalias
+from agregados import (
+    agregados_cli, atualizar_agregados, reconstruir_dia_da_leitura,
+    inicio_do_intervalo, GRANULARIDADES
+)
 
 # Obtenha o caminho absoluto do diretório onde app.py está (Backend/)
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -38,14 +76,39 @@ CORS(app)
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Content-Encoding,Authorization,Last-Event-ID,If-None-Match,Idempotency-Key')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+    response.headers.add('Access-Control-Expose-Headers', 'ETag,Idempotent-Replayed')
     return response
 
 app.config.from_object(Config)
 
+# Atrás de N proxies reversos, remote_addr passa a ser o IP informado por eles
+# em X-Forwarded-For; sem proxy configurado o cabeçalho é ignorado
+if app.config['PROXY_CONFIAVEIS']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_CONFIAVEIS'],
+                            x_proto=app.config['PROXY_CONFIAVEIS'])
+
 db.init_app(app)
 migrate.init_app(app, db)
+log_sink.init_app(app)
+auth_cache.init_app(app)
+cache_parametros.init_app(app)
+idempotencia.init_app(app)
+compressao.init_app(app)
+lote_offline.init_app(app)
+dispositivos.init_app(app)
+login.init_app(app)
+revogacao.init_app(app)
+hub_leituras.init_app(app)
+
+# Registro de parâmetros já carregado ao atender a primeira requisição
+with app.app_context():
+    cache_parametros.aquecer()
+
+app.cli.add_command(particoes_cli)
+app.cli.add_command(agregados_cli)
+app.cli.add_command(revogacao_cli)
 
 # Configuração do Swagger
 swagger_template = {
@@ -125,7 +188,17 @@ def token_required(f):
             return jsonify({'message': 'Token is missing!'}), 401
         
         try:
-            current_user = User.verify_auth_token(token, app.config['JWT_SECRET_KEY'])
+            if eh_chave_dispositivo(token):
+                # Chave de dispositivo: HMAC contra o registro em memória, sem login
+                current_user = autenticar_chave(token)
+            else:
+                # Usuário vem do cache do processo; o banco só é consultado na falta
+                data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+                # Revogação (logout) conferida em memória: filtro de Bloom + conjunto exato
+                if token_revogado(data):
+                    return jsonify({'message': 'Token has been revoked!'}), 401
+                current_user = obter_usuario_autenticado(data['id'])
+                g.token_dados = data
             if not current_user:
                 return jsonify({'message': 'Token is invalid!'}), 401
             
@@ -273,6 +346,10 @@ def api_login():
         description: Campos obrigatórios faltando
       401:
         description: Credenciais inválidas
+      429:
+        description: Muitas tentativas (por IP ou por usuário); ver Retry-After
+      503:
+        description: Verificação de senha sobrecarregada; ver Retry-After
     """
     data = request.get_json()
     
@@ -280,12 +357,30 @@ def api_login():
         log_login_attempt('', False, 'campos_faltando')
         return jsonify({'message': 'Missing username or password!'}), 400
     
+    # Limite checado antes da consulta e do hash: tentativa barrada não custa CPU
+    # remote_addr já é o IP do cliente quando PROXY_CONFIAVEIS > 0 (ProxyFix);
+    # cabeçalhos enviados pelo próprio cliente não escolhem o balde
+    espera = espera_tentativa(request.remote_addr, data['username'])
+    if espera:
+        log_login_attempt(data['username'], False, 'limite_tentativas')
+        return jsonify({'message': 'Muitas tentativas de login, tente novamente mais tarde'}), 429, {
+            'Retry-After': retry_after(espera)
+        }
+    
     user = User.query.filter_by(username=data['username']).first()
     
-    if not user or not user.check_password(data['password']):
+    try:
+        senha_valida = pool_verificacao.verificar(user.password_hash if user else None, data['password'])
+    except VerificacaoIndisponivel:
+        log_login_attempt(data['username'], False, 'verificacao_indisponivel')
+        return jsonify({'message': 'Serviço de login sobrecarregado, tente novamente'}), 503, {'Retry-After': '1'}
+    
+    if not senha_valida:
+        registrar_falha(data['username'])
         log_login_attempt(data['username'], False, 'credenciais_invalidas')
         return jsonify({'message': 'Invalid username or password!'}), 401
     
+    registrar_sucesso(data['username'])
     token = user.generate_auth_token(app.config['JWT_SECRET_KEY'])
     log_login_attempt(data['username'], True)
     
@@ -304,49 +399,113 @@ def api_logout(current_user):
       - Bearer: []
     responses:
       200:
-        description: Logout realizado com sucesso
+        description: Logout realizado com sucesso; o token deixa de ser aceito
     """
+    dados = g.get('token_dados')
+    if dados is not None and revogar_token(dados):
+        db.session.commit()
     log_logout(current_user)
     return jsonify({'message': 'Logout realizado com sucesso'}), 200
 
+def ler_corpo_leituras():
+    """
+    Corpo de um envio de leituras em JSON, MessagePack ou CBOR (já descomprimido
+    pelo middleware de compressao.py); None para outros tipos de conteúdo
+    """
+    if request.is_json:
+        return request.get_json()
+    if formato_aceito(request.mimetype):
+        # MessagePack/CBOR: mesmo caminho do JSON, inclusive o lote colunar
+        return decodificar_corpo(request.mimetype, request.get_data())
+    return None
+
+def gravar_leituras(linhas):
+    """
+    Insere as tuplas e atualiza agregados, alarmes e anomalias, na transação
+    da sessão atual. Reenvios não são inseridos de novo nem recontados:
+    depois da inserção o processamento segue só com as leituras novas.
+    """
+    novas = inserir_leituras(linhas)
+    atualizar_agregados(novas)
+    return {
+        'quantidade': len(novas),
+        'duplicadas': len(linhas) - len(novas),
+        'alarmes': registrar_alarmes(novas),
+        'anomalias': detectar_anomalias(novas)
+    }
+
 @app.route('/api/leituras', methods=['POST'])
 @token_required
 @log_activity("CRIAR_LEITURAS")
 def api_criar_leitura(current_user):
     """
     Criar novas leituras de embrião (suporte a múltiplas leituras)
+    ---
+    tags:
+      - Leituras
+    consumes:
+      - application/json
+      - application/msgpack
+      - application/cbor
+    parameters:
+      - in: body
+        name: leituras
+        description: >
+          Um objeto, uma lista de objetos ou um lote colunar
+          ({"lote": "L1", "temperatura": [...], "umidade": [...], "data_inicial": [...]}).
+          Datas podem vir em ISO 8601 ou em segundos desde a época (UTC)
+      - in: header
+        name: Idempotency-Key
+        type: string
+        description: >
+          Opcional. Repetir a requisição com a mesma chave (até IDEMPOTENCIA_TTL
+          segundos depois) devolve a resposta original sem inserir nada
+    responses:
+      201:
+        description: >
+          {quantidade, duplicadas, alarmes, anomalias}. Leituras que repetem
+          (lote, sensor, data_inicial) de uma já gravada contam em duplicadas.
+          Respostas repetidas pela Idempotency-Key trazem Idempotent-Replayed: true
+      400:
+        description: Dados inválidos
     """
     try:
-        if not request.is_json:
-            return jsonify({'message': 'O corpo da requisição deve ser JSON'}), 400
-            
-        data = request.get_json()
+        data = ler_corpo_leituras()
+        if data is None:
+            return jsonify({'message': 'O corpo da requisição deve ser JSON, MessagePack ou CBOR'}), 400
         
-        if not isinstance(data, list):
-            data = [data]
+        # Validação em memória e inserção em lote (COPY no PostgreSQL para lotes grandes)
+        linhas = normalizar_leituras(data)
         
-        leituras = []
-        for item in data:
-            nova = Leitura(
-                umidade=item.get('umidade'),
-                temperatura=item.get('temperatura'),
-                pressao=item.get('pressao'),
-                lote=item.get('lote'),
-                data_inicial=item.get('data_inicial'),
-                data_final=item.get('data_final')
-            )
-            leituras.append(nova)
+        chave = request.headers.get('Idempotency-Key')
+        if chave:
+            anterior = reservar_chave(current_user.id, chave)
+            if anterior is not None:
+                db.session.rollback()
+                corpo, status_code = anterior
+                response = jsonify(corpo)
+                response.status_code = status_code
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+        
+        resultado = gravar_leituras(linhas)
         
-        db.session.add_all(leituras)
+        corpo = {'message': f"{resultado['quantidade']} leituras criadas com sucesso", **resultado}
+        if chave:
+            registrar_resposta(current_user.id, chave, corpo, 201)
         db.session.commit()
         
-        log_crud_operation(current_user, 'leituras', 'CREATE_BATCH', dados={'quantidade': len(leituras)})
+        # Acorda os assinantes de /api/leituras/stream (todos os workers no PostgreSQL)
+        if resultado['quantidade']:
+            hub_leituras.publicar()
         
-        return jsonify({
-            'message': f'{len(leituras)} leituras criadas com sucesso',
-            'quantidade': len(leituras)
-        }), 201
+        log_crud_operation(current_user, 'leituras', 'CREATE_BATCH', dados=resultado)
+        
+        return jsonify(corpo), 201
         
+    except RequestEntityTooLarge as e:
+        db.session.rollback()
+        return jsonify({'message': e.description}), 413
     except Exception as e:
         db.session.rollback()
         log_crud_operation(current_user, 'leituras', 'CREATE_FAILED', dados={'erro': str(e)})
@@ -355,28 +514,690 @@ def api_criar_leitura(current_user):
 @app.route('/api/leituras', methods=['GET'])
 @token_required
 @log_activity("LISTAR_LEITURAS")
+@comprimir
+@condicional('leituras')
 def api_listar_leituras(current_user):
     """
-    Listar todas as leituras de embriões
+    Listar leituras de embriões (paginação por cursor)
+    ---
+    tags:
+      - Leituras
+    parameters:
+      - in: query
+        name: lote
+        type: string
+      - in: query
+        name: desde
+        type: string
+        description: Data/hora ISO mínima de data_inicial (inclusiva)
+      - in: query
+        name: ate
+        type: string
+        description: Data/hora ISO máxima de data_inicial (inclusiva)
+      - in: query
+        name: limite
+        type: integer
+        description: Tamanho da página (limitado a LEITURAS_LIMITE_MAX)
+      - in: query
+        name: cursor
+        type: string
+        description: Valor de next_cursor da página anterior
+      - in: query
+        name: stream
+        type: integer
+        description: 1 para exportar todas as leituras em fluxo (sem limite)
+      - in: query
+        name: desde_id
+        type: string
+        description: >
+          Sincronização incremental: devolve só as leituras com id maior, em
+          ordem de id, como {leituras, desde_id, mais}. 'ultimo' devolve só a
+          marca inicial (o maior id gravado), sem leituras
+    produces:
+      - application/json
+      - application/x-ndjson
+    responses:
+      200:
+        description: >
+          Com limite ou cursor retorna {leituras, next_cursor}. Sem eles retorna
+          a lista simples com todas as leituras filtradas. Com stream=1 ou Accept
+          application/x-ndjson a exportação completa é enviada em fluxo.
+      304:
+        description: Nada mudou desde o ETag enviado em If-None-Match
+      400:
+        description: >
+          Parâmetros inválidos, ou lista simples com mais de LEITURAS_LIMITE_MAX
+          leituras (usar limite/cursor ou stream=1)
     """
     lote = request.args.get('lote')
+    paginado = 'limite' in request.args or 'cursor' in request.args
+    ndjson = request.accept_mimetypes.best == 'application/x-ndjson'
+    
+    if ndjson or request.args.get('stream') == '1':
+        return exportar_leituras_em_fluxo(lote, ndjson)
+    if 'desde_id' in request.args:
+        return sincronizar_leituras(lote)
+    
+    try:
+        limite = obter_limite(
+            request.args.get('limite'),
+            app.config['LEITURAS_LIMITE_PADRAO'] if paginado else app.config['LEITURAS_LIMITE_MAX'],
+            app.config['LEITURAS_LIMITE_MAX']
+        )
+        desde = converter_data(request.args.get('desde'))
+        ate = converter_data(request.args.get('ate'))
+        
+        query = Leitura.query
+        
+        if lote:
+            query = query.filter(Leitura.lote == lote)
+        if desde:
+            query = query.filter(Leitura.data_inicial >= desde)
+        if ate:
+            query = query.filter(Leitura.data_inicial <= ate)
+        if request.args.get('cursor'):
+            query = aplicar_cursor(query, Leitura, request.args['cursor'])
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    # Busca uma linha a mais para saber se existe próxima página
+    leituras = ordenar_recentes(query, Leitura).limit(limite + 1).all()
+    
+    next_cursor = None
+    if len(leituras) > limite:
+        leituras = leituras[:limite]
+        next_cursor = codificar_cursor(leituras[-1].data_inicial, leituras[-1].id)
+    
+    itens = [l.to_dict() for l in leituras]
+    
+    if paginado:
+        return jsonify({'leituras': itens, 'next_cursor': next_cursor}), 200
+    
+    # A lista simples não tem onde indicar que faltam linhas: em vez de cortá-la
+    # em silêncio, o cliente é mandado para a paginação ou a exportação em fluxo
+    if next_cursor:
+        return jsonify({
+            'message': f"Mais de {limite} leituras: use 'limite'/'cursor' ou stream=1",
+            'limite_max': limite,
+            'next_cursor': next_cursor
+        }), 400
+    
+    return jsonify(itens), 200
+
+def sincronizar_leituras(lote):
+    """
+    Leituras inseridas depois da marca d'água 'desde_id' do cliente. A resposta
+    traz a nova marca em 'desde_id' e 'mais' indica se há outra página.
+    """
+    if request.args['desde_id'] == 'ultimo':
+        # Marca inicial do cliente, que carrega o estado atual por outras rotas.
+        # O maior id da tabela serve para qualquer lote e sai direto da chave primária
+        maior_id = db.session.query(func.max(Leitura.id)).scalar() or 0
+        return jsonify({'leituras': [], 'desde_id': maior_id, 'mais': False}), 200
+    
+    try:
+        desde_id = int(request.args['desde_id'])
+    except ValueError:
+        return jsonify({'message': 'desde_id deve ser um número inteiro'}), 400
     
-    query = Leitura.query
+    try:
+        limite = obter_limite(
+            request.args.get('limite'),
+            app.config['LEITURAS_LIMITE_MAX'],
+            app.config['LEITURAS_LIMITE_MAX']
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     
+    query = Leitura.query.filter(Leitura.id > desde_id)
     if lote:
         query = query.filter(Leitura.lote == lote)
     
-    leituras = query.order_by(Leitura.data_inicial.desc()).all()
+    leituras = query.order_by(Leitura.id.asc()).limit(limite + 1).all()
+    mais = len(leituras) > limite
+    leituras = leituras[:limite]
+    
+    return jsonify({
+        'leituras': [l.to_dict() for l in leituras],
+        'desde_id': leituras[-1].id if leituras else desde_id,
+        'mais': mais
+    }), 200
+
+def exportar_leituras_em_fluxo(lote, ndjson):
+    """
+    Resposta em fluxo com todas as leituras filtradas, lidas por cursor no servidor
+    """
+    try:
+        desde = converter_data(request.args.get('desde'))
+        ate = converter_data(request.args.get('ate'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    query = consulta_exportacao(lote, desde, ate)
     
-    return jsonify([{
-        'id': l.id,
-        'umidade': l.umidade,
-        'temperatura': l.temperatura,
-        'pressao': l.pressao,
-        'lote': l.lote,
-        'data_inicial': l.data_inicial.isoformat() if l.data_inicial else None,
-        'data_final': l.data_final.isoformat() if l.data_final else None
-    } for l in leituras]), 200
+    if ndjson:
+        return Response(stream_with_context(gerar_ndjson(query)), mimetype='application/x-ndjson')
+    return Response(stream_with_context(gerar_json(query)), mimetype='application/json')
+
+@app.route('/api/leituras/export', methods=['GET'])
+@token_required
+@log_activity("EXPORTAR_LEITURAS")
+@comprimir
+def api_exportar_leituras(current_user):
+    """
+    Exporta as leituras em formato colunar (Parquet, Arrow IPC) ou CSV
+    ---
+    tags:
+      - Leituras
+    parameters:
+      - in: query
+        name: formato
+        type: string
+        enum: [parquet, arrow, csv]
+        default: parquet
+      - in: query
+        name: lote
+        type: string
+      - in: query
+        name: desde
+        type: string
+      - in: query
+        name: ate
+        type: string
+    produces:
+      - application/vnd.apache.parquet
+      - application/vnd.apache.arrow.stream
+      - text/csv
+    responses:
+      200:
+        description: Arquivo enviado em fluxo, lido em blocos por cursor no servidor
+      400:
+        description: Formato ou parâmetros inválidos
+      501:
+        description: pyarrow não instalado no servidor
+    """
+    formato = request.args.get('formato', 'parquet')
+    if formato not in FORMATOS_COLUNARES:
+        return jsonify({'message': f"Formato inválido. Use: {', '.join(FORMATOS_COLUNARES)}"}), 400
+    if formato != 'csv' and not arrow_disponivel():
+        return jsonify({'message': f'Exportação {formato} indisponível: pyarrow não instalado'}), 501
+    
+    try:
+        desde = converter_data(request.args.get('desde'))
+        ate = converter_data(request.args.get('ate'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    query = consulta_exportacao(request.args.get('lote'), desde, ate)
+    mimetype, extensao = FORMATOS_COLUNARES[formato]
+    
+    return Response(
+        stream_with_context(GERADORES_COLUNARES[formato](query)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=leituras.{extensao}'}
+    )
+
+@app.route('/api/leituras/stream', methods=['GET'])
+@token_required
+@log_activity("STREAM_LEITURAS")
+def api_stream_leituras(current_user):
+    """
+    Leituras novas em tempo real (Server-Sent Events)
+    ---
+    tags:
+      - Leituras
+    parameters:
+      - in: query
+        name: lote
+        type: string
+      - in: header
+        name: Last-Event-ID
+        type: integer
+        description: Id do último evento recebido; as leituras perdidas são reenviadas
+      - in: query
+        name: desde_id
+        type: integer
+        description: Alternativa ao cabeçalho Last-Event-ID
+    produces:
+      - text/event-stream
+    responses:
+      200:
+        description: >
+          Eventos 'leitura' (id = id da leitura), comentários de heartbeat e, se
+          houver perdas demais para reenviar, um evento 'reset' com o desde_id
+          para ressincronizar via GET /api/leituras?desde_id=
+      400:
+        description: Last-Event-ID inválido
+    """
+    desde_id = request.headers.get('Last-Event-ID') or request.args.get('desde_id')
+    try:
+        desde_id = int(desde_id) if desde_id else None
+    except ValueError:
+        return jsonify({'message': 'Last-Event-ID deve ser um número inteiro'}), 400
+    
+    assinatura = hub_leituras.assinar(request.args.get('lote') or None)
+    
+    response = Response(stream_with_context(gerar_eventos(assinatura, desde_id)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Evita que o nginx acumule o fluxo em buffer
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/leituras/serie', methods=['GET'])
+@token_required
+@log_activity("SERIE_LEITURAS")
+@comprimir
+def api_serie_leituras(current_user):
+    """
+    Séries de temperatura, umidade e pressão reduzidas para gráficos
+    ---
+    tags:
+      - Leituras
+    parameters:
+      - in: query
+        name: lote
+        type: string
+      - in: query
+        name: pontos
+        type: integer
+        description: Máximo de pontos (ou buckets) por série
+      - in: query
+        name: metodo
+        type: string
+        enum: [lttb, minmax]
+      - in: query
+        name: desde
+        type: string
+      - in: query
+        name: ate
+        type: string
+    responses:
+      200:
+        description: Séries com no máximo 'pontos' pontos cada
+      400:
+        description: Parâmetros inválidos
+    """
+    lote = request.args.get('lote')
+    metodo = request.args.get('metodo', 'lttb')
+    
+    try:
+        pontos = obter_limite(
+            request.args.get('pontos'),
+            app.config['SERIE_PONTOS_PADRAO'],
+            app.config['SERIE_PONTOS_MAX'],
+            'pontos'
+        )
+        desde = converter_data(request.args.get('desde'))
+        ate = converter_data(request.args.get('ate'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    # Apenas as colunas necessárias, sem montar objetos ORM
+    query = db.session.query(
+        Leitura.data_inicial, Leitura.temperatura, Leitura.umidade, Leitura.pressao
+    ).filter(Leitura.data_inicial.isnot(None))
+    
+    if lote:
+        query = query.filter(Leitura.lote == lote)
+    if desde:
+        query = query.filter(Leitura.data_inicial >= desde)
+    if ate:
+        query = query.filter(Leitura.data_inicial <= ate)
+    
+    linhas = query.order_by(Leitura.data_inicial.asc()).all()
+    
+    try:
+        series = reduzir_series(linhas, pontos, metodo)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return jsonify({
+        'lote': lote,
+        'metodo': metodo,
+        'pontos': pontos,
+        'total': len(linhas),
+        'series': series
+    }), 200
+
+@app.route('/api/leituras/agregados/<granularidade>', methods=['GET'])
+@token_required
+@log_activity("AGREGADOS_LEITURAS")
+@comprimir
+def api_agregados_leituras(current_user, granularidade):
+    """
+    Agregados por hora ou por dia (min, max, média, desvio padrão e contagem)
+    ---
+    tags:
+      - Leituras
+    parameters:
+      - in: path
+        name: granularidade
+        type: string
+        enum: [hora, dia]
+        required: true
+      - in: query
+        name: lote
+        type: string
+      - in: query
+        name: desde
+        type: string
+      - in: query
+        name: ate
+        type: string
+      - in: query
+        name: limite
+        type: integer
+    responses:
+      200:
+        description: Lista de intervalos em ordem cronológica
+      400:
+        description: Parâmetros inválidos
+      404:
+        description: Granularidade desconhecida
+    """
+    modelo = GRANULARIDADES.get(granularidade)
+    if modelo is None:
+        return jsonify({'message': 'Granularidade deve ser hora ou dia'}), 404
+    
+    try:
+        limite = obter_limite(
+            request.args.get('limite'),
+            app.config['LEITURAS_LIMITE_MAX'],
+            app.config['LEITURAS_LIMITE_MAX']
+        )
+        desde = converter_data(request.args.get('desde'))
+        ate = converter_data(request.args.get('ate'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    query = modelo.query
+    lote = request.args.get('lote')
+    
+    if lote:
+        query = query.filter(modelo.lote == lote)
+    if desde:
+        query = query.filter(modelo.inicio >= inicio_do_intervalo(desde, granularidade))
+    if ate:
+        query = query.filter(modelo.inicio <= ate)
+    
+    agregados = query.order_by(modelo.inicio.asc(), modelo.lote.asc()).limit(limite).all()
+    
+    return jsonify([a.to_dict() for a in agregados]), 200
+
+@app.route('/api/leituras/alarmes', methods=['GET'])
+@token_required
+@log_activity("ALARMES_LEITURAS")
+@comprimir
+def api_alarmes_leituras(current_user):
+    """
+    Leituras fora da faixa ideal do parâmetro do lote
+    ---
+    tags:
+      - Leituras
+    parameters:
+      - in: query
+        name: lote
+        type: string
+      - in: query
+        name: metrica
+        type: string
+        enum: [temperatura, umidade, pressao]
+      - in: query
+        name: desde
+        type: string
+      - in: query
+        name: ate
+        type: string
+      - in: query
+        name: limite
+        type: integer
+    responses:
+      200:
+        description: Alarmes, dos mais recentes para os mais antigos
+      400:
+        description: Parâmetros inválidos
+    """
+    try:
+        limite = obter_limite(
+            request.args.get('limite'),
+            app.config['LEITURAS_LIMITE_PADRAO'],
+            app.config['LEITURAS_LIMITE_MAX']
+        )
+        desde = converter_data(request.args.get('desde'))
+        ate = converter_data(request.args.get('ate'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    query = AlarmeLeitura.query
+    lote = request.args.get('lote')
+    metrica = request.args.get('metrica')
+    
+    if lote:
+        query = query.filter(AlarmeLeitura.lote == lote)
+    if metrica:
+        query = query.filter(AlarmeLeitura.metrica == metrica)
+    if desde:
+        query = query.filter(AlarmeLeitura.data_inicial >= desde)
+    if ate:
+        query = query.filter(AlarmeLeitura.data_inicial <= ate)
+    
+    alarmes = query.order_by(
+        AlarmeLeitura.data_inicial.desc().nullsfirst(), AlarmeLeitura.id.desc()
+    ).limit(limite).all()
+    
+    return jsonify([a.to_dict() for a in alarmes]), 200
+
+@app.route('/api/leituras/anomalias', methods=['GET'])
+@token_required
+@log_activity("ANOMALIAS_LEITURAS")
+@comprimir
+def api_anomalias_leituras(current_user):
+    """
+    Picos, sensores travados e derivas detectados em relação ao histórico do lote
+    ---
+    tags:
+      - Leituras
+    parameters:
+      - in: query
+        name: lote
+        type: string
+      - in: query
+        name: metrica
+        type: string
+        enum: [temperatura, umidade, pressao]
+      - in: query
+        name: tipo
+        type: string
+        enum: [pico, travado, deriva]
+      - in: query
+        name: desde
+        type: string
+      - in: query
+        name: ate
+        type: string
+      - in: query
+        name: limite
+        type: integer
+    responses:
+      200:
+        description: >
+          {anomalias, estado}: anomalias das mais recentes para as mais antigas e
+          as estatísticas correntes do detector (média, desvio padrão, EWMA)
+      400:
+        description: Parâmetros inválidos
+    """
+    try:
+        limite = obter_limite(
+            request.args.get('limite'),
+            app.config['LEITURAS_LIMITE_PADRAO'],
+            app.config['LEITURAS_LIMITE_MAX']
+        )
+        desde = converter_data(request.args.get('desde'))
+        ate = converter_data(request.args.get('ate'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    query = AnomaliaLeitura.query
+    estados = EstadoAnomalia.query
+    lote = request.args.get('lote')
+    metrica = request.args.get('metrica')
+    tipo = request.args.get('tipo')
+    
+    if lote:
+        query = query.filter(AnomaliaLeitura.lote == lote)
+        estados = estados.filter(EstadoAnomalia.lote == lote)
+    if metrica:
+        query = query.filter(AnomaliaLeitura.metrica == metrica)
+        estados = estados.filter(EstadoAnomalia.metrica == metrica)
+    if tipo:
+        query = query.filter(AnomaliaLeitura.tipo == tipo)
+    if desde:
+        query = query.filter(AnomaliaLeitura.data_inicial >= desde)
+    if ate:
+        query = query.filter(AnomaliaLeitura.data_inicial <= ate)
+    
+    anomalias = query.order_by(
+        AnomaliaLeitura.data_inicial.desc().nullsfirst(), AnomaliaLeitura.id.desc()
+    ).limit(limite).all()
+    
+    return jsonify({
+        'anomalias': [a.to_dict() for a in anomalias],
+        'estado': [e.to_dict() for e in estados.order_by(EstadoAnomalia.lote, EstadoAnomalia.metrica)]
+    }), 200
+
+def recusar_bloco(current_user, dispositivo, seq, mensagem, status):
+    """
+    Resposta a um bloco de conteúdo inválido: o seq fica registrado como
+    rejeitado para a confirmação não parar nele (o dispositivo não o reenvia)
+    """
+    resumo = rejeitar_bloco(dispositivo, seq, current_user)
+    corpo = {'message': mensagem, 'seq': seq}
+    if resumo is not None:
+        corpo.update(status='rejeitado', **resumo)
+        log_crud_operation(current_user, 'leituras', 'REJECT_OFFLINE_BATCH',
+                          dados={'dispositivo': dispositivo, 'seq': seq, 'erro': mensagem})
+    return jsonify(corpo), status
+
+@app.route('/api/leituras/lote-offline', methods=['POST'])
+@token_required
+@log_activity("LOTE_OFFLINE_LEITURAS")
+def api_lote_offline(current_user):
+    """
+    Recebe um bloco numerado das leituras guardadas pelo dispositivo enquanto estava sem rede
+    ---
+    tags:
+      - Leituras
+    consumes:
+      - application/json
+      - application/msgpack
+      - application/cbor
+    parameters:
+      - in: body
+        name: bloco
+        description: >
+          {dispositivo, seq, leituras}. Com chave de dispositivo, 'dispositivo'
+          pode ser omitido (vale o nome do dispositivo autenticado). seq começa em 1 e cresce de um em um por
+          dispositivo; leituras aceita os formatos de POST /api/leituras (lista
+          ou lote colunar). Content-Encoding gzip/zstd é aceito.
+    responses:
+      201:
+        description: >
+          Bloco gravado. Traz {status, seq, quantidade, duplicadas, alarmes,
+          anomalias, confirmado, maior_recebido, faltando}: confirmado é o maior
+          seq até o qual nada falta e faltando lista os blocos a reenviar
+      200:
+        description: Bloco já recebido antes (status duplicado); nada é gravado
+      400:
+        description: >
+          Bloco inválido. Se o envelope (dispositivo, seq) é válido e só as
+          leituras não, o seq é registrado como rejeitado (status rejeitado)
+          e a resposta traz o estado da sequência, como no 201
+      403:
+        description: Dispositivo de outro usuário
+      413:
+        description: Bloco com mais de LOTE_OFFLINE_MAX_LEITURAS leituras (registrado como rejeitado)
+    """
+    try:
+        data = ler_corpo_leituras()
+        if data is None:
+            return jsonify({'message': 'O corpo da requisição deve ser JSON, MessagePack ou CBOR'}), 400
+        
+        dispositivo, seq, leituras = validar_bloco(data, getattr(current_user, 'dispositivo', None))
+        try:
+            linhas = normalizar_leituras(leituras)
+        except ValueError as e:
+            return recusar_bloco(current_user, dispositivo, seq, str(e), 400)
+        if len(linhas) > app.config['LOTE_OFFLINE_MAX_LEITURAS']:
+            return recusar_bloco(
+                current_user, dispositivo, seq,
+                f"O bloco deve ter até {app.config['LOTE_OFFLINE_MAX_LEITURAS']} leituras", 413
+            )
+        
+        sequencia = travar_sequencia(dispositivo, current_user)
+        if bloco_recebido(sequencia, seq):
+            # Confirmação perdida no caminho: o dispositivo reenviou um bloco já gravado
+            corpo = {'status': 'duplicado', 'seq': seq, **resumo_sequencia(sequencia)}
+            db.session.commit()
+            return jsonify(corpo), 200
+        
+        resultado = gravar_leituras(linhas)
+        confirmar_bloco(sequencia, seq, len(linhas))
+        corpo = {'status': 'aceito', 'seq': seq, **resultado, **resumo_sequencia(sequencia)}
+        db.session.commit()
+        
+        if resultado['quantidade']:
+            hub_leituras.publicar()
+        
+        log_crud_operation(current_user, 'leituras', 'CREATE_OFFLINE_BATCH',
+                          dados={'dispositivo': dispositivo, 'seq': seq, **resultado})
+        
+        return jsonify(corpo), 201
+    
+    except PermissionError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 403
+    except RequestEntityTooLarge as e:
+        db.session.rollback()
+        return jsonify({'message': e.description}), 413
+    except Exception as e:
+        db.session.rollback()
+        log_crud_operation(current_user, 'leituras', 'CREATE_FAILED', dados={'erro': str(e)})
+        return jsonify({'message': f'Erro ao processar o bloco: {str(e)}'}), 400
+
+@app.route('/api/leituras/lote-offline', methods=['GET'])
+@token_required
+@log_activity("ESTADO_LOTE_OFFLINE")
+def api_estado_lote_offline(current_user):
+    """
+    Estado do envio em blocos de um dispositivo, para retomar após reinício
+    ---
+    tags:
+      - Leituras
+    parameters:
+      - in: query
+        name: dispositivo
+        type: string
+        required: true
+    responses:
+      200:
+        description: "{dispositivo, confirmado, maior_recebido, faltando}"
+      400:
+        description: Dispositivo não informado
+      403:
+        description: Dispositivo de outro usuário
+    """
+    autenticado = getattr(current_user, 'dispositivo', None)
+    dispositivo = request.args.get('dispositivo', autenticado or '').strip()
+    if not dispositivo:
+        return jsonify({'message': "Informe o parâmetro 'dispositivo'"}), 400
+    if autenticado is not None and dispositivo != autenticado:
+        return jsonify({'message': 'A chave usada não pertence a este dispositivo'}), 403
+    
+    try:
+        return jsonify(consultar_sequencia(dispositivo, current_user)), 200
+    except PermissionError as e:
+        return jsonify({'message': str(e)}), 403
 
 @app.route('/api/leituras/<int:leitura_id>', methods=['PUT'])
 @token_required
@@ -390,12 +1211,23 @@ def api_atualizar_leitura(current_user, leitura_id):
         return jsonify({'message': 'Leitura não encontrada'}), 404
 
     data = request.get_json()
+    try:
+        for campo in CAMPOS_NUMERICOS:
+            if data.get(campo) is not None:
+                data[campo] = converter_numero(campo, data[campo])
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    if 'data_inicial' in data and data['data_inicial'] is None:
+        # Parte da chave primária das partições no PostgreSQL
+        return jsonify({'message': "Campo 'data_inicial' não pode ser nulo"}), 400
+    
     dados_anteriores = {
         'umidade': leitura.umidade,
         'temperatura': leitura.temperatura,
         'pressao': leitura.pressao,
         'lote': leitura.lote
     }
+    chave_anterior = (leitura.lote, leitura.data_inicial)
     
     leitura.umidade = data.get('umidade', leitura.umidade)
     leitura.temperatura = data.get('temperatura', leitura.temperatura)
@@ -404,6 +1236,11 @@ def api_atualizar_leitura(current_user, leitura_id):
     leitura.data_inicial = data.get('data_inicial', leitura.data_inicial)
     leitura.data_final = data.get('data_final', leitura.data_final)
 
+    # Recalcula os agregados do dia antigo e do novo (lote ou data podem ter mudado)
+    db.session.flush()
+    reconstruir_dia_da_leitura(*chave_anterior)
+    if (leitura.lote, leitura.data_inicial) != chave_anterior:
+        reconstruir_dia_da_leitura(leitura.lote, leitura.data_inicial)
     db.session.commit()
     
     log_crud_operation(current_user, 'leituras', 'UPDATE', leitura_id, 
@@ -429,6 +1266,8 @@ def api_deletar_leitura(current_user, leitura_id):
     }
     
     db.session.delete(leitura)
+    db.session.flush()
+    reconstruir_dia_da_leitura(leitura.lote, leitura.data_inicial)
     db.session.commit()
     
     log_crud_operation(current_user, 'leituras', 'DELETE', leitura_id, dados=dados_leitura)
@@ -463,6 +1302,7 @@ def api_criar_parametro(current_user):
         )
         db.session.add(novo_parametro)
         db.session.commit()
+        invalidar_parametros()
         
         log_crud_operation(current_user, 'parametros', 'CREATE', novo_parametro.id, 
                           dados={'empresa': data['empresa'], 'lote': data['lote']})
@@ -479,6 +1319,7 @@ def api_criar_parametro(current_user):
 @app.route('/api/empresas', methods=['GET'])
 @token_required
 @log_activity("LISTAR_EMPRESAS")
+@condicional('parametro')
 def api_get_empresas(current_user):
     """
     Obter lista de empresas cadastradas
@@ -486,28 +1327,22 @@ def api_get_empresas(current_user):
     if not current_user.is_admin:
         return jsonify({'message': 'Acesso negado!'}), 403
     
-    empresas = db.session.query(Parametro.empresa).distinct().all()
-    return jsonify([e[0] for e in empresas if e[0]]), 200
+    return jsonify(listar_empresas()), 200
 
 @app.route('/api/lotes', methods=['GET'])
 @token_required
 @log_activity("LISTAR_LOTES")
+@condicional('parametro')
 def api_get_lotes(current_user):
     """
     Obter lista de todos os lotes (ou filtrado por empresa)
     """
-    empresa = request.args.get('empresa')
-    
-    query = db.session.query(Parametro.lote).distinct()
-    if empresa:
-        query = query.filter_by(empresa=empresa)
-    
-    lotes = query.all()
-    return jsonify([l[0] for l in lotes if l[0]]), 200
+    return jsonify(listar_lotes(request.args.get('empresa'))), 200
 
 @app.route('/api/parametros', methods=['GET'])
 @token_required
 @log_activity("BUSCAR_PARAMETROS")
+@condicional('parametro')
 def api_get_parametros(current_user):
     """
     Buscar parâmetros por empresa e lote
@@ -521,7 +1356,8 @@ def api_get_parametros(current_user):
     if not empresa or not lote:
         return jsonify({'message': 'Empresa e lote são obrigatórios'}), 400
 
-    parametros = Parametro.query.filter_by(empresa=empresa, lote=lote).all()
+    # A versão do ETag: o registro não pode responder com linhas mais antigas que ela
+    parametros = registro_parametros.por_empresa_lote(empresa, lote, g.versoes['parametro'])
 
     return jsonify([p.to_dict() for p in parametros]), 200
 
@@ -561,6 +1397,7 @@ def api_atualizar_parametro(current_user, id):
             parametro.estagio_ovo = data.get('estagio_ovo')
 
         db.session.commit()
+        invalidar_parametros()
         
         log_parametro_alteracao(current_user, id, dados_anteriores, parametro.to_dict(), 'UPDATE')
         
@@ -573,12 +1410,167 @@ def api_atualizar_parametro(current_user, id):
         log_crud_operation(current_user, 'parametros', 'UPDATE_FAILED', id, dados={'erro': str(e)})
         return jsonify({'message': f'Erro ao atualizar parâmetro: {str(e)}'}), 400
 
+@app.route('/api/dispositivos', methods=['POST'])
+@token_required
+@log_activity("CRIAR_DISPOSITIVO")
+def api_criar_dispositivo(current_user):
+    """
+    Cadastra um dispositivo e gera sua chave de API (mostrada só nesta resposta)
+    ---
+    tags:
+      - Dispositivos
+    parameters:
+      - in: body
+        name: dispositivo
+        schema:
+          type: object
+          required: [nome]
+          properties:
+            nome:
+              type: string
+            usuario_id:
+              type: integer
+              description: Usuário em nome de quem o dispositivo envia (padrão, o administrador)
+    responses:
+      201:
+        description: >
+          {dispositivo, chave}. O firmware envia a chave como
+          "Authorization: Bearer emb_..." em vez de fazer login
+      403:
+        description: Apenas administradores
+    """
+    if not current_user.is_admin:
+        return jsonify({'message': 'Acesso negado!'}), 403
+
+    data = request.get_json(silent=True) or {}
+    try:
+        nome = str(data.get('nome') or '').strip()
+        if not nome or len(nome) > 100:
+            return jsonify({'message': 'Nome do dispositivo é obrigatório (até 100 caracteres)'}), 400
+        if Dispositivo.query.filter_by(nome=nome).first():
+            return jsonify({'message': 'Já existe um dispositivo com esse nome'}), 400
+
+        dispositivo = Dispositivo(nome=nome, usuario_id=data.get('usuario_id') or current_user.id)
+        chave = gerar_chave(dispositivo)
+        db.session.add(dispositivo)
+        db.session.commit()
+        registro_dispositivos.invalidar()
+
+        log_crud_operation(current_user, 'dispositivos', 'CREATE', dispositivo.id, dados={'nome': nome})
+
+        return jsonify({'dispositivo': dispositivo.to_dict(), 'chave': chave}), 201
+    except Exception as e:
+        db.session.rollback()
+        log_crud_operation(current_user, 'dispositivos', 'CREATE_FAILED', dados={'erro': str(e)})
+        return jsonify({'message': f'Erro ao cadastrar dispositivo: {str(e)}'}), 400
+
+@app.route('/api/dispositivos', methods=['GET'])
+@token_required
+@log_activity("LISTAR_DISPOSITIVOS")
+def api_listar_dispositivos(current_user):
+    """
+    Lista os dispositivos cadastrados (sem as chaves)
+    ---
+    tags:
+      - Dispositivos
+    responses:
+      200:
+        description: Lista de dispositivos
+      403:
+        description: Apenas administradores
+    """
+    if not current_user.is_admin:
+        return jsonify({'message': 'Acesso negado!'}), 403
+
+    return jsonify([d.to_dict() for d in Dispositivo.query.order_by(Dispositivo.nome).all()]), 200
+
+@app.route('/api/dispositivos/<int:id>/chave', methods=['POST'])
+@token_required
+@log_activity("RENOVAR_CHAVE_DISPOSITIVO")
+def api_renovar_chave_dispositivo(current_user, id):
+    """
+    Gera uma nova chave para o dispositivo; a anterior deixa de valer
+    ---
+    tags:
+      - Dispositivos
+    responses:
+      200:
+        description: "{dispositivo, chave}"
+      403:
+        description: Apenas administradores
+      404:
+        description: Dispositivo não encontrado
+    """
+    if not current_user.is_admin:
+        return jsonify({'message': 'Acesso negado!'}), 403
+
+    dispositivo = Dispositivo.query.get(id)
+    if not dispositivo:
+        return jsonify({'message': 'Dispositivo não encontrado'}), 404
+
+    chave = gerar_chave(dispositivo)
+    dispositivo.ativo = True
+    db.session.commit()
+    registro_dispositivos.invalidar()
+
+    log_crud_operation(current_user, 'dispositivos', 'ROTATE_KEY', dispositivo.id)
+    return jsonify({'dispositivo': dispositivo.to_dict(), 'chave': chave}), 200
+
+@app.route('/api/dispositivos/<int:id>', methods=['DELETE'])
+@token_required
+@log_activity("REVOGAR_DISPOSITIVO")
+def api_revogar_dispositivo(current_user, id):
+    """
+    Revoga a chave do dispositivo (o cadastro e o histórico de leituras permanecem)
+    ---
+    tags:
+      - Dispositivos
+    responses:
+      200:
+        description: Dispositivo revogado
+      403:
+        description: Apenas administradores
+      404:
+        description: Dispositivo não encontrado
+    """
+    if not current_user.is_admin:
+        return jsonify({'message': 'Acesso negado!'}), 403
+
+    dispositivo = Dispositivo.query.get(id)
+    if not dispositivo:
+        return jsonify({'message': 'Dispositivo não encontrado'}), 404
+
+    dispositivo.ativo = False
+    db.session.commit()
+    registro_dispositivos.invalidar()
+
+    log_crud_operation(current_user, 'dispositivos', 'REVOKE', dispositivo.id)
+    return jsonify({'message': 'Dispositivo revogado', 'dispositivo': dispositivo.to_dict()}), 200
+
+def filtro_prefixo(coluna, prefixo):
+    """
+    Condições de 'coluna começa com prefixo'. LIKE 'x%' sozinho não usa o
+    índice B-tree (SQLite: LIKE ignora maiúsculas; PostgreSQL: collation
+    diferente de C), então o prefixo vira também a faixa [prefixo, sucessor).
+    Sem sucessor válido para o último caractere (U+10FFFF, surrogates) fica só o LIKE.
+    """
+    condicao = coluna.startswith(prefixo, autoescape=True)
+    proximo = ord(prefixo[-1]) + 1
+    if proximo > 0x10FFFF or 0xD800 <= proximo <= 0xDFFF:
+        return (condicao,)
+    return coluna >= prefixo, coluna < prefixo[:-1] + chr(proximo), condicao
+
 @app.route('/api/logs', methods=['GET'])
 @token_required
 @log_activity("CONSULTAR_LOGS")
+@comprimir
 def api_get_logs(current_user):
     """
     Consultar logs do sistema (apenas para administradores)
+
+    'acao' busca o trecho em qualquer parte da ação; 'acao_prefixo' só no
+    início (LOGIN traz LOGIN_SUCESSO e LOGIN_FALHOU) e usa o índice
+    ix_logs_acao_data_hora
     """
     if not current_user.is_admin:
         return jsonify({'message': 'Acesso negado!'}), 403
@@ -586,6 +1578,7 @@ def api_get_logs(current_user):
     # Parâmetros de filtro
     usuario_id = request.args.get('usuario_id', type=int)
     acao = request.args.get('acao')
+    acao_prefixo = request.args.get('acao_prefixo')
     data_inicio = request.args.get('data_inicio')
     data_fim = request.args.get('data_fim')
     limite = request.args.get('limite', 100, type=int)
@@ -596,6 +1589,8 @@ def api_get_logs(current_user):
         query = query.filter(Log.usuario_id == usuario_id)
     if acao:
         query = query.filter(Log.acao.contains(acao))
+    if acao_prefixo:
+        query = query.filter(*filtro_prefixo(Log.acao, acao_prefixo))
     if data_inicio:
         query = query.filter(Log.data_hora >= data_inicio)
     if data_fim:
@@ -0,0 +1,104 @@
+# auth_cache.py - Cache dos usuários autenticados usado por token_required
+
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from cache import CacheLRU
+from models import User
+from versoes import obter_versoes
+
+
+class UsuarioAutenticado:
+    """
+    Cópia somente leitura dos campos de User usados pelas rotas e pelo logging.
+    Não fica presa a uma sessão, então pode ser reaproveitada entre requisições.
+    """
+    __slots__ = ('id', 'username', 'email', 'is_admin')
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.is_admin = bool(user.is_admin)
+
+    def __repr__(self):
+        return f'<UsuarioAutenticado {self.username}>'
+
+
+usuarios_cache = CacheLRU()
+
+
+class _VersaoUsuarios:
+    # Como nos registros de parâmetros e dispositivos: a versão da tabela users
+    # é conferida no máximo a cada 'intervalo_verificacao' segundos e, se mudou
+    # (escrita em outro worker), o cache inteiro é descartado
+    def __init__(self, intervalo_verificacao=5):
+        self.intervalo_verificacao = intervalo_verificacao
+        self.versao = None
+        self._verificado_em = 0
+        self._lock = threading.Lock()
+
+    def conferir(self):
+        agora = time.monotonic()
+        if self.versao is not None and agora - self._verificado_em < self.intervalo_verificacao:
+            return
+
+        with self._lock:
+            if self.versao is not None and agora - self._verificado_em < self.intervalo_verificacao:
+                return
+
+            versao = obter_versoes(['users'])[0]
+            if versao != self.versao:
+                usuarios_cache.clear()
+                self.versao = versao
+            self._verificado_em = agora
+
+
+versao_usuarios = _VersaoUsuarios()
+
+
+def init_app(app):
+    usuarios_cache.tamanho_max = app.config.get('USUARIOS_CACHE_TAMANHO', 1024)
+    usuarios_cache.ttl = app.config.get('USUARIOS_CACHE_TTL', 60)
+    versao_usuarios.intervalo_verificacao = app.config.get('USUARIOS_CACHE_VERIFICACAO', 5)
+
+
+def obter_usuario_autenticado(user_id):
+    """
+    Retorna o usuário do cache ou, na falta, do banco (None se não existir)
+    """
+    versao_usuarios.conferir()
+    usuario = usuarios_cache.get(user_id)
+    if usuario is not None:
+        return usuario
+
+    user = User.query.get(user_id)
+    if user is None:
+        return None
+
+    usuario = UsuarioAutenticado(user)
+    usuarios_cache.set(user_id, usuario)
+    return usuario
+
+
+def invalidar_usuario(user_id):
+    usuarios_cache.delete(user_id)
+
+
+# Qualquer escrita em User invalida a entrada correspondente neste processo;
+# nos demais workers, na próxima conferência da versão de users
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidar_ao_alterar(mapper, connection, target):
+    invalidar_usuario(target.id)
+
+
+@event.listens_for(Session, 'after_bulk_update')
+@event.listens_for(Session, 'after_bulk_delete')
+def _invalidar_em_massa(contexto):
+    if contexto.mapper.class_ is User:
+        usuarios_cache.clear()
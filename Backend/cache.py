@@ -0,0 +1,140 @@
+# cache.py - Caches com expiração (TTL): em memória por processo (LRU) ou em
+# arquivo SQLite compartilhado entre os workers
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_AUSENTE = object()
+
+
+class CacheLRU:
+    """
+    Dicionário limitado a 'tamanho_max' itens, descartando o menos usado,
+    em que cada item expira 'ttl' segundos após ser gravado. Seguro entre threads.
+    """
+
+    def __init__(self, tamanho_max=1024, ttl=60):
+        self.tamanho_max = tamanho_max
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def get(self, chave, padrao=None):
+        with self._lock:
+            item = self._dados.get(chave, _AUSENTE)
+            if item is not _AUSENTE:
+                valor, expira_em = item
+                if expira_em > time.monotonic():
+                    self._dados.move_to_end(chave)
+                    self.acertos += 1
+                    return valor
+                del self._dados[chave]
+            self.falhas += 1
+            return padrao
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._dados[chave] = (valor, time.monotonic() + self.ttl)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho_max:
+                self._dados.popitem(last=False)
+
+    def delete(self, chave):
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self):
+        return len(self._dados)
+
+
+class CacheSQLite:
+    """
+    Mesma interface de CacheLRU, gravada num arquivo SQLite local que todos os
+    processos da máquina (ex.: workers do Gunicorn) enxergam, de modo que um
+    clear() ou delete() vale para todos. Chaves e valores precisam ser
+    serializáveis em JSON. Acima de 'tamanho_max' saem primeiro os itens
+    mais próximos de expirar.
+    """
+
+    def __init__(self, caminho, tamanho_max=1024, ttl=60):
+        self.caminho = caminho
+        self.tamanho_max = tamanho_max
+        self.ttl = ttl
+        self._local = threading.local()
+        self.acertos = 0
+        self.falhas = 0
+
+    def _conexao(self):
+        # Uma conexão por thread e por processo (conexões não sobrevivem ao fork)
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is not None and self._local.pid == os.getpid():
+            return conexao
+
+        conexao = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+        conexao.execute('PRAGMA journal_mode=WAL')
+        conexao.execute(
+            'CREATE TABLE IF NOT EXISTS cache '
+            '(chave TEXT PRIMARY KEY, valor TEXT NOT NULL, expira_em REAL NOT NULL)'
+        )
+        self._local.conexao = conexao
+        self._local.pid = os.getpid()
+        return conexao
+
+    def get(self, chave, padrao=None):
+        linha = self._conexao().execute(
+            'SELECT valor, expira_em FROM cache WHERE chave = ?', (json.dumps(chave),)
+        ).fetchone()
+
+        if linha is not None:
+            if linha[1] > time.time():
+                self.acertos += 1
+                return json.loads(linha[0])
+            self.delete(chave)
+        self.falhas += 1
+        return padrao
+
+    def set(self, chave, valor):
+        conexao = self._conexao()
+        conexao.execute(
+            'INSERT OR REPLACE INTO cache (chave, valor, expira_em) VALUES (?, ?, ?)',
+            (json.dumps(chave), json.dumps(valor), time.time() + self.ttl)
+        )
+        excesso = len(self) - self.tamanho_max
+        if excesso > 0:
+            conexao.execute(
+                'DELETE FROM cache WHERE chave IN '
+                '(SELECT chave FROM cache ORDER BY expira_em LIMIT ?)', (excesso,)
+            )
+
+    def delete(self, chave):
+        self._conexao().execute('DELETE FROM cache WHERE chave = ?', (json.dumps(chave),))
+
+    def clear(self):
+        self._conexao().execute('DELETE FROM cache')
+
+    def __len__(self):
+        return self._conexao().execute('SELECT count(*) FROM cache').fetchone()[0]
+
+
+BACKENDS = {'memoria': CacheLRU, 'sqlite': CacheSQLite}
+
+
+def criar_cache(backend='memoria', **opcoes):
+    """
+    Instancia o backend pelo nome ('memoria' ou 'sqlite', que exige 'caminho')
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de cache inválido: {backend}. Use: {', '.join(BACKENDS)}")
+    if backend != 'sqlite':
+        opcoes.pop('caminho', None)
+    return BACKENDS[backend](**opcoes)
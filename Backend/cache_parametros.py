@@ -0,0 +1,194 @@
+# cache_parametros.py - Caches da tabela parametro: listas de empresas e lotes
+# (SELECT DISTINCT) e registro indexado dos valores ideais
+
+import os
+import tempfile
+import threading
+import time
+
+import sqlalchemy as sa
+
+from cache import CacheLRU, criar_cache
+from extensions import db
+from models import Parametro, VersaoTabela
+from versoes import obter_versoes
+
+parametros_cache = CacheLRU()
+
+
+class ParametroIdeal:
+    """
+    Cópia somente leitura de um Parametro, independente da sessão
+    """
+    __slots__ = ('id', 'empresa', 'lote', 'temp_ideal', 'umid_ideal', 'pressao_ideal',
+                 'lumens', 'id_sala', 'estagio_ovo', 'data_criacao')
+
+    def __init__(self, parametro):
+        for campo in self.__slots__:
+            setattr(self, campo, getattr(parametro, campo))
+
+    def to_dict(self):
+        dados = {campo: getattr(self, campo) for campo in self.__slots__}
+        dados['data_criacao'] = self.data_criacao.isoformat() if self.data_criacao else None
+        return dados
+
+
+class RegistroParametros:
+    """
+    Todos os parâmetros em memória, indexados por (empresa, lote), por lote e
+    por id_sala. A versão da tabela (versoes_tabelas) é conferida no máximo a
+    cada 'intervalo_verificacao' segundos e, se mudou, o registro é recarregado.
+
+    Quem já leu a versão (ex.: o ETag de condicional) a informa em 'versao':
+    se for mais nova que a carregada o registro é recarregado na hora, para
+    que a resposta nunca traga dados anteriores à versão anunciada.
+    """
+
+    def __init__(self, intervalo_verificacao=5):
+        self.intervalo_verificacao = intervalo_verificacao
+        self.versao = None
+        self.recargas = 0
+        self._verificado_em = 0
+        self._lock = threading.Lock()
+        self._por_empresa_lote = {}
+        self._por_lote = {}
+        self._por_sala = {}
+
+    def por_empresa_lote(self, empresa, lote, versao=None):
+        self._atualizar(versao)
+        return self._por_empresa_lote.get((empresa, lote), ())
+
+    def por_lote(self, lote, versao=None):
+        self._atualizar(versao)
+        return self._por_lote.get(lote, ())
+
+    def por_sala(self, id_sala, versao=None):
+        self._atualizar(versao)
+        return self._por_sala.get(id_sala, ())
+
+    def invalidar(self):
+        """
+        Força a conferência da versão na próxima consulta
+        """
+        self._verificado_em = 0
+
+    def _em_dia(self, versao, agora):
+        if self.versao is None:
+            return False
+        if versao is not None:
+            return versao <= self.versao
+        return agora - self._verificado_em < self.intervalo_verificacao
+
+    def _atualizar(self, versao=None):
+        agora = time.monotonic()
+        if self._em_dia(versao, agora):
+            return
+
+        with self._lock:
+            if self._em_dia(versao, agora):
+                return
+
+            versao = obter_versoes(['parametro'])[0]
+            if versao != self.versao:
+                self._carregar(versao)
+            self._verificado_em = agora
+
+    def _carregar(self, versao):
+        por_empresa_lote, por_lote, por_sala = {}, {}, {}
+        for parametro in Parametro.query.order_by(Parametro.id).all():
+            ideal = ParametroIdeal(parametro)
+            por_empresa_lote.setdefault((ideal.empresa, ideal.lote), []).append(ideal)
+            por_lote.setdefault(ideal.lote, []).append(ideal)
+            if ideal.id_sala is not None:
+                por_sala.setdefault(ideal.id_sala, []).append(ideal)
+
+        # Troca os índices de uma vez; leitores nunca veem um registro pela metade
+        self._por_empresa_lote = _congelar(por_empresa_lote)
+        self._por_lote = _congelar(por_lote)
+        self._por_sala = _congelar(por_sala)
+        self.versao = versao
+        self.recargas += 1
+
+
+def _congelar(indice):
+    return {chave: tuple(lista) for chave, lista in indice.items()}
+
+
+registro_parametros = RegistroParametros()
+
+
+def init_app(app):
+    """
+    Escolhe o backend por PARAMETROS_CACHE_BACKEND: 'memoria' (por worker) ou
+    'sqlite' (compartilhado pelos workers da máquina). Nos dois as chaves
+    incluem a versão da tabela parametro, então uma escrita vale para todos
+    os workers na hora; o TTL só descarta as entradas de versões antigas
+    """
+    global parametros_cache
+
+    app.config.setdefault('PARAMETROS_REGISTRO_VERIFICACAO', 5)
+    registro_parametros.intervalo_verificacao = app.config['PARAMETROS_REGISTRO_VERIFICACAO']
+
+    app.config.setdefault('PARAMETROS_CACHE_BACKEND', 'memoria')
+    app.config.setdefault('PARAMETROS_CACHE_TAMANHO', 256)
+    app.config.setdefault('PARAMETROS_CACHE_TTL', 3600)
+    app.config.setdefault('PARAMETROS_CACHE_CAMINHO',
+                          os.path.join(tempfile.gettempdir(), 'embryotech_parametros_cache.sqlite3'))
+
+    parametros_cache = criar_cache(
+        app.config['PARAMETROS_CACHE_BACKEND'],
+        tamanho_max=app.config['PARAMETROS_CACHE_TAMANHO'],
+        ttl=app.config['PARAMETROS_CACHE_TTL'],
+        caminho=app.config['PARAMETROS_CACHE_CAMINHO']
+    )
+
+
+def aquecer():
+    """
+    Carrega o registro de parâmetros na subida da aplicação. Sem as tabelas
+    (banco ainda não migrado) ou sem banco, fica para a primeira consulta.
+    """
+    try:
+        inspetor = sa.inspect(db.engine)
+        if inspetor.has_table(Parametro.__tablename__) and inspetor.has_table(VersaoTabela.__tablename__):
+            registro_parametros._atualizar()
+    except Exception as e:
+        print(f"Erro ao carregar o registro de parâmetros: {str(e)}")
+    finally:
+        db.session.remove()
+
+
+def _chave_versionada(chave):
+    # A versão é lida antes da consulta e entra na chave: uma escrita em outro
+    # worker muda a versão (e o ETag de condicional) e a lista antiga deixa de
+    # ser encontrada em todos os workers, sem esperar o TTL
+    return f"{obter_versoes(['parametro'])[0]}:{chave}"
+
+
+def listar_empresas():
+    chave = _chave_versionada('empresas')
+    empresas = parametros_cache.get(chave)
+    if empresas is None:
+        empresas = [e[0] for e in db.session.query(Parametro.empresa).distinct().all() if e[0]]
+        parametros_cache.set(chave, empresas)
+    return empresas
+
+
+def listar_lotes(empresa=None):
+    chave = _chave_versionada(f'lotes:{empresa}' if empresa else 'lotes')
+    lotes = parametros_cache.get(chave)
+    if lotes is None:
+        query = db.session.query(Parametro.lote).distinct()
+        if empresa:
+            query = query.filter_by(empresa=empresa)
+        lotes = [l[0] for l in query.all() if l[0]]
+        parametros_cache.set(chave, lotes)
+    return lotes
+
+
+def invalidar_parametros():
+    """
+    Chamar depois do commit de qualquer escrita em parametro
+    """
+    parametros_cache.clear()
+    registro_parametros.invalidar()
@@ -0,0 +1,176 @@
+# cliente_offline.py - Cliente de referência do envio em blocos (POST /api/leituras/lote-offline)
+
+import json
+import os
+
+import requests
+
+
+class ClienteLoteOffline:
+    """
+    Guarda as leituras em disco (no firmware, a flash) e as envia em blocos
+    numerados quando houver rede, seguindo o protocolo de lote_offline.py:
+
+    1. registrar() acrescenta a leitura a buffer.jsonl
+    2. enviar() consulta o estado do dispositivo no servidor, fecha o buffer
+       em blocos de até 'tamanho_bloco' leituras (blocos/<seq>.json) e os
+       envia em ordem de seq
+    3. um bloco só é apagado depois de confirmado pelo servidor (aceito ou
+       duplicado); queda de rede ou reinício no meio do caminho não perdem
+       leituras, e o reenvio de um bloco já gravado é reconhecido pelo seq
+
+    'obter_token' é chamado quando não há token ou o servidor responde 401
+    (o firmware refaz o login da mesma forma).
+    """
+
+    def __init__(self, url_base, dispositivo, diretorio, token=None, obter_token=None,
+                 tamanho_bloco=200, timeout=15, sessao=None):
+        self.url = url_base.rstrip('/') + '/leituras/lote-offline'
+        self.dispositivo = dispositivo
+        self.diretorio = diretorio
+        self.token = token
+        self.obter_token = obter_token
+        self.tamanho_bloco = tamanho_bloco
+        self.timeout = timeout
+        self.sessao = sessao or requests.Session()
+
+        self.caminho_buffer = os.path.join(diretorio, 'buffer.jsonl')
+        self.caminho_estado = os.path.join(diretorio, 'estado.json')
+        self.diretorio_blocos = os.path.join(diretorio, 'blocos')
+        os.makedirs(self.diretorio_blocos, exist_ok=True)
+
+        self.estado = self._ler_json(self.caminho_estado) or {'proximo_seq': 1}
+
+    # Armazenamento local
+
+    @staticmethod
+    def _ler_json(caminho):
+        try:
+            with open(caminho, encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _gravar_json(caminho, dados):
+        # Gravação atômica: um reinício no meio nunca deixa o arquivo pela metade
+        temporario = caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(dados, arquivo)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, caminho)
+
+    def _caminho_bloco(self, seq):
+        return os.path.join(self.diretorio_blocos, f'{seq:010d}.json')
+
+    def blocos_pendentes(self):
+        return sorted(int(nome.split('.')[0]) for nome in os.listdir(self.diretorio_blocos)
+                      if nome.endswith('.json'))
+
+    def registrar(self, leitura):
+        with open(self.caminho_buffer, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(json.dumps(leitura) + '\n')
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+
+    def fechar_blocos(self):
+        """
+        Move o buffer para blocos numerados. Se o processo cair antes de o
+        buffer ser esvaziado, as leituras repetidas em um bloco posterior são
+        descartadas pelo servidor (chave lote, sensor, data_inicial).
+        """
+        try:
+            with open(self.caminho_buffer, encoding='utf-8') as arquivo:
+                leituras = [json.loads(linha) for linha in arquivo if linha.strip()]
+        except FileNotFoundError:
+            return 0
+
+        criados = 0
+        for inicio in range(0, len(leituras), self.tamanho_bloco):
+            seq = self.estado['proximo_seq']
+            self._gravar_json(self._caminho_bloco(seq), leituras[inicio:inicio + self.tamanho_bloco])
+            self.estado['proximo_seq'] = seq + 1
+            self._gravar_json(self.caminho_estado, self.estado)
+            criados += 1
+
+        os.remove(self.caminho_buffer)
+        return criados
+
+    # Comunicação com o servidor
+
+    def _requisicao(self, metodo, **kwargs):
+        if self.token is None and self.obter_token is not None:
+            self.token = self.obter_token()
+
+        for tentativa in range(2):
+            response = self.sessao.request(metodo, self.url, timeout=self.timeout, headers={
+                'Authorization': f'Bearer {self.token}'
+            }, **kwargs)
+            if response.status_code != 401 or self.obter_token is None or tentativa:
+                return response
+            self.token = self.obter_token()
+        return response
+
+    def _descartar_confirmados(self, confirmado):
+        for seq in self.blocos_pendentes():
+            if seq <= confirmado:
+                os.remove(self._caminho_bloco(seq))
+
+    def sincronizar(self):
+        """
+        Retoma a partir do estado do servidor: apaga os blocos já confirmados e
+        nunca reutiliza um seq que o servidor já tenha visto (ex.: flash apagada)
+        """
+        response = self._requisicao('GET', params={'dispositivo': self.dispositivo})
+        response.raise_for_status()
+        estado = response.json()
+
+        self._descartar_confirmados(estado['confirmado'])
+        if estado['maior_recebido'] >= self.estado['proximo_seq']:
+            self.estado['proximo_seq'] = estado['maior_recebido'] + 1
+            self._gravar_json(self.caminho_estado, self.estado)
+        return estado
+
+    def enviar(self):
+        """
+        Envia os blocos pendentes em ordem. Para no primeiro erro de rede ou
+        do servidor e deixa o restante para a próxima chamada. Retorna
+        {enviados, leituras, pendentes, faltando}.
+        """
+        resultado = {'enviados': 0, 'leituras': 0, 'pendentes': 0, 'faltando': []}
+        try:
+            self.sincronizar()
+            self.fechar_blocos()
+
+            for seq in self.blocos_pendentes():
+                leituras = self._ler_json(self._caminho_bloco(seq))
+                response = self._requisicao('POST', json={
+                    'dispositivo': self.dispositivo, 'seq': seq, 'leituras': leituras
+                })
+
+                if response.status_code in (200, 201):
+                    corpo = response.json()
+                    os.remove(self._caminho_bloco(seq))
+                    self._descartar_confirmados(corpo['confirmado'])
+                    resultado['enviados'] += 1
+                    resultado['leituras'] += corpo.get('quantidade', 0)
+                    resultado['faltando'] = corpo['faltando']
+                elif 400 <= response.status_code < 500 and response.status_code not in (401, 403, 408, 429):
+                    # Rejeitado de vez (bloco inválido): fica guardado à parte para análise.
+                    # O servidor registra o seq como rejeitado e a confirmação segue adiante.
+                    os.replace(self._caminho_bloco(seq), self._caminho_bloco(seq) + '.rejeitado')
+                    try:
+                        corpo = response.json()
+                    except ValueError:
+                        corpo = {}
+                    if 'confirmado' in corpo:
+                        self._descartar_confirmados(corpo['confirmado'])
+                        resultado['faltando'] = corpo['faltando']
+                else:
+                    break
+        except (requests.RequestException, ValueError):
+            pass
+
+        resultado['pendentes'] = len(self.blocos_pendentes())
+        return resultado
@@ -0,0 +1,223 @@
+# compressao.py - Corpos de requisição comprimidos (gzip/zstd) e compressão negociada das respostas
+
+import io
+import json
+import zlib
+from functools import wraps
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - só gzip fica disponível
+    zstandard = None
+
+from flask import current_app, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# Bytes comprimidos lidos por vez do corpo da requisição
+TAMANHO_LEITURA = 64 * 1024
+
+NIVEL_GZIP = 6
+NIVEL_ZSTD = 3
+
+# Já comprimidos internamente: recomprimir só gasta CPU
+MIMETYPES_COMPRIMIDOS = ('application/vnd.apache.parquet',)
+
+
+def init_app(app):
+    app.config.setdefault('CORPO_DESCOMPRIMIDO_MAX', 32 * 1024 * 1024)
+    app.config.setdefault('RESPOSTA_COMPRESSAO_MINIMO', 1024)
+    app.wsgi_app = DescompressaoCorpo(app.wsgi_app, app)
+
+
+def codificacoes_disponiveis():
+    return ('zstd', 'gzip') if zstandard is not None else ('gzip',)
+
+
+class LeitorDescomprimido(io.RawIOBase):
+    """
+    Entrada WSGI que descomprime o corpo sob demanda, nunca mais que o
+    tamanho pedido por leitura, e interrompe com 413 ao passar de 'limite'
+    bytes descomprimidos (proteção contra zip bomb)
+    """
+
+    def __init__(self, entrada, codificacao, limite):
+        self.entrada = entrada
+        self.limite = limite
+        self.total = 0
+        if codificacao == 'gzip':
+            self.descompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self.comprimido = b''
+            self._ler = self._ler_gzip
+        else:
+            self.leitor_zstd = zstandard.ZstdDecompressor().stream_reader(entrada, read_size=TAMANHO_LEITURA)
+            self._ler = self.leitor_zstd.read
+
+    def readable(self):
+        return True
+
+    def _ler_gzip(self, tamanho):
+        while not self.descompressor.eof:
+            if not self.comprimido:
+                self.comprimido = self.entrada.read(TAMANHO_LEITURA)
+                if not self.comprimido:
+                    raise ValueError('Corpo gzip truncado')
+            # max_length limita a saída; o que sobra da entrada fica em unconsumed_tail
+            dados = self.descompressor.decompress(self.comprimido, tamanho)
+            self.comprimido = self.descompressor.unconsumed_tail
+            if dados:
+                return dados
+        return b''
+
+    def readinto(self, destino):
+        try:
+            dados = self._ler(len(destino))
+        except (zlib.error, ValueError) as e:
+            raise ValueError(f'Corpo comprimido inválido: {e}')
+        except Exception as e:
+            if zstandard is not None and isinstance(e, zstandard.ZstdError):
+                raise ValueError(f'Corpo comprimido inválido: {e}')
+            raise
+
+        self.total += len(dados)
+        if self.total > self.limite:
+            raise RequestEntityTooLarge(f'Corpo descomprimido maior que {self.limite} bytes')
+        destino[:len(dados)] = dados
+        return len(dados)
+
+
+class DescompressaoCorpo:
+    """
+    Middleware WSGI: com Content-Encoding gzip ou zstd a entrada da requisição
+    é trocada por um LeitorDescomprimido, e get_json()/get_data() (inclusive no
+    log) enxergam o corpo já descomprimido. Codificação desconhecida recebe 415.
+    """
+
+    def __init__(self, wsgi_app, app):
+        self.wsgi_app = wsgi_app
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        codificacao = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if not codificacao or codificacao == 'identity':
+            return self.wsgi_app(environ, start_response)
+
+        if codificacao not in codificacoes_disponiveis():
+            corpo = json.dumps({'message': f'Content-Encoding não suportado: {codificacao}'}).encode()
+            start_response('415 Unsupported Media Type', [
+                ('Content-Type', 'application/json'),
+                ('Content-Length', str(len(corpo))),
+                ('Accept-Encoding', ', '.join(codificacoes_disponiveis()))
+            ])
+            return [corpo]
+
+        entrada = environ['wsgi.input']
+        tamanho = environ.get('CONTENT_LENGTH')
+        if tamanho and tamanho.isdigit():
+            entrada = _EntradaLimitada(entrada, int(tamanho))
+
+        environ['wsgi.input'] = io.BufferedReader(
+            LeitorDescomprimido(entrada, codificacao, self.app.config['CORPO_DESCOMPRIMIDO_MAX']),
+            TAMANHO_LEITURA
+        )
+        # O tamanho descomprimido não é conhecido: o Werkzeug lê até o fim da entrada
+        environ.pop('CONTENT_LENGTH', None)
+        environ['wsgi.input_terminated'] = True
+        del environ['HTTP_CONTENT_ENCODING']
+        return self.wsgi_app(environ, start_response)
+
+
+class _EntradaLimitada:
+    # Não lê além do Content-Length do corpo comprimido (conexões keep-alive)
+    def __init__(self, entrada, restante):
+        self.entrada = entrada
+        self.restante = restante
+
+    def read(self, tamanho):
+        if self.restante <= 0:
+            return b''
+        dados = self.entrada.read(min(tamanho, self.restante))
+        self.restante -= len(dados)
+        return dados
+
+
+def escolher_codificacao():
+    """
+    Melhor codificação aceita pelo cliente (Accept-Encoding), ou None
+    """
+    return request.accept_encodings.best_match(codificacoes_disponiveis())
+
+
+class _Compressor:
+    def __init__(self, codificacao):
+        if codificacao == 'gzip':
+            self.objeto = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.parcial, self.final = zlib.Z_SYNC_FLUSH, zlib.Z_FINISH
+        else:
+            self.objeto = zstandard.ZstdCompressor(level=NIVEL_ZSTD).compressobj()
+            self.parcial, self.final = zstandard.COMPRESSOBJ_FLUSH_BLOCK, zstandard.COMPRESSOBJ_FLUSH_FINISH
+
+    def comprimir(self, dados):
+        return self.objeto.compress(dados)
+
+    def descarregar(self):
+        return self.objeto.flush(self.parcial)
+
+    def finalizar(self):
+        return self.objeto.flush(self.final)
+
+
+def comprimir_fluxo(partes, codificacao):
+    """
+    Comprime uma resposta em fluxo parte a parte; cada parte é descarregada
+    para o cliente receber os dados sem esperar o fim da exportação
+    """
+    compressor = _Compressor(codificacao)
+    try:
+        for parte in partes:
+            if isinstance(parte, str):
+                parte = parte.encode('utf-8')
+            if parte:
+                yield compressor.comprimir(parte) + compressor.descarregar()
+        yield compressor.finalizar()
+    finally:
+        if hasattr(partes, 'close'):
+            partes.close()
+
+
+def comprimir_resposta(response):
+    """
+    Comprime uma resposta 200 conforme o Accept-Encoding do cliente
+    """
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if response.mimetype in MIMETYPES_COMPRIMIDOS:
+        return response
+
+    codificacao = escolher_codificacao()
+    if codificacao is None:
+        return response
+
+    if response.is_streamed:
+        response.response = comprimir_fluxo(response.response, codificacao)
+        response.headers.pop('Content-Length', None)
+    else:
+        dados = response.get_data()
+        if len(dados) < current_app.config['RESPOSTA_COMPRESSAO_MINIMO']:
+            return response
+        compressor = _Compressor(codificacao)
+        response.set_data(compressor.comprimir(dados) + compressor.finalizar())
+
+    response.headers['Content-Encoding'] = codificacao
+    return response
+
+
+def comprimir(f):
+    """
+    Decorator (acima de condicional) que negocia a compressão da resposta
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        return comprimir_resposta(current_app.make_response(f(*args, **kwargs)))
+    return decorated
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Carrega variáveis de ambiente do arquivo .env
@@ -18,4 +19,111 @@ class Config:
    # JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'uma-chave-secreta-muito-segura')
     
     # Configurações do Flask
-    DEBUG = os.getenv('DEBUG', 'False') == 'True'
\ No newline at end of file
+    DEBUG = os.getenv('DEBUG', 'False') == 'True'
+
+    # Gravação de logs em lote por thread de fundo (False = commit síncrono por log)
+    LOG_ASYNC = os.getenv('LOG_ASYNC', 'True') == 'True'
+    LOG_FILA_TAMANHO_MAX = int(os.getenv('LOG_FILA_TAMANHO_MAX', 10000))
+    LOG_LOTE_TAMANHO = int(os.getenv('LOG_LOTE_TAMANHO', 200))
+    LOG_LOTE_INTERVALO_MS = int(os.getenv('LOG_LOTE_INTERVALO_MS', 500))
+    # descartar_novo | descartar_antigo | bloquear
+    LOG_POLITICA_FILA_CHEIA = os.getenv('LOG_POLITICA_FILA_CHEIA', 'descartar_novo')
+    LOG_BLOQUEIO_TIMEOUT_MS = int(os.getenv('LOG_BLOQUEIO_TIMEOUT_MS', 50))
+    # Listas do corpo logado (ex.: lote de leituras) acima disso viram {total_itens, primeiros}
+    LOG_DETALHES_MAX_ITENS = int(os.getenv('LOG_DETALHES_MAX_ITENS', 20))
+
+    # Lotes de leituras a partir deste tamanho usam COPY FROM STDIN no PostgreSQL
+    LEITURAS_COPY_MINIMO = int(os.getenv('LEITURAS_COPY_MINIMO', 500))
+
+    # Paginação de GET /api/leituras (tamanho padrão da página e teto do servidor)
+    LEITURAS_LIMITE_PADRAO = int(os.getenv('LEITURAS_LIMITE_PADRAO', 500))
+    LEITURAS_LIMITE_MAX = int(os.getenv('LEITURAS_LIMITE_MAX', 5000))
+
+    # Séries reduzidas para os gráficos (GET /api/leituras/serie)
+    SERIE_PONTOS_PADRAO = int(os.getenv('SERIE_PONTOS_PADRAO', 500))
+    SERIE_PONTOS_MAX = int(os.getenv('SERIE_PONTOS_MAX', 5000))
+
+    # Cache por processo dos usuários autenticados (token_required)
+    USUARIOS_CACHE_TAMANHO = int(os.getenv('USUARIOS_CACHE_TAMANHO', 1024))
+    USUARIOS_CACHE_TTL = int(os.getenv('USUARIOS_CACHE_TTL', 60))
+    # Segundos entre conferências da versão da tabela users (alteração feita em outro worker)
+    USUARIOS_CACHE_VERIFICACAO = float(os.getenv('USUARIOS_CACHE_VERIFICACAO', 5))
+
+    # Partições mensais de leituras (flask particoes manter)
+    PARTICOES_MESES_FUTUROS = int(os.getenv('PARTICOES_MESES_FUTUROS', 3))
+    # 0 = nunca desanexar partições antigas
+    PARTICOES_RETER_MESES = int(os.getenv('PARTICOES_RETER_MESES', 0))
+
+    # Envio em tempo real (SSE) de GET /api/leituras/stream
+    LEITURAS_STREAM_ASYNC = os.getenv('LEITURAS_STREAM_ASYNC', 'True') == 'True'
+    LEITURAS_STREAM_CANAL = os.getenv('LEITURAS_STREAM_CANAL', 'leituras_novas')
+    LEITURAS_STREAM_HEARTBEAT = float(os.getenv('LEITURAS_STREAM_HEARTBEAT', 15))
+    LEITURAS_STREAM_FILA_MAX = int(os.getenv('LEITURAS_STREAM_FILA_MAX', 1000))
+    LEITURAS_STREAM_REENVIO_MAX = int(os.getenv('LEITURAS_STREAM_REENVIO_MAX', 1000))
+    LEITURAS_STREAM_LACUNA_MAX = float(os.getenv('LEITURAS_STREAM_LACUNA_MAX', 30))
+
+    # Cache das listas de empresas e lotes: 'memoria' (por processo) ou 'sqlite'
+    # (arquivo compartilhado pelos workers da máquina)
+    PARAMETROS_CACHE_BACKEND = os.getenv('PARAMETROS_CACHE_BACKEND', 'memoria')
+    PARAMETROS_CACHE_TAMANHO = int(os.getenv('PARAMETROS_CACHE_TAMANHO', 256))
+    PARAMETROS_CACHE_TTL = int(os.getenv('PARAMETROS_CACHE_TTL', 3600))
+    PARAMETROS_CACHE_CAMINHO = os.getenv(
+        'PARAMETROS_CACHE_CAMINHO',
+        os.path.join(tempfile.gettempdir(), 'embryotech_parametros_cache.sqlite3')
+    )
+
+    # Registro em memória dos parâmetros: segundos entre conferências da versão da tabela
+    PARAMETROS_REGISTRO_VERIFICACAO = float(os.getenv('PARAMETROS_REGISTRO_VERIFICACAO', 5))
+
+    # Desvio máximo em relação ao ideal do lote antes de gerar alarme (ver desvios.py)
+    ALARME_TOLERANCIA_TEMPERATURA = float(os.getenv('ALARME_TOLERANCIA_TEMPERATURA', 0.5))
+    ALARME_TOLERANCIA_UMIDADE = float(os.getenv('ALARME_TOLERANCIA_UMIDADE', 5.0))
+    ALARME_TOLERANCIA_PRESSAO = float(os.getenv('ALARME_TOLERANCIA_PRESSAO', 10.0))
+
+    # Tamanho máximo do corpo depois de descomprimido (Content-Encoding gzip/zstd)
+    CORPO_DESCOMPRIMIDO_MAX = int(os.getenv('CORPO_DESCOMPRIMIDO_MAX', 32 * 1024 * 1024))
+    # Respostas menores que isso (em bytes) não são comprimidas
+    RESPOSTA_COMPRESSAO_MINIMO = int(os.getenv('RESPOSTA_COMPRESSAO_MINIMO', 1024))
+
+    # Envio em blocos das leituras guardadas offline (ver lote_offline.py)
+    LOTE_OFFLINE_MAX_LEITURAS = int(os.getenv('LOTE_OFFLINE_MAX_LEITURAS', 5000))
+    LOTE_OFFLINE_LACUNAS_MAX = int(os.getenv('LOTE_OFFLINE_LACUNAS_MAX', 100))
+
+    # Chaves de API dos dispositivos: segredo próprio do HMAC (trocá-lo invalida
+    # todas as chaves; sem ele a chave é derivada de JWT_SECRET_KEY por HKDF) e
+    # segundos entre conferências da versão da tabela dispositivos
+    DISPOSITIVOS_HMAC_SEGREDO = os.getenv('DISPOSITIVOS_HMAC_SEGREDO')
+    DISPOSITIVOS_REGISTRO_VERIFICACAO = float(os.getenv('DISPOSITIVOS_REGISTRO_VERIFICACAO', 5))
+
+    # Quantidade de proxies reversos (nginx etc.) na frente da aplicação, que
+    # precisam enviar X-Forwarded-For; 0 = remote_addr é o próprio cliente
+    PROXY_CONFIAVEIS = int(os.getenv('PROXY_CONFIAVEIS', 0))
+
+    # /api/login: verificação de senha em pool de threads com fila limitada
+    # (acima dela, 503) e cache por alguns segundos das verificações bem-sucedidas
+    LOGIN_HASH_THREADS = int(os.getenv('LOGIN_HASH_THREADS', 2))
+    LOGIN_HASH_FILA_MAX = int(os.getenv('LOGIN_HASH_FILA_MAX', 32))
+    LOGIN_HASH_TIMEOUT = float(os.getenv('LOGIN_HASH_TIMEOUT', 10))
+    LOGIN_CACHE_TTL = int(os.getenv('LOGIN_CACHE_TTL', 300))
+    # Token bucket por IP (toda tentativa) e por usuário (só falhas), por processo
+    LOGIN_LIMITE_IP_CAPACIDADE = int(os.getenv('LOGIN_LIMITE_IP_CAPACIDADE', 20))
+    LOGIN_LIMITE_IP_POR_MINUTO = float(os.getenv('LOGIN_LIMITE_IP_POR_MINUTO', 10))
+    LOGIN_LIMITE_USUARIO_CAPACIDADE = int(os.getenv('LOGIN_LIMITE_USUARIO_CAPACIDADE', 5))
+    LOGIN_LIMITE_USUARIO_POR_MINUTO = float(os.getenv('LOGIN_LIMITE_USUARIO_POR_MINUTO', 1))
+
+    # Tokens revogados no logout: segundos entre conferências da versão da tabela
+    # (atraso máximo até os demais workers recusarem o token) e capacidade
+    # inicial do filtro de Bloom, dobrada conforme necessário
+    REVOGACAO_REGISTRO_VERIFICACAO = float(os.getenv('REVOGACAO_REGISTRO_VERIFICACAO', 5))
+    REVOGACAO_FILTRO_CAPACIDADE = int(os.getenv('REVOGACAO_FILTRO_CAPACIDADE', 1024))
+
+    # Segundos durante os quais uma Idempotency-Key de POST /api/leituras é lembrada
+    IDEMPOTENCIA_TTL = int(os.getenv('IDEMPOTENCIA_TTL', 86400))
+
+    # Detector de anomalias por lote (ver anomalias.py)
+    ANOMALIA_ALFA = float(os.getenv('ANOMALIA_ALFA', 0.1))
+    ANOMALIA_JANELA = int(os.getenv('ANOMALIA_JANELA', 1000))
+    ANOMALIA_AQUECIMENTO = int(os.getenv('ANOMALIA_AQUECIMENTO', 30))
+    ANOMALIA_K_PICO = float(os.getenv('ANOMALIA_K_PICO', 4.0))
+    ANOMALIA_K_DERIVA = float(os.getenv('ANOMALIA_K_DERIVA', 1.0))
+    ANOMALIA_TRAVADO_N = int(os.getenv('ANOMALIA_TRAVADO_N', 20))
@@ -0,0 +1,103 @@
+# desvios.py - Comparação das leituras recebidas com os valores ideais do lote
+
+from datetime import datetime
+
+import numpy as np
+from flask import current_app
+
+from cache_parametros import registro_parametros
+from extensions import db
+from ingestao import COLUNAS_LEITURA
+from models import AlarmeLeitura
+
+# Métrica da leitura -> campo ideal em Parametro
+IDEAIS = {
+    'temperatura': 'temp_ideal',
+    'umidade': 'umid_ideal',
+    'pressao': 'pressao_ideal'
+}
+
+_POSICAO = {coluna: i for i, coluna in enumerate(COLUNAS_LEITURA)}
+
+
+def parametro_do_lote(lote):
+    """
+    Parâmetro vigente do lote: o mais recente, se houver mais de uma empresa
+    """
+    parametros = registro_parametros.por_lote(lote)
+    return parametros[-1] if parametros else None
+
+
+def _coluna(linhas, campo):
+    i = _POSICAO[campo]
+    return np.array([np.nan if linha[i] is None else linha[i] for linha in linhas], dtype=np.float64)
+
+
+def pontuar_leituras(linhas, tolerancias):
+    """
+    Desvio de cada métrica em relação ao ideal do lote, para o lote inteiro
+    de uma vez. Devolve {metrica: (desvios, fora_da_faixa)}, arrays alinhados
+    com 'linhas'; sem ideal (lote sem parâmetro ou campo nulo) o desvio é NaN
+    e a leitura não é marcada.
+    """
+    i_lote = _POSICAO['lote']
+    lotes = [linha[i_lote] for linha in linhas]
+    parametros = {lote: parametro_do_lote(lote) for lote in set(lotes) if lote is not None}
+
+    resultado = {}
+    for metrica, campo_ideal in IDEAIS.items():
+        ideais_por_lote = {
+            lote: getattr(parametro, campo_ideal)
+            for lote, parametro in parametros.items()
+            if parametro is not None and getattr(parametro, campo_ideal) is not None
+        }
+        ideais = np.array([ideais_por_lote.get(lote, np.nan) for lote in lotes], dtype=np.float64)
+
+        desvios = _coluna(linhas, metrica) - ideais
+        with np.errstate(invalid='ignore'):
+            fora = np.abs(desvios) > tolerancias[metrica]
+        resultado[metrica] = (desvios, fora)
+
+    return resultado
+
+
+def registrar_alarmes(linhas):
+    """
+    Pontua as tuplas recém-inseridas (ordem de COLUNAS_LEITURA) e grava um
+    alarme por métrica fora da faixa, na transação da sessão atual.
+    Retorna a quantidade de alarmes.
+    """
+    if not linhas:
+        return 0
+
+    tolerancias = tolerancias_configuradas()
+    pontuacao = pontuar_leituras(linhas, tolerancias)
+    agora = datetime.utcnow()
+
+    alarmes = []
+    for metrica, (desvios, fora) in pontuacao.items():
+        for i in np.flatnonzero(fora):
+            linha = linhas[i]
+            parametro = parametro_do_lote(linha[_POSICAO['lote']])
+            alarmes.append({
+                'lote': linha[_POSICAO['lote']],
+                'data_inicial': linha[_POSICAO['data_inicial']],
+                'metrica': metrica,
+                'valor': linha[_POSICAO[metrica]],
+                'ideal': getattr(parametro, IDEAIS[metrica]),
+                'desvio': float(desvios[i]),
+                'parametro_id': parametro.id,
+                'criado_em': agora
+            })
+
+    if alarmes:
+        db.session.execute(AlarmeLeitura.__table__.insert(), alarmes)
+    return len(alarmes)
+
+
+def tolerancias_configuradas():
+    return {
+        'temperatura': current_app.config['ALARME_TOLERANCIA_TEMPERATURA'],
+        'umidade': current_app.config['ALARME_TOLERANCIA_UMIDADE'],
+        'pressao': current_app.config['ALARME_TOLERANCIA_PRESSAO']
+    }
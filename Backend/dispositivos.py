@@ -0,0 +1,156 @@
+# dispositivos.py - Chaves de API por dispositivo, conferidas por HMAC contra um registro em memória
+
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+from flask import current_app
+
+from models import Dispositivo
+from versoes import obter_versoes
+
+# Formato da chave: emb_<identificador>_<segredo>. O identificador (público)
+# localiza o dispositivo; o segredo tem 256 bits aleatórios, então um HMAC
+# basta, sem o hash lento (PBKDF2) que as senhas de usuário precisam.
+PREFIXO_CHAVE = 'emb_'
+
+# Rótulo de domínio da chave do HMAC derivada de JWT_SECRET_KEY: a chave que
+# resume os segredos dos dispositivos nunca é a mesma que assina os JWT
+ROTULO_HMAC = b'embryotech/dispositivos/hmac-v1'
+
+
+class DispositivoAutenticado:
+    """
+    Identidade de uma requisição autenticada por chave de dispositivo, com os
+    campos de UsuarioAutenticado usados pelas rotas e pelo logging. Age em nome
+    do usuário dono (id), nunca como administrador.
+    """
+    __slots__ = ('id', 'username', 'email', 'is_admin', 'dispositivo_id', 'dispositivo')
+
+    def __init__(self, dispositivo):
+        self.id = dispositivo.usuario_id
+        self.username = f'dispositivo:{dispositivo.nome}'[:80]
+        self.email = None
+        self.is_admin = False
+        self.dispositivo_id = dispositivo.id
+        self.dispositivo = dispositivo.nome
+
+    def __repr__(self):
+        return f'<DispositivoAutenticado {self.dispositivo}>'
+
+
+class _ChaveDispositivo:
+    __slots__ = ('resumo', 'autenticado')
+
+    def __init__(self, dispositivo):
+        self.resumo = dispositivo.resumo_segredo
+        self.autenticado = DispositivoAutenticado(dispositivo)
+
+
+class RegistroDispositivos:
+    """
+    Dispositivos ativos em memória, por identificador. Como em
+    RegistroParametros, a versão da tabela é conferida no máximo a cada
+    'intervalo_verificacao' segundos; uma chave revogada deixa de valer nos
+    demais workers dentro desse intervalo.
+    """
+
+    def __init__(self, intervalo_verificacao=5):
+        self.intervalo_verificacao = intervalo_verificacao
+        self.versao = None
+        self.recargas = 0
+        self._verificado_em = 0
+        self._lock = threading.Lock()
+        self._por_identificador = {}
+
+    def por_identificador(self, identificador):
+        self._atualizar()
+        return self._por_identificador.get(identificador)
+
+    def invalidar(self):
+        self._verificado_em = 0
+
+    def _atualizar(self):
+        agora = time.monotonic()
+        if self.versao is not None and agora - self._verificado_em < self.intervalo_verificacao:
+            return
+
+        with self._lock:
+            if self.versao is not None and agora - self._verificado_em < self.intervalo_verificacao:
+                return
+
+            versao = obter_versoes(['dispositivos'])[0]
+            if versao != self.versao:
+                self._por_identificador = {
+                    d.identificador: _ChaveDispositivo(d)
+                    for d in Dispositivo.query.filter_by(ativo=True).all()
+                }
+                self.versao = versao
+                self.recargas += 1
+            self._verificado_em = agora
+
+
+registro_dispositivos = RegistroDispositivos()
+
+
+def init_app(app):
+    app.config.setdefault('DISPOSITIVOS_HMAC_SEGREDO', None)
+    app.config.setdefault('DISPOSITIVOS_REGISTRO_VERIFICACAO', 5)
+    registro_dispositivos.intervalo_verificacao = app.config['DISPOSITIVOS_REGISTRO_VERIFICACAO']
+
+    segredo = app.config['DISPOSITIVOS_HMAC_SEGREDO']
+    app.config['DISPOSITIVOS_HMAC_CHAVE'] = (
+        segredo.encode() if segredo else derivar_chave(app.config['JWT_SECRET_KEY'].encode(), ROTULO_HMAC)
+    )
+
+
+def derivar_chave(segredo, rotulo, tamanho=32):
+    """
+    HKDF-SHA256 (RFC 5869) sem sal: chave de 'tamanho' bytes para o uso
+    identificado por 'rotulo', independente das derivadas com outros rótulos
+    """
+    prk = hmac.new(b'\0' * hashlib.sha256().digest_size, segredo, hashlib.sha256).digest()
+    saida = bloco = b''
+    contador = 1
+    while len(saida) < tamanho:
+        bloco = hmac.new(prk, bloco + rotulo + bytes([contador]), hashlib.sha256).digest()
+        saida += bloco
+        contador += 1
+    return saida[:tamanho]
+
+
+def resumir_segredo(segredo):
+    return hmac.new(current_app.config['DISPOSITIVOS_HMAC_CHAVE'], segredo.encode(), hashlib.sha256).hexdigest()
+
+
+def gerar_chave(dispositivo):
+    """
+    Sorteia identificador e segredo para o dispositivo e devolve a chave
+    completa, que não fica guardada em lugar nenhum
+    """
+    segredo = secrets.token_urlsafe(32)
+    dispositivo.identificador = secrets.token_hex(8)
+    dispositivo.resumo_segredo = resumir_segredo(segredo)
+    return f'{PREFIXO_CHAVE}{dispositivo.identificador}_{segredo}'
+
+
+def eh_chave_dispositivo(token):
+    return token.startswith(PREFIXO_CHAVE)
+
+
+def autenticar_chave(chave):
+    """
+    DispositivoAutenticado da chave, ou None. Sem consulta ao banco além da
+    conferência periódica de versão do registro.
+    """
+    identificador, _, segredo = chave[len(PREFIXO_CHAVE):].partition('_')
+    if not identificador or not segredo:
+        return None
+
+    resumo = resumir_segredo(segredo)
+    entrada = registro_dispositivos.por_identificador(identificador)
+    if entrada is None or not hmac.compare_digest(resumo, entrada.resumo):
+        return None
+    return entrada.autenticado
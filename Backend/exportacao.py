@@ -0,0 +1,227 @@
+# exportacao.py - Exportação de leituras em fluxo, com memória constante
+
+import csv
+import io
+import json
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - exportação colunar fica indisponível
+    pa = None
+    pq = None
+
+from extensions import db
+from models import Leitura
+from paginacao import ordenar_recentes
+
+# Linhas buscadas por vez no cursor do servidor e enviadas por bloco da resposta
+TAMANHO_BLOCO = 1000
+
+# Linhas acumuladas antes de gravar um row group no Parquet
+TAMANHO_GRUPO_PARQUET = 64000
+
+# Mesmas chaves e ordem de Leitura.to_dict()
+COLUNAS_EXPORTACAO = ('id', 'umidade', 'temperatura', 'pressao', 'lote', 'sensor', 'data_inicial', 'data_final')
+
+FORMATOS_COLUNARES = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'csv': ('text/csv', 'csv')
+}
+
+
+def consulta_exportacao(lote=None, desde=None, ate=None, ordenar=True):
+    """
+    Consulta de colunas (sem objetos ORM) lida em blocos por um cursor no servidor
+    """
+    query = db.session.query(*[getattr(Leitura, coluna) for coluna in COLUNAS_EXPORTACAO])
+
+    if lote:
+        query = query.filter(Leitura.lote == lote)
+    if desde:
+        query = query.filter(Leitura.data_inicial >= desde)
+    if ate:
+        query = query.filter(Leitura.data_inicial <= ate)
+    if ordenar:
+        query = ordenar_recentes(query, Leitura)
+
+    # yield_per ativa stream_results: no psycopg2 vira um cursor nomeado (server-side)
+    return query.yield_per(TAMANHO_BLOCO)
+
+
+def linha_para_dict(linha):
+    id, umidade, temperatura, pressao, lote, sensor, data_inicial, data_final = linha
+    return {
+        'id': id,
+        'umidade': umidade,
+        'temperatura': temperatura,
+        'pressao': pressao,
+        'lote': lote,
+        'sensor': sensor,
+        'data_inicial': data_inicial.isoformat() if data_inicial else None,
+        'data_final': data_final.isoformat() if data_final else None
+    }
+
+
+def _blocos(query):
+    bloco = []
+    for linha in query:
+        bloco.append(json.dumps(linha_para_dict(linha)))
+        if len(bloco) >= TAMANHO_BLOCO:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+def gerar_ndjson(query):
+    """
+    Um objeto JSON por linha (application/x-ndjson)
+    """
+    for bloco in _blocos(query):
+        yield '\n'.join(bloco) + '\n'
+
+
+def gerar_json(query):
+    """
+    Um array JSON único, montado bloco a bloco
+    """
+    yield '['
+    primeiro = True
+    for bloco in _blocos(query):
+        yield ('' if primeiro else ',') + ','.join(bloco)
+        primeiro = False
+    yield ']'
+
+
+def gerar_csv(query):
+    """
+    CSV com cabeçalho, enviado bloco a bloco
+    """
+    saida = io.StringIO()
+    escritor = csv.writer(saida)
+    escritor.writerow(COLUNAS_EXPORTACAO)
+
+    for linha in query:
+        escritor.writerow(['' if valor is None else
+                           valor.isoformat() if hasattr(valor, 'isoformat') else valor
+                           for valor in linha])
+        if saida.tell() >= 64 * 1024:
+            yield saida.getvalue()
+            saida.seek(0)
+            saida.truncate()
+
+    yield saida.getvalue()
+
+
+def arrow_disponivel():
+    return pa is not None
+
+
+def esquema_arrow():
+    return pa.schema([
+        ('id', pa.int64()),
+        ('umidade', pa.float64()),
+        ('temperatura', pa.float64()),
+        ('pressao', pa.float64()),
+        ('lote', pa.string()),
+        ('sensor', pa.string()),
+        ('data_inicial', pa.timestamp('us')),
+        ('data_final', pa.timestamp('us'))
+    ])
+
+
+def _lotes_de_registros(query, esquema):
+    bloco = []
+    for linha in query:
+        bloco.append(linha)
+        if len(bloco) >= TAMANHO_BLOCO:
+            yield _lote_de_registros(bloco, esquema)
+            bloco = []
+    if bloco:
+        yield _lote_de_registros(bloco, esquema)
+
+
+def _lote_de_registros(linhas, esquema):
+    colunas = list(zip(*linhas))
+    return pa.record_batch(
+        [pa.array(valores, type=campo.type) for valores, campo in zip(colunas, esquema)],
+        schema=esquema
+    )
+
+
+class _SaidaEmPartes:
+    """
+    Arquivo somente de escrita que guarda os bytes até a resposta retirá-los;
+    tell() conta o total gravado, usado pelo Parquet nos offsets do rodapé
+    """
+
+    def __init__(self):
+        self.partes = []
+        self.posicao = 0
+        self.closed = False
+
+    def write(self, dados):
+        dados = bytes(dados)
+        self.partes.append(dados)
+        self.posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self.posicao
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def retirar(self):
+        dados = b''.join(self.partes)
+        self.partes = []
+        return dados
+
+
+def gerar_arrow(query):
+    """
+    Formato de fluxo Arrow IPC, um record batch por bloco
+    """
+    esquema = esquema_arrow()
+    saida = _SaidaEmPartes()
+    escritor = pa.ipc.new_stream(pa.PythonFile(saida, mode='w'), esquema)
+
+    for lote in _lotes_de_registros(query, esquema):
+        escritor.write_batch(lote)
+        yield saida.retirar()
+
+    escritor.close()
+    yield saida.retirar()
+
+
+def gerar_parquet(query):
+    """
+    Arquivo Parquet gravado em row groups de até TAMANHO_GRUPO_PARQUET linhas
+    """
+    esquema = esquema_arrow()
+    saida = _SaidaEmPartes()
+    escritor = pq.ParquetWriter(pa.PythonFile(saida, mode='w'), esquema, compression='zstd')
+
+    pendentes = []
+    quantidade = 0
+    for lote in _lotes_de_registros(query, esquema):
+        pendentes.append(lote)
+        quantidade += lote.num_rows
+        if quantidade >= TAMANHO_GRUPO_PARQUET:
+            escritor.write_table(pa.Table.from_batches(pendentes, schema=esquema))
+            pendentes = []
+            quantidade = 0
+            yield saida.retirar()
+
+    if pendentes:
+        escritor.write_table(pa.Table.from_batches(pendentes, schema=esquema))
+    escritor.close()
+    yield saida.retirar()
+
+
+GERADORES_COLUNARES = {'parquet': gerar_parquet, 'arrow': gerar_arrow, 'csv': gerar_csv}
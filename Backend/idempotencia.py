@@ -0,0 +1,65 @@
+# idempotencia.py - Repetição segura de POST /api/leituras com o cabeçalho Idempotency-Key
+
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from extensions import db
+from models import ChaveIdempotencia
+
+TAMANHO_MAXIMO_CHAVE = 255
+
+
+def init_app(app):
+    app.config.setdefault('IDEMPOTENCIA_TTL', 86400)
+
+
+def _insert():
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(ChaveIdempotencia.__table__)
+
+
+def reservar_chave(usuario_id, chave):
+    """
+    Grava a chave na transação atual. Retorna None se ela é nova (quem chamou
+    processa a requisição e chama registrar_resposta antes do commit) ou
+    (corpo, status) da resposta já dada a uma requisição com a mesma chave.
+
+    No PostgreSQL uma segunda requisição simultânea com a mesma chave espera
+    no índice único até a primeira terminar: se ela fizer commit, a resposta
+    gravada é devolvida; se fizer rollback, a chave fica livre para a segunda.
+    """
+    if len(chave) > TAMANHO_MAXIMO_CHAVE:
+        raise ValueError(f'Idempotency-Key deve ter até {TAMANHO_MAXIMO_CHAVE} caracteres')
+
+    agora = datetime.utcnow()
+    limite = agora - timedelta(seconds=current_app.config['IDEMPOTENCIA_TTL'])
+
+    # As chaves vencidas do usuário saem aqui mesmo, sem tarefa de limpeza à parte
+    ChaveIdempotencia.query.filter(
+        ChaveIdempotencia.usuario_id == usuario_id,
+        ChaveIdempotencia.criado_em < limite
+    ).delete(synchronize_session=False)
+
+    resultado = db.session.execute(_insert().values(
+        usuario_id=usuario_id, chave=chave, criado_em=agora
+    ).on_conflict_do_nothing(index_elements=['usuario_id', 'chave']))
+    if resultado.rowcount:
+        return None
+
+    anterior = db.session.get(ChaveIdempotencia, (usuario_id, chave))
+    return json.loads(anterior.resposta), anterior.status_code
+
+
+def registrar_resposta(usuario_id, chave, corpo, status_code):
+    """
+    Guarda a resposta junto da chave reservada, na mesma transação da inserção
+    """
+    ChaveIdempotencia.query.filter_by(usuario_id=usuario_id, chave=chave).update({
+        'resposta': json.dumps(corpo),
+        'status_code': status_code
+    }, synchronize_session=False)
@@ -0,0 +1,276 @@
+# ingestao.py - Inserção em lote de leituras (COPY no PostgreSQL, executemany nos demais)
+
+import io
+import math
+from datetime import datetime, timedelta, timezone
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - corpo MessagePack fica indisponível
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover - corpo CBOR fica indisponível
+    cbor2 = None
+
+from flask import current_app
+from sqlalchemy import text
+from extensions import db
+from models import Leitura
+from versoes import marcar_alteradas
+
+# Ordem das colunas usada nas tuplas, no COPY e no INSERT em lote
+COLUNAS_LEITURA = ('umidade', 'temperatura', 'pressao', 'lote', 'data_inicial', 'data_final', 'sensor')
+# Uma leitura repetida (mesma chave) é descartada na inserção: ver uq_leituras_lote_sensor_data_inicial
+CHAVE_LEITURA = ('lote', 'sensor', 'data_inicial')
+CAMPOS_NUMERICOS = ('umidade', 'temperatura', 'pressao')
+CAMPOS_DATA = ('data_inicial', 'data_final')
+
+
+# Tipos de corpo aceitos em POST /api/leituras, além de application/json
+MIMETYPES_MSGPACK = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+MIMETYPES_CBOR = ('application/cbor',)
+
+
+def converter_data(valor):
+    """
+    Converte uma data ISO 8601 (como enviada pelo firmware), um datetime (dos
+    corpos MessagePack/CBOR) ou segundos desde a época em datetime sem fuso (UTC)
+    """
+    if valor is None:
+        return None
+
+    if isinstance(valor, datetime):
+        data = valor
+    elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        data = datetime.fromtimestamp(valor, timezone.utc)
+    else:
+        texto = str(valor).strip()
+        if not texto:
+            return None
+        if texto.endswith('Z'):
+            texto = texto[:-1] + '+00:00'
+        data = datetime.fromisoformat(texto)
+
+    if data.tzinfo is not None:
+        data = data.astimezone(timezone.utc).replace(tzinfo=None)
+    return data
+
+
+def converter_numero(coluna, valor):
+    """
+    Valor de umidade/temperatura/pressão como float finito. Booleanos, NaN e
+    infinito (que float() e o json aceitam) são recusados: um único NaN
+    contaminaria para sempre as somas dos agregados e o estado das anomalias.
+    """
+    if isinstance(valor, bool):
+        raise ValueError(f"Valor inválido para '{coluna}': {valor!r}")
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"Valor inválido para '{coluna}': {valor!r}")
+    if not math.isfinite(numero):
+        raise ValueError(f"Valor não finito para '{coluna}': {valor!r}")
+    return numero
+
+
+def _converter_valor(coluna, valor):
+    if valor is None:
+        return '' if coluna == 'sensor' else None
+    if coluna in CAMPOS_NUMERICOS:
+        return converter_numero(coluna, valor)
+    if coluna in CAMPOS_DATA:
+        try:
+            return converter_data(valor)
+        except (TypeError, ValueError, OverflowError, OSError):
+            raise ValueError(f"Data inválida para '{coluna}': {valor!r}")
+    return str(valor)
+
+
+def normalizar_leitura(item):
+    """
+    Valida um objeto de leitura e devolve a tupla na ordem de COLUNAS_LEITURA
+    """
+    if not isinstance(item, dict):
+        raise ValueError('Cada leitura deve ser um objeto JSON')
+
+    return tuple(_converter_valor(coluna, item.get(coluna)) for coluna in COLUNAS_LEITURA)
+
+
+def eh_colunar(data):
+    return isinstance(data, dict) and any(isinstance(valor, list) for valor in data.values())
+
+
+def normalizar_colunas(data):
+    """
+    Lote colunar: {'temperatura': [...], 'umidade': [...], 'lote': 'L1', ...}.
+    Listas trazem um valor por leitura e devem ter o mesmo tamanho; valores
+    simples (ex.: lote, data_final) valem para todas as leituras do lote.
+    """
+    tamanhos = {len(valor) for valor in data.values() if isinstance(valor, list)}
+    if len(tamanhos) != 1:
+        raise ValueError('As colunas do lote devem ter o mesmo tamanho')
+    quantidade = tamanhos.pop()
+
+    colunas = []
+    for coluna in COLUNAS_LEITURA:
+        valor = data.get(coluna)
+        if isinstance(valor, list):
+            colunas.append([_converter_valor(coluna, item) for item in valor])
+        else:
+            colunas.append([_converter_valor(coluna, valor)] * quantidade)
+
+    return list(zip(*colunas))
+
+
+def normalizar_leituras(data):
+    """
+    Aceita um objeto, uma lista de objetos ou um lote colunar e devolve a
+    lista de tuplas validadas
+    """
+    if eh_colunar(data):
+        return datar_chegada(normalizar_colunas(data))
+    if not isinstance(data, list):
+        data = [data]
+    return datar_chegada([normalizar_leitura(item) for item in data])
+
+
+def datar_chegada(linhas):
+    """
+    Leitura sem data_inicial recebe a hora de chegada: no PostgreSQL a coluna
+    faz parte da chave primária das partições e não aceita nulo. Um microssegundo
+    por posição mantém distintas as leituras sem data do mesmo lote e sensor.
+    """
+    indice = COLUNAS_LEITURA.index('data_inicial')
+    agora = datetime.utcnow()
+    return [
+        linha if linha[indice] is not None else
+        linha[:indice] + (agora + timedelta(microseconds=posicao),) + linha[indice + 1:]
+        for posicao, linha in enumerate(linhas)
+    ]
+
+
+def formato_aceito(mimetype):
+    if mimetype == 'application/json':
+        return True
+    if mimetype in MIMETYPES_MSGPACK:
+        return msgpack is not None
+    if mimetype in MIMETYPES_CBOR:
+        return cbor2 is not None
+    return False
+
+
+def decodificar_corpo(mimetype, corpo):
+    """
+    Decodifica o corpo de POST /api/leituras conforme o Content-Type. Datas
+    com a extensão de timestamp do MessagePack ou a tag 0/1 do CBOR chegam
+    como datetime; as demais seguem o mesmo caminho do JSON.
+    """
+    try:
+        if mimetype in MIMETYPES_MSGPACK:
+            return msgpack.unpackb(corpo, raw=False, timestamp=3)
+        if mimetype in MIMETYPES_CBOR:
+            return cbor2.loads(corpo)
+    except Exception as e:
+        raise ValueError(f'Corpo {mimetype} inválido: {e}')
+    raise ValueError(f'Tipo de conteúdo não suportado: {mimetype}')
+
+
+def inserir_leituras(linhas):
+    """
+    Insere as tuplas na tabela leituras dentro da transação da sessão atual,
+    ignorando as que repetem a chave (lote, sensor, data_inicial) de uma leitura
+    já gravada ou de outra do mesmo lote. O commit fica a cargo de quem chama.
+    Retorna as tuplas efetivamente inseridas.
+    """
+    if not linhas:
+        return []
+
+    minimo_copy = current_app.config.get('LEITURAS_COPY_MINIMO', 500)
+    if db.engine.dialect.name != 'postgresql':
+        novas = _inserir_individual(linhas)
+    elif len(linhas) >= minimo_copy:
+        novas = _inserir_copy(linhas)
+    else:
+        novas = _inserir_values(linhas)
+
+    if novas:
+        marcar_alteradas('leituras')
+    return novas
+
+
+def _colunas():
+    return [Leitura.__table__.c[coluna] for coluna in COLUNAS_LEITURA]
+
+
+def _inserir_values(linhas):
+    # Um único INSERT ... VALUES ... ON CONFLICT DO NOTHING; o RETURNING traz só as inseridas
+    from sqlalchemy.dialects.postgresql import insert
+
+    comando = insert(Leitura.__table__).values(
+        [dict(zip(COLUNAS_LEITURA, linha)) for linha in linhas]
+    ).on_conflict_do_nothing(index_elements=list(CHAVE_LEITURA)).returning(*_colunas())
+    return [tuple(linha) for linha in db.session.execute(comando)]
+
+
+def _inserir_individual(linhas):
+    # SQLite (desenvolvimento e testes): sem RETURNING no SQLAlchemy 1.4, o
+    # rowcount de cada INSERT diz se a linha entrou. Não há leitura prévia.
+    from sqlalchemy.dialects.sqlite import insert
+
+    comando = insert(Leitura.__table__).on_conflict_do_nothing(index_elements=list(CHAVE_LEITURA))
+    return [linha for linha in linhas
+            if db.session.execute(comando, dict(zip(COLUNAS_LEITURA, linha))).rowcount]
+
+
+def _inserir_copy(linhas):
+    # COPY não tem ON CONFLICT: as linhas vão para uma tabela temporária da
+    # conexão e de lá para leituras em um INSERT ... SELECT ... DO NOTHING
+    colunas = ', '.join(COLUNAS_LEITURA)
+    carga = f'{Leitura.__tablename__}_carga'
+
+    # Só as colunas carregadas: LIKE copiaria o NOT NULL de id sem o default nextval
+    db.session.execute(text(
+        f'CREATE TEMP TABLE IF NOT EXISTS {carga} ON COMMIT DELETE ROWS AS '
+        f'SELECT {colunas} FROM {Leitura.__tablename__} WITH NO DATA'
+    ))
+    conexao = db.session.connection().connection
+    cursor = conexao.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {carga} ({colunas}) FROM STDIN WITH (FORMAT csv)",
+            linhas_para_csv(linhas)
+        )
+    finally:
+        cursor.close()
+
+    novas = db.session.execute(text(
+        f"INSERT INTO {Leitura.__tablename__} ({colunas}) SELECT {colunas} FROM {carga} "
+        f"ON CONFLICT ({', '.join(CHAVE_LEITURA)}) DO NOTHING RETURNING {colunas}"
+    )).fetchall()
+    db.session.execute(text(f'TRUNCATE {carga}'))
+    return [tuple(linha) for linha in novas]
+
+
+def _campo_csv(valor):
+    # No formato CSV do COPY, campo vazio sem aspas é NULL e "" é string vazia
+    if valor is None:
+        return ''
+    if isinstance(valor, float):
+        return repr(valor)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return '"' + str(valor).replace('"', '""') + '"'
+
+
+def linhas_para_csv(linhas):
+    """
+    Serializa as tuplas no formato CSV esperado pelo COPY ... FROM STDIN
+    """
+    buffer = io.StringIO()
+    for linha in linhas:
+        buffer.write(','.join(_campo_csv(valor) for valor in linha))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,207 @@
+# log_sink.py - Gravação assíncrona e em lote da tabela de logs
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - usa o json da biblioteca padrão
+    orjson = None
+
+from extensions import db
+from models import Log
+
+
+def serializar_detalhes(detalhes):
+    """
+    Serializa os detalhes de um log (dicionário) em JSON uma única vez, na
+    gravação; textos já serializados passam direto
+    """
+    if detalhes is None or isinstance(detalhes, str):
+        return detalhes
+    if orjson is not None:
+        try:
+            return orjson.dumps(detalhes, default=str, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            # ex.: inteiro maior que 64 bits
+            pass
+    return json.dumps(detalhes, default=str)
+
+
+class LogSink:
+    """
+    Fila em memória drenada por uma thread de fundo que insere os registros
+    de Log em lote (a cada LOG_LOTE_INTERVALO_MS ou LOG_LOTE_TAMANHO registros).
+
+    Com LOG_ASYNC desligado (ex.: testes) cada registro é gravado na hora,
+    no mesmo commit síncrono de antes.
+    """
+
+    POLITICAS = ('descartar_novo', 'descartar_antigo', 'bloquear')
+
+    def __init__(self, app=None):
+        self.app = None
+        self._fila = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self.descartados = 0
+        self.gravados = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LOG_ASYNC', True)
+        app.config.setdefault('LOG_FILA_TAMANHO_MAX', 10000)
+        app.config.setdefault('LOG_LOTE_TAMANHO', 200)
+        app.config.setdefault('LOG_LOTE_INTERVALO_MS', 500)
+        app.config.setdefault('LOG_POLITICA_FILA_CHEIA', 'descartar_novo')
+        app.config.setdefault('LOG_BLOQUEIO_TIMEOUT_MS', 50)
+        app.config.setdefault('LOG_DETALHES_MAX_ITENS', 20)
+
+        self.app = app
+        atexit.register(self.parar)
+
+    def enviar(self, registro):
+        """
+        Recebe um dicionário com as colunas de Log; 'detalhes' pode ser um
+        dicionário, serializado só na gravação (na thread de fundo, se assíncrono).
+        Retorna False se o registro foi descartado por fila cheia.
+        """
+        if self.app is None or not self.app.config.get('LOG_ASYNC'):
+            self._gravar_sincrono(registro)
+            return True
+
+        self._garantir_worker()
+        return self._enfileirar(registro)
+
+    def flush(self):
+        """
+        Grava imediatamente, na thread atual, tudo o que estiver na fila
+        """
+        if self._fila is None:
+            return 0
+
+        lote = []
+        while True:
+            try:
+                lote.append(self._fila.get_nowait())
+            except queue.Empty:
+                break
+
+        if lote:
+            self._gravar_lote(lote)
+        return len(lote)
+
+    def parar(self, timeout=5.0):
+        """
+        Encerra a thread de fundo gravando o que ainda estiver pendente
+        """
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._parar.set()
+            thread.join(timeout)
+
+        self._thread = None
+        self.flush()
+        self._parar.clear()
+
+    def _garantir_worker(self):
+        # Após um fork (ex.: workers do Gunicorn) a thread não existe no
+        # processo filho, então fila e thread são recriadas por processo
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+
+            if self._fila is None or self._pid != os.getpid():
+                self._fila = queue.Queue(maxsize=self.app.config['LOG_FILA_TAMANHO_MAX'])
+
+            self._pid = os.getpid()
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._executar, name='log-sink', daemon=True)
+            self._thread.start()
+
+    def _enfileirar(self, registro):
+        politica = self.app.config['LOG_POLITICA_FILA_CHEIA']
+
+        try:
+            if politica == 'bloquear':
+                self._fila.put(registro, timeout=self.app.config['LOG_BLOQUEIO_TIMEOUT_MS'] / 1000)
+            else:
+                self._fila.put_nowait(registro)
+            return True
+        except queue.Full:
+            pass
+
+        if politica == 'descartar_antigo':
+            # Cada registro perdido conta uma vez: o antigo só se saiu mesmo da
+            # fila, o novo só se outra thread ocupou a vaga antes dele
+            try:
+                self._fila.get_nowait()
+                self.descartados += 1
+            except queue.Empty:
+                pass
+            try:
+                self._fila.put_nowait(registro)
+                return True
+            except queue.Full:
+                pass
+
+        self.descartados += 1
+        return False
+
+    def _executar(self):
+        while not (self._parar.is_set() and self._fila.empty()):
+            lote = self._coletar_lote()
+            if lote:
+                self._gravar_lote(lote)
+
+    def _coletar_lote(self):
+        tamanho = self.app.config['LOG_LOTE_TAMANHO']
+        limite = time.monotonic() + self.app.config['LOG_LOTE_INTERVALO_MS'] / 1000
+        lote = []
+
+        while len(lote) < tamanho:
+            restante = limite - time.monotonic()
+            if restante <= 0 or (self._parar.is_set() and self._fila.empty()):
+                break
+            try:
+                lote.append(self._fila.get(timeout=min(restante, 0.1)))
+            except queue.Empty:
+                continue
+
+        return lote
+
+    def _gravar_lote(self, lote):
+        with self.app.app_context():
+            try:
+                db.session.execute(Log.__table__.insert(), [self._serializar(r) for r in lote])
+                db.session.commit()
+                self.gravados += len(lote)
+            except Exception as e:
+                print(f"Erro ao gravar lote de logs: {str(e)}")
+                try:
+                    db.session.rollback()
+                except:
+                    pass
+
+    @staticmethod
+    def _serializar(registro):
+        return dict(registro, detalhes=serializar_detalhes(registro.get('detalhes')))
+
+    def _gravar_sincrono(self, registro):
+        db.session.add(Log(**self._serializar(registro)))
+        db.session.commit()
+        self.gravados += 1
+
+
+log_sink = LogSink()
@@ -1,10 +1,10 @@
 # logging_utils.py - Sistema de logging para Embryotech
 
 from functools import wraps
-from flask import request, g
-from models import Log, User
+from flask import current_app, request, g
+from models import User
 from extensions import db
-import json
+from log_sink import log_sink
 from datetime import datetime
 
 def log_activity(acao_personalizada=None):
@@ -61,7 +61,7 @@ def log_activity(acao_personalizada=None):
                 registrar_log_atividade(
                     usuario=usuario,
                     acao=f"ERRO: {acao_personalizada or f.__name__}",
-                    detalhes=json.dumps(detalhes_erro, default=str),
+                    detalhes=detalhes_erro,
                     status_code=500,
                     duracao=datetime.utcnow() - start_time
                 )
@@ -71,21 +71,46 @@ def log_activity(acao_personalizada=None):
         return decorated_function
     return decorator
 
+def remover_campos_sensiveis(dados):
+    """
+    Remove campos de senha de um objeto JSON
+    """
+    if not isinstance(dados, dict):
+        return dados
+    return {k: v for k, v in dados.items() if 'password' not in str(k).lower()}
+
+def resumir_dados(dados, max_itens):
+    """
+    Cópia do corpo para o log, sem campos de senha em nenhum nível. Listas com
+    mais de 'max_itens' (ex.: um lote de 5.000 leituras) viram
+    {'total_itens', 'primeiros'} em vez de irem inteiras para Log.detalhes.
+    """
+    if isinstance(dados, dict):
+        return {k: resumir_dados(v, max_itens) for k, v in remover_campos_sensiveis(dados).items()}
+    if isinstance(dados, list):
+        itens = [resumir_dados(item, max_itens) for item in dados[:max_itens]]
+        if len(dados) > max_itens:
+            return {'total_itens': len(dados), 'primeiros': itens}
+        return itens
+    return dados
+
 def capturar_detalhes_requisicao(func_name, args, kwargs):
     """
-    Captura detalhes relevantes da requisição
+    Captura detalhes relevantes da requisição (dicionário; a serialização
+    acontece uma única vez, na gravação do log)
     """
     detalhes = {
         'funcao': func_name,
         'timestamp': datetime.utcnow().isoformat()
     }
     
-    # Adiciona dados do JSON se houver
-    if request.is_json and request.get_json():
-        dados = request.get_json()
-        # Remove senhas dos logs por segurança
-        dados_seguros = {k: v for k, v in dados.items() if 'password' not in k.lower()}
-        detalhes['dados_requisicao'] = dados_seguros
+    # Adiciona dados do JSON se houver. silent=True: corpo vazio ou inválido
+    # (ex.: GET com Content-Type JSON) não derruba a requisição com 400
+    dados = request.get_json(silent=True) if request.is_json else None
+    if dados:
+        detalhes['dados_requisicao'] = resumir_dados(
+            dados, current_app.config.get('LOG_DETALHES_MAX_ITENS', 20)
+        )
     
     # Adiciona parâmetros da URL
     if request.args:
@@ -95,33 +120,34 @@ def capturar_detalhes_requisicao(func_name, args, kwargs):
     if kwargs:
         detalhes['parametros_rota'] = {k: v for k, v in kwargs.items() if not callable(v)}
     
-    return json.dumps(detalhes, default=str)
+    return detalhes
 
 def registrar_log_atividade(usuario=None, acao='', detalhes=None, status_code=200, duracao=None):
     """
-    Registra atividade no banco de dados
+    Registra atividade no banco de dados (em lote, via log_sink, quando LOG_ASYNC está ativo).
+    'detalhes' é um dicionário (ou um texto já pronto); a serialização fica com o log_sink.
     """
     try:
         # Adiciona duração aos detalhes se fornecida
-        if duracao and detalhes:
-            detalhes_dict = json.loads(detalhes) if isinstance(detalhes, str) else detalhes
-            detalhes_dict['duracao_ms'] = int(duracao.total_seconds() * 1000)
-            detalhes = json.dumps(detalhes_dict, default=str)
+        if duracao and isinstance(detalhes, dict):
+            detalhes['duracao_ms'] = int(duracao.total_seconds() * 1000)
         
-        log = Log(
-            usuario_id=usuario.id if usuario else None,
-            usuario_nome=usuario.username if usuario else 'Anônimo',
-            acao=acao,
-            detalhes=detalhes,
-            endpoint=request.endpoint if request else None,
-            metodo_http=request.method if request else None,
-            ip_address=request.environ.get('HTTP_X_REAL_IP', request.remote_addr) if request else None,
-            user_agent=request.headers.get('User-Agent', '') if request else None,
-            status_code=status_code
-        )
+        # Os dados da requisição são capturados aqui, pois a gravação em lote
+        # acontece fora do contexto da requisição
+        registro = {
+            'usuario_id': usuario.id if usuario else None,
+            'usuario_nome': usuario.username if usuario else 'Anônimo',
+            'acao': acao,
+            'detalhes': detalhes,
+            'endpoint': request.endpoint if request else None,
+            'metodo_http': request.method if request else None,
+            'ip_address': request.environ.get('HTTP_X_REAL_IP', request.remote_addr) if request else None,
+            'user_agent': request.headers.get('User-Agent', '') if request else None,
+            'status_code': status_code,
+            'data_hora': datetime.utcnow()
+        }
         
-        db.session.add(log)
-        db.session.commit()
+        log_sink.enviar(registro)
         
     except Exception as e:
         print(f"Erro ao registrar log: {str(e)}")
@@ -146,7 +172,7 @@ def log_login_attempt(username, sucesso=True, motivo=None):
     registrar_log_atividade(
         usuario=None,
         acao=acao,
-        detalhes=json.dumps(detalhes, default=str),
+        detalhes=detalhes,
         status_code=200 if sucesso else 401
     )
 
@@ -162,7 +188,7 @@ def log_logout(usuario):
     registrar_log_atividade(
         usuario=usuario,
         acao="LOGOUT",
-        detalhes=json.dumps(detalhes, default=str),
+        detalhes=detalhes,
         status_code=200
     )
 
@@ -183,7 +209,7 @@ def log_parametro_alteracao(usuario, parametro_id, dados_anteriores, dados_novos
     registrar_log_atividade(
         usuario=usuario,
         acao=acao,
-        detalhes=json.dumps(detalhes, default=str),
+        detalhes=detalhes,
         status_code=200
     )
 
@@ -202,7 +228,7 @@ def log_acesso_tela(usuario, tela, detalhes_adicionais=None):
     registrar_log_atividade(
         usuario=usuario,
         acao=f"ACESSO_TELA_{tela.upper()}",
-        detalhes=json.dumps(detalhes, default=str),
+        detalhes=detalhes,
         status_code=200
     )
 
@@ -227,6 +253,6 @@ def log_crud_operation(usuario, tabela, operacao, registro_id=None, dados=None):
     registrar_log_atividade(
         usuario=usuario,
         acao=acao,
-        detalhes=json.dumps(detalhes, default=str),
+        detalhes=detalhes,
         status_code=200
     )
\ No newline at end of file
@@ -0,0 +1,208 @@
+# login.py - Verificação de senha em pool limitado e limite de tentativas de /api/login
+
+import hashlib
+import hmac
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from cache import CacheLRU
+
+
+class VerificacaoIndisponivel(Exception):
+    """Fila de verificação cheia ou verificação demorada demais (responder 503)"""
+
+
+class BaldeTokens:
+    """
+    Limitador por chave (IP ou usuário) no modelo token bucket: cada chave
+    começa com 'capacidade' tokens e recupera 'por_minuto' tokens por minuto.
+    Estado em memória do processo, limitado a 'tamanho_max' chaves (sai a
+    usada há mais tempo). Seguro entre threads.
+    """
+
+    def __init__(self, capacidade=10, por_minuto=10, tamanho_max=10000):
+        self.capacidade = capacidade
+        self.por_minuto = por_minuto
+        self.tamanho_max = tamanho_max
+        self._baldes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tokens(self, chave, agora):
+        tokens, instante = self._baldes.get(chave, (self.capacidade, agora))
+        return min(self.capacidade, tokens + (agora - instante) * self.por_minuto / 60)
+
+    def _espera(self, tokens):
+        if tokens >= 1:
+            return 0
+        if self.por_minuto <= 0:
+            return math.inf
+        return (1 - tokens) * 60 / self.por_minuto
+
+    def espera(self, chave):
+        """
+        Segundos até haver um token para a chave (0 se já há), sem consumi-lo
+        """
+        with self._lock:
+            return self._espera(self._tokens(chave, time.monotonic()))
+
+    def consumir(self, chave):
+        """
+        Retira um token da chave. Retorna 0 ou, sem token, os segundos de espera.
+        """
+        with self._lock:
+            agora = time.monotonic()
+            tokens = self._tokens(chave, agora)
+            espera = self._espera(tokens)
+            if not espera:
+                self._baldes[chave] = (tokens - 1, agora)
+                self._baldes.move_to_end(chave)
+                while len(self._baldes) > self.tamanho_max:
+                    self._baldes.popitem(last=False)
+            return espera
+
+    def restaurar(self, chave):
+        with self._lock:
+            self._baldes.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._baldes.clear()
+
+
+class PoolVerificacao:
+    """
+    Executa check_password_hash (PBKDF2/scrypt, que liberam o GIL) em poucas
+    threads dedicadas, para que uma rajada de logins não ocupe a CPU de todas
+    as threads do worker. Acima de 'fila_max' verificações pendentes a
+    tentativa é recusada na hora, sem custo de CPU.
+
+    Verificações bem-sucedidas ficam 'cache_ttl' segundos em cache, sob um
+    HMAC (chave aleatória do processo) do hash guardado e da senha: trocar a
+    senha muda o hash e descarta a entrada naturalmente.
+
+    Usuário inexistente (password_hash None) é conferido contra um hash
+    fictício do mesmo algoritmo: o tempo de resposta não revela quais
+    usuários existem.
+    """
+
+    def __init__(self):
+        self.threads = 2
+        self.fila_max = 32
+        self.timeout = 10
+        self.cache = CacheLRU(tamanho_max=1024, ttl=300)
+        self._chave_cache = os.urandom(32)
+        self._hash_ficticio = None
+        self._executor = None
+        self._pid = None
+        self._vagas = None
+        self._lock = threading.Lock()
+        self.recusadas = 0
+
+    def init_app(self, app):
+        app.config.setdefault('LOGIN_HASH_THREADS', 2)
+        app.config.setdefault('LOGIN_HASH_FILA_MAX', 32)
+        app.config.setdefault('LOGIN_HASH_TIMEOUT', 10)
+        app.config.setdefault('LOGIN_CACHE_TTL', 300)
+
+        self.threads = app.config['LOGIN_HASH_THREADS']
+        self.fila_max = app.config['LOGIN_HASH_FILA_MAX']
+        self.timeout = app.config['LOGIN_HASH_TIMEOUT']
+        self.cache.ttl = app.config['LOGIN_CACHE_TTL']
+
+    def _garantir_executor(self):
+        # Threads não sobrevivem ao fork (workers do Gunicorn com preload)
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix='login-hash')
+                self._vagas = threading.BoundedSemaphore(self.fila_max)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _chave(self, password_hash, senha):
+        return hmac.new(self._chave_cache, f'{password_hash}\0{senha}'.encode('utf-8'),
+                        hashlib.sha256).digest()
+
+    def verificar(self, password_hash, senha):
+        """
+        Confere a senha contra o hash guardado. Levanta VerificacaoIndisponivel
+        se a fila estiver cheia ou a verificação passar de 'timeout' segundos.
+        """
+        if password_hash is None:
+            if self._hash_ficticio is None:
+                self._hash_ficticio = generate_password_hash(os.urandom(16).hex())
+            self._executar(self._hash_ficticio, senha)
+            return False
+
+        chave = self._chave(password_hash, senha)
+        if self.cache.get(chave):
+            return True
+
+        valida = self._executar(password_hash, senha)
+        if valida:
+            self.cache.set(chave, True)
+        return valida
+
+    def _executar(self, password_hash, senha):
+        executor = self._garantir_executor()
+        if not self._vagas.acquire(blocking=False):
+            self.recusadas += 1
+            raise VerificacaoIndisponivel('Fila de verificação de senha cheia')
+
+        vagas = self._vagas
+        try:
+            futuro = executor.submit(check_password_hash, password_hash, senha)
+        except BaseException:
+            vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: vagas.release())
+
+        try:
+            return futuro.result(timeout=self.timeout)
+        except TimeoutError:
+            raise VerificacaoIndisponivel('Verificação de senha demorou demais')
+
+
+pool_verificacao = PoolVerificacao()
+limite_ip = BaldeTokens()
+limite_usuario = BaldeTokens()
+
+
+def init_app(app):
+    app.config.setdefault('LOGIN_LIMITE_IP_CAPACIDADE', 20)
+    app.config.setdefault('LOGIN_LIMITE_IP_POR_MINUTO', 10)
+    app.config.setdefault('LOGIN_LIMITE_USUARIO_CAPACIDADE', 5)
+    app.config.setdefault('LOGIN_LIMITE_USUARIO_POR_MINUTO', 1)
+
+    limite_ip.capacidade = app.config['LOGIN_LIMITE_IP_CAPACIDADE']
+    limite_ip.por_minuto = app.config['LOGIN_LIMITE_IP_POR_MINUTO']
+    limite_usuario.capacidade = app.config['LOGIN_LIMITE_USUARIO_CAPACIDADE']
+    limite_usuario.por_minuto = app.config['LOGIN_LIMITE_USUARIO_POR_MINUTO']
+    pool_verificacao.init_app(app)
+
+
+def espera_tentativa(ip, username):
+    """
+    Chamada antes de qualquer consulta ou hash: toda tentativa consome um token
+    do IP; o balde do usuário só é consumido por falhas (registrar_falha), mas
+    precisa ter token para que a senha seja verificada. Retorna os segundos de
+    espera (0 = pode tentar).
+    """
+    return limite_ip.consumir(ip) or limite_usuario.espera(username)
+
+
+def registrar_falha(username):
+    limite_usuario.consumir(username)
+
+
+def registrar_sucesso(username):
+    limite_usuario.restaurar(username)
+
+
+def retry_after(espera):
+    return str(max(1, math.ceil(min(espera, 86400))))
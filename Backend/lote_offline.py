@@ -0,0 +1,164 @@
+# lote_offline.py - Envio em blocos numerados das leituras guardadas pelo dispositivo sem rede
+
+from datetime import datetime
+
+from flask import current_app
+
+from extensions import db
+from models import SequenciaDispositivo, BlocoOffline, Dispositivo
+
+
+def init_app(app):
+    app.config.setdefault('LOTE_OFFLINE_MAX_LEITURAS', 5000)
+    app.config.setdefault('LOTE_OFFLINE_LACUNAS_MAX', 100)
+
+
+def validar_bloco(data, autenticado=None):
+    """
+    Confere o envelope {dispositivo, seq, leituras} e devolve seus campos.
+    'leituras' aceita os mesmos formatos de POST /api/leituras. Com chave de
+    dispositivo ('autenticado' é o nome dele) o bloco só pode ser do próprio.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('O bloco deve ser um objeto com dispositivo, seq e leituras')
+
+    dispositivo = data.get('dispositivo', autenticado)
+    if autenticado is not None and dispositivo != autenticado:
+        raise PermissionError('A chave usada não pertence a este dispositivo')
+    if not isinstance(dispositivo, str) or not dispositivo.strip() or len(dispositivo) > 100:
+        raise ValueError("'dispositivo' deve ser um texto de até 100 caracteres")
+
+    seq = data.get('seq')
+    if not isinstance(seq, int) or isinstance(seq, bool) or seq < 1:
+        raise ValueError("'seq' deve ser um inteiro a partir de 1")
+
+    leituras = data.get('leituras')
+    if not isinstance(leituras, (list, dict)):
+        raise ValueError("'leituras' deve ser uma lista ou um lote colunar")
+
+    return dispositivo.strip(), seq, leituras
+
+
+def verificar_dono(dispositivo, sequencia, usuario):
+    """
+    Só o dono do dispositivo usa os seus blocos: o do cadastro em
+    /api/dispositivos, se houver, senão quem criou a numeração. Administradores
+    têm acesso a todos.
+    """
+    if usuario.is_admin:
+        return
+    cadastro = Dispositivo.query.filter_by(nome=dispositivo).first()
+    if cadastro is not None:
+        dono_id = cadastro.usuario_id
+    else:
+        dono_id = sequencia.usuario_id if sequencia is not None else None
+    if dono_id is not None and dono_id != usuario.id:
+        raise PermissionError('Dispositivo pertence a outro usuário')
+
+
+def travar_sequencia(dispositivo, usuario):
+    """
+    Sequência do dispositivo, criada se preciso e travada até o commit (no
+    PostgreSQL), para que dois blocos simultâneos não avancem a confirmação errado.
+    Levanta PermissionError se a numeração pertence a outro usuário.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    db.session.execute(insert(SequenciaDispositivo.__table__).values(
+        dispositivo=dispositivo, usuario_id=usuario.id, confirmado=0, maior_recebido=0
+    ).on_conflict_do_nothing(index_elements=['dispositivo']))
+
+    sequencia = SequenciaDispositivo.query.filter_by(dispositivo=dispositivo).with_for_update().one()
+    verificar_dono(dispositivo, sequencia, usuario)
+    if sequencia.usuario_id is None:
+        # Numeração anterior ao controle de dono: fica com quem a usar primeiro
+        sequencia.usuario_id = usuario.id
+    return sequencia
+
+
+def bloco_recebido(sequencia, seq):
+    if seq <= sequencia.confirmado:
+        return True
+    return db.session.get(BlocoOffline, (sequencia.dispositivo, seq)) is not None
+
+
+def confirmar_bloco(sequencia, seq, quantidade, rejeitado=False):
+    """
+    Registra o bloco e avança a confirmação acumulada enquanto os blocos
+    seguintes já estiverem presentes. Um bloco rejeitado (conteúdo inválido)
+    também é registrado: o dispositivo o descarta e não vai reenviá-lo, então
+    sem isso a confirmação ficaria parada nele para sempre.
+    """
+    db.session.add(BlocoOffline(dispositivo=sequencia.dispositivo, seq=seq, quantidade=quantidade,
+                                rejeitado=rejeitado))
+    db.session.flush()
+
+    sequencia.maior_recebido = max(sequencia.maior_recebido, seq)
+    acima = [linha.seq for linha in db.session.query(BlocoOffline.seq).filter(
+        BlocoOffline.dispositivo == sequencia.dispositivo,
+        BlocoOffline.seq > sequencia.confirmado
+    ).order_by(BlocoOffline.seq)]
+    for recebido in acima:
+        if recebido != sequencia.confirmado + 1:
+            break
+        sequencia.confirmado = recebido
+
+    # Abaixo da confirmação o número basta para reconhecer um reenvio
+    BlocoOffline.query.filter(
+        BlocoOffline.dispositivo == sequencia.dispositivo,
+        BlocoOffline.seq <= sequencia.confirmado
+    ).delete(synchronize_session=False)
+    sequencia.atualizado_em = datetime.utcnow()
+
+
+def rejeitar_bloco(dispositivo, seq, usuario):
+    """
+    Registra, em transação própria, o bloco recusado por conteúdo inválido e
+    devolve o estado da sequência (None se o bloco já era conhecido)
+    """
+    db.session.rollback()
+    sequencia = travar_sequencia(dispositivo, usuario)
+    if bloco_recebido(sequencia, seq):
+        db.session.commit()
+        return None
+    confirmar_bloco(sequencia, seq, 0, rejeitado=True)
+    resumo = resumo_sequencia(sequencia)
+    db.session.commit()
+    return resumo
+
+
+def resumo_sequencia(sequencia):
+    """
+    Estado para o dispositivo retomar o envio: o que já foi confirmado e os
+    blocos que faltam entre a confirmação e o maior número recebido
+    """
+    faltando = []
+    if sequencia.maior_recebido > sequencia.confirmado + 1:
+        recebidos = {linha.seq for linha in db.session.query(BlocoOffline.seq).filter(
+            BlocoOffline.dispositivo == sequencia.dispositivo,
+            BlocoOffline.seq > sequencia.confirmado
+        )}
+        limite = current_app.config['LOTE_OFFLINE_LACUNAS_MAX']
+        for seq in range(sequencia.confirmado + 1, sequencia.maior_recebido):
+            if seq not in recebidos:
+                faltando.append(seq)
+                if len(faltando) >= limite:
+                    break
+
+    return {
+        'dispositivo': sequencia.dispositivo,
+        'confirmado': sequencia.confirmado,
+        'maior_recebido': sequencia.maior_recebido,
+        'faltando': faltando
+    }
+
+
+def consultar_sequencia(dispositivo, usuario):
+    sequencia = db.session.get(SequenciaDispositivo, dispositivo)
+    verificar_dono(dispositivo, sequencia, usuario)
+    if sequencia is None:
+        return {'dispositivo': dispositivo, 'confirmado': 0, 'maior_recebido': 0, 'faltando': []}
+    return resumo_sequencia(sequencia)
@@ -0,0 +1,32 @@
+"""Dono da numeração offline e blocos rejeitados
+
+Revision ID: 3469436ed09f
+Revises: 7152ddd649bd
+Create Date: 2026-10-19 09:12:37.402115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3469436ed09f'
+down_revision = '7152ddd649bd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Numerações já existentes ficam sem dono até o primeiro envio (ver travar_sequencia)
+    op.add_column('lotes_offline_dispositivos', sa.Column('usuario_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_lotes_offline_dispositivos_usuario_id', 'lotes_offline_dispositivos', 'users',
+                          ['usuario_id'], ['id'])
+    op.add_column('lotes_offline_blocos', sa.Column('rejeitado', sa.Boolean(), server_default=sa.false(),
+                                                    nullable=False))
+
+
+def downgrade():
+    op.drop_column('lotes_offline_blocos', 'rejeitado')
+    op.drop_constraint('fk_lotes_offline_dispositivos_usuario_id', 'lotes_offline_dispositivos',
+                       type_='foreignkey')
+    op.drop_column('lotes_offline_dispositivos', 'usuario_id')
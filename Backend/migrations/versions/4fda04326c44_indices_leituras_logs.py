@@ -0,0 +1,99 @@
+"""Índices compostos e BRIN para leituras, logs e parametro
+
+Revision ID: 4fda04326c44
+Revises: 39d0503e83bc
+Create Date: 2026-10-18 09:12:40.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4fda04326c44'
+down_revision = '39d0503e83bc'
+branch_labels = None
+depends_on = None
+
+
+# (nome, tabela, colunas, opções) - devem bater com __table_args__ em models.py
+INDICES = [
+    ('ix_leituras_lote_data_inicial_id', 'leituras', ['lote', 'data_inicial', 'id'], {}),
+    ('ix_leituras_data_inicial_brin', 'leituras', ['data_inicial'], {'postgresql_using': 'brin'}),
+    ('ix_parametro_empresa_lote', 'parametro', ['empresa', 'lote'], {}),
+    ('ix_logs_data_hora', 'logs', ['data_hora'], {}),
+    ('ix_logs_usuario_id_data_hora', 'logs', ['usuario_id', 'data_hora'], {}),
+    ('ix_logs_acao_data_hora', 'logs', ['acao', 'data_hora'], {}),
+]
+
+
+def _criar_tabelas_ausentes(inspector):
+    # users.is_admin, parametro e logs foram criados por db.create_all() e nunca
+    # tiveram migração; só são criados aqui em bancos que ainda não os têm
+    tabelas = inspector.get_table_names()
+
+    if 'is_admin' not in [c['name'] for c in inspector.get_columns('users')]:
+        op.add_column('users', sa.Column('is_admin', sa.Boolean(), nullable=True))
+
+    if 'parametro' not in tabelas:
+        op.create_table('parametro',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('empresa', sa.String(length=100), nullable=False),
+        sa.Column('lote', sa.String(length=50), nullable=False),
+        sa.Column('temp_ideal', sa.Float(), nullable=False),
+        sa.Column('umid_ideal', sa.Float(), nullable=False),
+        sa.Column('pressao_ideal', sa.Float(), nullable=True),
+        sa.Column('lumens', sa.Float(), nullable=True),
+        sa.Column('id_sala', sa.Integer(), nullable=True),
+        sa.Column('estagio_ovo', sa.String(length=50), nullable=True),
+        sa.Column('data_criacao', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'logs' not in tabelas:
+        op.create_table('logs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('usuario_id', sa.Integer(), nullable=True),
+        sa.Column('usuario_nome', sa.String(length=80), nullable=True),
+        sa.Column('acao', sa.String(length=100), nullable=False),
+        sa.Column('detalhes', sa.Text(), nullable=True),
+        sa.Column('endpoint', sa.String(length=200), nullable=True),
+        sa.Column('metodo_http', sa.String(length=10), nullable=True),
+        sa.Column('ip_address', sa.String(length=45), nullable=True),
+        sa.Column('user_agent', sa.String(length=500), nullable=True),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('data_hora', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['usuario_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+
+def upgrade():
+    bind = op.get_bind()
+    _criar_tabelas_ausentes(sa.inspect(bind))
+
+    existentes = set()
+    inspector = sa.inspect(bind)
+    for tabela in {t for _, t, _, _ in INDICES}:
+        existentes.update(i['name'] for i in inspector.get_indexes(tabela))
+
+    postgres = bind.dialect.name == 'postgresql'
+
+    # CREATE INDEX CONCURRENTLY não bloqueia as escritas dos dispositivos,
+    # mas precisa rodar fora da transação da migração
+    with op.get_context().autocommit_block():
+        for nome, tabela, colunas, opcoes in INDICES:
+            if nome in existentes:
+                continue
+            if postgres:
+                opcoes = dict(opcoes, postgresql_concurrently=True)
+            op.create_index(nome, tabela, colunas, unique=False, **opcoes)
+
+
+def downgrade():
+    postgres = op.get_bind().dialect.name == 'postgresql'
+
+    with op.get_context().autocommit_block():
+        for nome, tabela, _, _ in reversed(INDICES):
+            opcoes = {'postgresql_concurrently': True} if postgres else {}
+            op.drop_index(nome, table_name=tabela, **opcoes)
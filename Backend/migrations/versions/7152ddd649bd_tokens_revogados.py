@@ -0,0 +1,34 @@
+"""Tokens JWT revogados no logout
+
+Revision ID: 7152ddd649bd
+Revises: fe1354b5ac96
+Create Date: 2026-10-18 16:02:41.518230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7152ddd649bd'
+down_revision = 'fe1354b5ac96'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tokens_revogados',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=32), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=True),
+    sa.Column('expira_em', sa.DateTime(), nullable=False),
+    sa.Column('revogado_em', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('jti')
+    )
+    op.create_index('ix_tokens_revogados_expira_em', 'tokens_revogados', ['expira_em'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_tokens_revogados_expira_em', table_name='tokens_revogados')
+    op.drop_table('tokens_revogados')
@@ -0,0 +1,110 @@
+"""Particionamento mensal de leituras por data_inicial
+
+Revision ID: 78e02a1c761a
+Revises: 4fda04326c44
+Create Date: 2026-10-18 10:41:07.552913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '78e02a1c761a'
+down_revision = '4fda04326c44'
+branch_labels = None
+depends_on = None
+
+
+# Meses futuros com partição já criada; depois disso `flask particoes manter` assume
+MESES_FUTUROS = 3
+
+COLUNAS = """
+    id integer NOT NULL DEFAULT nextval('leituras_id_seq'::regclass),
+    umidade double precision,
+    temperatura double precision,
+    pressao double precision,
+    lote varchar(100),
+    data_inicial timestamp without time zone,
+    data_final timestamp without time zone
+"""
+
+# Tabela particionada só aceita chave primária que inclua a coluna de partição
+CHAVE_PARTICIONADA = 'PRIMARY KEY (id, data_inicial)'
+
+
+def _somar_meses(data, meses):
+    indice = data.year * 12 + data.month - 1 + meses
+    return data.replace(year=indice // 12, month=indice % 12 + 1, day=1,
+                        hour=0, minute=0, second=0, microsecond=0)
+
+
+def _criar_indices():
+    # Declarados no pai, são criados em cada partição (atual e futuras); buscas
+    # por id usam o índice da chave primária (id, data_inicial)
+    op.create_index('ix_leituras_lote_data_inicial_id', 'leituras', ['lote', 'data_inicial', 'id'], unique=False)
+    op.create_index('ix_leituras_data_inicial_brin', 'leituras', ['data_inicial'], unique=False,
+                    postgresql_using='brin')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE leituras RENAME TO leituras_legado')
+    # A sequência de ids passa a pertencer à nova tabela para não ser removida com a antiga
+    op.execute('ALTER SEQUENCE leituras_id_seq OWNED BY NONE')
+
+    # A chave primária torna data_inicial obrigatória: leituras antigas sem ela
+    # ficam com data_final ou, sem nenhuma das duas, com a hora da migração (a
+    # ingestão passa a preencher a hora de chegada, ver ingestao.datar_chegada)
+    op.execute('UPDATE leituras_legado SET data_inicial = COALESCE(data_final, CURRENT_TIMESTAMP::timestamp) '
+               'WHERE data_inicial IS NULL')
+    op.execute(f'CREATE TABLE leituras ({COLUNAS}, {CHAVE_PARTICIONADA}) PARTITION BY RANGE (data_inicial)')
+    op.execute('ALTER SEQUENCE leituras_id_seq OWNED BY leituras.id')
+
+    # Recebe datas sem partição mensal
+    op.execute('CREATE TABLE leituras_default PARTITION OF leituras DEFAULT')
+
+    menor, maior = bind.execute(sa.text(
+        'SELECT min(data_inicial), max(data_inicial) FROM leituras_legado'
+    )).fetchone()
+    agora = bind.execute(sa.text('SELECT CURRENT_TIMESTAMP::timestamp')).scalar()
+
+    mes = _somar_meses(menor or agora, 0)
+    ultimo = _somar_meses(max(maior or agora, agora), MESES_FUTUROS)
+    while mes <= ultimo:
+        proximo = _somar_meses(mes, 1)
+        op.execute(
+            f"CREATE TABLE leituras_{mes:%Y_%m} PARTITION OF leituras "
+            f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{proximo.isoformat()}')"
+        )
+        mes = proximo
+
+    op.execute('INSERT INTO leituras SELECT id, umidade, temperatura, pressao, lote, data_inicial, data_final '
+               'FROM leituras_legado')
+    op.execute('DROP TABLE leituras_legado')
+
+    _criar_indices()
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE leituras RENAME TO leituras_particionada')
+    op.execute('ALTER SEQUENCE leituras_id_seq OWNED BY NONE')
+
+    op.execute(f'CREATE TABLE leituras ({COLUNAS}, PRIMARY KEY (id))')
+    op.execute('ALTER SEQUENCE leituras_id_seq OWNED BY leituras.id')
+    op.execute('INSERT INTO leituras SELECT id, umidade, temperatura, pressao, lote, data_inicial, data_final '
+               'FROM leituras_particionada')
+
+    # Remove o pai junto com todas as partições ainda anexadas
+    op.execute('DROP TABLE leituras_particionada CASCADE')
+
+    op.create_index('ix_leituras_lote_data_inicial_id', 'leituras', ['lote', 'data_inicial', 'id'], unique=False)
+    op.create_index('ix_leituras_data_inicial_brin', 'leituras', ['data_inicial'], unique=False,
+                    postgresql_using='brin')
@@ -0,0 +1,52 @@
+"""Estado do detector de anomalias e anomalias detectadas
+
+Revision ID: a95e42e16cff
+Revises: b4f9798626d8
+Create Date: 2026-10-18 13:27:41.205318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a95e42e16cff'
+down_revision = 'b4f9798626d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('anomalias_estado',
+    sa.Column('lote', sa.String(length=100), nullable=False),
+    sa.Column('metrica', sa.String(length=20), nullable=False),
+    sa.Column('n', sa.Integer(), nullable=False),
+    sa.Column('media', sa.Float(), nullable=False),
+    sa.Column('m2', sa.Float(), nullable=False),
+    sa.Column('ewma', sa.Float(), nullable=True),
+    sa.Column('ewm_var', sa.Float(), nullable=False),
+    sa.Column('ultimo', sa.Float(), nullable=True),
+    sa.Column('repeticoes', sa.Integer(), nullable=False),
+    sa.Column('em_deriva', sa.Boolean(), nullable=False),
+    sa.Column('atualizado_em', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('lote', 'metrica')
+    )
+    op.create_table('anomalias_leituras',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('lote', sa.String(length=100), nullable=False),
+    sa.Column('data_inicial', sa.DateTime(), nullable=True),
+    sa.Column('metrica', sa.String(length=20), nullable=False),
+    sa.Column('tipo', sa.String(length=20), nullable=False),
+    sa.Column('valor', sa.Float(), nullable=False),
+    sa.Column('referencia', sa.Float(), nullable=True),
+    sa.Column('escore', sa.Float(), nullable=True),
+    sa.Column('criado_em', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_anomalias_leituras_lote_data_inicial', 'anomalias_leituras', ['lote', 'data_inicial'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_anomalias_leituras_lote_data_inicial', table_name='anomalias_leituras')
+    op.drop_table('anomalias_leituras')
+    op.drop_table('anomalias_estado')
@@ -0,0 +1,37 @@
+"""Tabela de alarmes de leituras fora da faixa ideal
+
+Revision ID: b4f9798626d8
+Revises: dd891690385d
+Create Date: 2026-10-18 12:52:09.731446
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4f9798626d8'
+down_revision = 'dd891690385d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('alarmes_leituras',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('lote', sa.String(length=100), nullable=False),
+    sa.Column('data_inicial', sa.DateTime(), nullable=True),
+    sa.Column('metrica', sa.String(length=20), nullable=False),
+    sa.Column('valor', sa.Float(), nullable=False),
+    sa.Column('ideal', sa.Float(), nullable=False),
+    sa.Column('desvio', sa.Float(), nullable=False),
+    sa.Column('parametro_id', sa.Integer(), nullable=True),
+    sa.Column('criado_em', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_alarmes_leituras_lote_data_inicial', 'alarmes_leituras', ['lote', 'data_inicial'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_alarmes_leituras_lote_data_inicial', table_name='alarmes_leituras')
+    op.drop_table('alarmes_leituras')
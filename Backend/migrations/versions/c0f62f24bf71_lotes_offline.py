@@ -0,0 +1,38 @@
+"""Sequência de blocos do envio offline por dispositivo
+
+Revision ID: c0f62f24bf71
+Revises: eb0e3da0e493
+Create Date: 2026-10-18 14:48:52.169304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c0f62f24bf71'
+down_revision = 'eb0e3da0e493'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('lotes_offline_dispositivos',
+    sa.Column('dispositivo', sa.String(length=100), nullable=False),
+    sa.Column('confirmado', sa.Integer(), nullable=False),
+    sa.Column('maior_recebido', sa.Integer(), nullable=False),
+    sa.Column('atualizado_em', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('dispositivo')
+    )
+    op.create_table('lotes_offline_blocos',
+    sa.Column('dispositivo', sa.String(length=100), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('quantidade', sa.Integer(), nullable=False),
+    sa.Column('recebido_em', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('dispositivo', 'seq')
+    )
+
+
+def downgrade():
+    op.drop_table('lotes_offline_blocos')
+    op.drop_table('lotes_offline_dispositivos')
@@ -0,0 +1,51 @@
+"""Tabelas de agregados por hora e por dia das leituras
+
+Revision ID: d5e0c310f860
+Revises: 78e02a1c761a
+Create Date: 2026-10-18 11:26:53.804117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e0c310f860'
+down_revision = '78e02a1c761a'
+branch_labels = None
+depends_on = None
+
+
+def _colunas():
+    colunas = [
+        sa.Column('lote', sa.String(length=100), nullable=False),
+        sa.Column('inicio', sa.DateTime(), nullable=False),
+        sa.Column('quantidade', sa.Integer(), nullable=False),
+    ]
+    for metrica in ('temperatura', 'umidade', 'pressao'):
+        colunas += [
+            sa.Column(f'{metrica}_n', sa.Integer(), nullable=False),
+            sa.Column(f'{metrica}_soma', sa.Float(), nullable=False),
+            sa.Column(f'{metrica}_soma_q', sa.Float(), nullable=False),
+            sa.Column(f'{metrica}_min', sa.Float(), nullable=True),
+            sa.Column(f'{metrica}_max', sa.Float(), nullable=True),
+        ]
+    return colunas
+
+
+def upgrade():
+    op.create_table('leituras_hourly',
+    *_colunas(),
+    sa.PrimaryKeyConstraint('lote', 'inicio')
+    )
+    op.create_table('leituras_daily',
+    *_colunas(),
+    sa.PrimaryKeyConstraint('lote', 'inicio')
+    )
+
+    # Preenchimento inicial: flask agregados reconstruir
+
+
+def downgrade():
+    op.drop_table('leituras_daily')
+    op.drop_table('leituras_hourly')
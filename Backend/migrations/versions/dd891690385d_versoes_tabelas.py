@@ -0,0 +1,28 @@
+"""Tabela de versões por tabela (validadores de ETag)
+
+Revision ID: dd891690385d
+Revises: d5e0c310f860
+Create Date: 2026-10-18 12:14:32.418906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'dd891690385d'
+down_revision = 'd5e0c310f860'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('versoes_tabelas',
+    sa.Column('tabela', sa.String(length=64), nullable=False),
+    sa.Column('versao', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('tabela')
+    )
+
+
+def downgrade():
+    op.drop_table('versoes_tabelas')
@@ -0,0 +1,52 @@
+"""Chave de deduplicação de leituras e chaves de idempotência
+
+Revision ID: eb0e3da0e493
+Revises: a95e42e16cff
+Create Date: 2026-10-18 14:02:15.734120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'eb0e3da0e493'
+down_revision = 'a95e42e16cff'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('leituras', sa.Column('sensor', sa.String(length=50), server_default='', nullable=False))
+
+    # Reenvios já gravados impediriam o índice único: fica a leitura mais antiga
+    # de cada chave. Depois rodar `flask agregados reconstruir`, pois as
+    # duplicadas também tinham sido somadas aos agregados.
+    op.execute("""
+        DELETE FROM leituras
+        WHERE lote IS NOT NULL AND data_inicial IS NOT NULL
+          AND id NOT IN (
+            SELECT min(id) FROM leituras
+            WHERE lote IS NOT NULL AND data_inicial IS NOT NULL
+            GROUP BY lote, sensor, data_inicial
+          )
+    """)
+
+    # No PostgreSQL o índice é criado no pai e propagado para cada partição
+    op.create_index('uq_leituras_lote_sensor_data_inicial', 'leituras', ['lote', 'sensor', 'data_inicial'],
+                    unique=True)
+
+    op.create_table('chaves_idempotencia',
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('chave', sa.String(length=255), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('resposta', sa.Text(), nullable=True),
+    sa.Column('criado_em', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('usuario_id', 'chave')
+    )
+
+
+def downgrade():
+    op.drop_table('chaves_idempotencia')
+    op.drop_index('uq_leituras_lote_sensor_data_inicial', table_name='leituras')
+    op.drop_column('leituras', 'sensor')
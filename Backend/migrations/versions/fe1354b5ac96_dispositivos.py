@@ -0,0 +1,36 @@
+"""Dispositivos com chave de API própria
+
+Revision ID: fe1354b5ac96
+Revises: c0f62f24bf71
+Create Date: 2026-10-18 15:21:06.904417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fe1354b5ac96'
+down_revision = 'c0f62f24bf71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('dispositivos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('nome', sa.String(length=100), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('identificador', sa.String(length=16), nullable=False),
+    sa.Column('resumo_segredo', sa.String(length=64), nullable=False),
+    sa.Column('ativo', sa.Boolean(), nullable=False),
+    sa.Column('criado_em', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['usuario_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('identificador'),
+    sa.UniqueConstraint('nome')
+    )
+
+
+def downgrade():
+    op.drop_table('dispositivos')
@@ -5,6 +5,8 @@ from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 from flask import current_app, request
+import math
+import secrets
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -26,7 +28,9 @@ class User(db.Model):
             {
                 'id': self.id,
                 'is_admin': self.is_admin,
-                'exp': datetime.utcnow() + timedelta(seconds=expires_in)
+                'exp': datetime.utcnow() + timedelta(seconds=expires_in),
+                # Identificador único do token, usado na revogação (logout)
+                'jti': secrets.token_hex(16)
             },
             secret_key,
             algorithm='HS256'
@@ -49,17 +53,109 @@ class Item(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
 class Leitura(db.Model):
+    # No PostgreSQL a tabela é particionada por mês em data_inicial (ver particoes.py)
     __tablename__ = 'leituras'
+    __table_args__ = (
+        # Filtro por lote ordenado por data (listagem, séries, paginação por cursor)
+        db.Index('ix_leituras_lote_data_inicial_id', 'lote', 'data_inicial', 'id'),
+        # Faixas de tempo sem filtro de lote; BRIN por ser tabela só de inserção em ordem de tempo
+        db.Index('ix_leituras_data_inicial_brin', 'data_inicial', postgresql_using='brin'),
+        # Chave de deduplicação dos reenvios do firmware (ver ingestao.py); inclui
+        # data_inicial, exigência do PostgreSQL para índice único em tabela particionada
+        db.Index('uq_leituras_lote_sensor_data_inicial', 'lote', 'sensor', 'data_inicial', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     umidade = db.Column(db.Float, nullable=True)
     temperatura = db.Column(db.Float, nullable=True)
     pressao = db.Column(db.Float, nullable=True)
     lote = db.Column(db.String(100), nullable=True)
+    # NOT NULL no PostgreSQL, onde compõe a chave primária (id, data_inicial) das
+    # partições; a ingestão preenche a hora de chegada quando o dispositivo não envia
     data_inicial = db.Column(db.DateTime, nullable=True)
     data_final = db.Column(db.DateTime, nullable=True)
+    # Identificação opcional do sensor; '' quando o dispositivo tem um só
+    sensor = db.Column(db.String(50), nullable=False, default='', server_default='')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'umidade': self.umidade,
+            'temperatura': self.temperatura,
+            'pressao': self.pressao,
+            'lote': self.lote,
+            'sensor': self.sensor,
+            'data_inicial': self.data_inicial.isoformat() if self.data_inicial else None,
+            'data_final': self.data_final.isoformat() if self.data_final else None
+        }
+
+class AgregadoLeituraMixin:
+    """
+    Colunas comuns dos agregados de leituras por lote e intervalo de tempo.
+    Guardam contagem, soma e soma dos quadrados para permitir atualização
+    incremental da média e do desvio padrão.
+    """
+    lote = db.Column(db.String(100), primary_key=True)
+    inicio = db.Column(db.DateTime, primary_key=True)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+
+    temperatura_n = db.Column(db.Integer, nullable=False, default=0)
+    temperatura_soma = db.Column(db.Float, nullable=False, default=0)
+    temperatura_soma_q = db.Column(db.Float, nullable=False, default=0)
+    temperatura_min = db.Column(db.Float, nullable=True)
+    temperatura_max = db.Column(db.Float, nullable=True)
+
+    umidade_n = db.Column(db.Integer, nullable=False, default=0)
+    umidade_soma = db.Column(db.Float, nullable=False, default=0)
+    umidade_soma_q = db.Column(db.Float, nullable=False, default=0)
+    umidade_min = db.Column(db.Float, nullable=True)
+    umidade_max = db.Column(db.Float, nullable=True)
+
+    pressao_n = db.Column(db.Integer, nullable=False, default=0)
+    pressao_soma = db.Column(db.Float, nullable=False, default=0)
+    pressao_soma_q = db.Column(db.Float, nullable=False, default=0)
+    pressao_min = db.Column(db.Float, nullable=True)
+    pressao_max = db.Column(db.Float, nullable=True)
+
+    def estatisticas(self, metrica):
+        n = getattr(self, f'{metrica}_n') or 0
+        soma = getattr(self, f'{metrica}_soma') or 0.0
+        soma_q = getattr(self, f'{metrica}_soma_q') or 0.0
+
+        desvio = None
+        if n > 1:
+            # Desvio padrão amostral; max() absorve erro de arredondamento negativo
+            desvio = math.sqrt(max(soma_q - soma * soma / n, 0.0) / (n - 1))
+
+        return {
+            'n': n,
+            'min': getattr(self, f'{metrica}_min'),
+            'max': getattr(self, f'{metrica}_max'),
+            'media': soma / n if n else None,
+            'desvio_padrao': desvio
+        }
+
+    def to_dict(self):
+        return {
+            'lote': self.lote,
+            'inicio': self.inicio.isoformat() if self.inicio else None,
+            'quantidade': self.quantidade,
+            'temperatura': self.estatisticas('temperatura'),
+            'umidade': self.estatisticas('umidade'),
+            'pressao': self.estatisticas('pressao')
+        }
+
+class AgregadoHora(AgregadoLeituraMixin, db.Model):
+    __tablename__ = 'leituras_hourly'
+
+class AgregadoDia(AgregadoLeituraMixin, db.Model):
+    __tablename__ = 'leituras_daily'
 
 class Parametro(db.Model):
+    __table_args__ = (
+        db.Index('ix_parametro_empresa_lote', 'empresa', 'lote'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     empresa = db.Column(db.String(100), nullable=False)
     lote = db.Column(db.String(50), nullable=False)
@@ -85,8 +181,114 @@ class Parametro(db.Model):
             'data_criacao': self.data_criacao.isoformat()
         }
 
+class AlarmeLeitura(db.Model):
+    # Leitura fora da faixa do parâmetro do lote (ver desvios.py). A leitura é
+    # identificada por (lote, data_inicial): a inserção por COPY não devolve ids
+    __tablename__ = 'alarmes_leituras'
+    __table_args__ = (
+        db.Index('ix_alarmes_leituras_lote_data_inicial', 'lote', 'data_inicial'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    lote = db.Column(db.String(100), nullable=False)
+    data_inicial = db.Column(db.DateTime, nullable=True)
+    metrica = db.Column(db.String(20), nullable=False)
+    valor = db.Column(db.Float, nullable=False)
+    ideal = db.Column(db.Float, nullable=False)
+    desvio = db.Column(db.Float, nullable=False)
+    parametro_id = db.Column(db.Integer, nullable=True)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'lote': self.lote,
+            'data_inicial': self.data_inicial.isoformat() if self.data_inicial else None,
+            'metrica': self.metrica,
+            'valor': self.valor,
+            'ideal': self.ideal,
+            'desvio': self.desvio,
+            'parametro_id': self.parametro_id,
+            'criado_em': self.criado_em.isoformat() if self.criado_em else None
+        }
+
+class EstadoAnomalia(db.Model):
+    # Estatísticas correntes de uma métrica de um lote (ver anomalias.py); é o
+    # checkpoint do detector, atualizado a cada lote de leituras recebido
+    __tablename__ = 'anomalias_estado'
+
+    lote = db.Column(db.String(100), primary_key=True)
+    metrica = db.Column(db.String(20), primary_key=True)
+    n = db.Column(db.Integer, nullable=False, default=0)
+    media = db.Column(db.Float, nullable=False, default=0.0)
+    m2 = db.Column(db.Float, nullable=False, default=0.0)
+    ewma = db.Column(db.Float, nullable=True)
+    ewm_var = db.Column(db.Float, nullable=False, default=0.0)
+    ultimo = db.Column(db.Float, nullable=True)
+    repeticoes = db.Column(db.Integer, nullable=False, default=0)
+    em_deriva = db.Column(db.Boolean, nullable=False, default=False)
+    atualizado_em = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'lote': self.lote,
+            'metrica': self.metrica,
+            'n': self.n,
+            'media': self.media,
+            'desvio_padrao': math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else None,
+            'ewma': self.ewma,
+            'ewm_desvio_padrao': math.sqrt(self.ewm_var) if self.ewma is not None else None,
+            'ultimo': self.ultimo,
+            'repeticoes': self.repeticoes,
+            'em_deriva': self.em_deriva,
+            'atualizado_em': self.atualizado_em.isoformat() if self.atualizado_em else None
+        }
+
+class AnomaliaLeitura(db.Model):
+    # Leitura fora do padrão recente do próprio lote: pico, travado ou deriva
+    __tablename__ = 'anomalias_leituras'
+    __table_args__ = (
+        db.Index('ix_anomalias_leituras_lote_data_inicial', 'lote', 'data_inicial'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    lote = db.Column(db.String(100), nullable=False)
+    data_inicial = db.Column(db.DateTime, nullable=True)
+    metrica = db.Column(db.String(20), nullable=False)
+    tipo = db.Column(db.String(20), nullable=False)
+    valor = db.Column(db.Float, nullable=False)
+    referencia = db.Column(db.Float, nullable=True)
+    escore = db.Column(db.Float, nullable=True)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'lote': self.lote,
+            'data_inicial': self.data_inicial.isoformat() if self.data_inicial else None,
+            'metrica': self.metrica,
+            'tipo': self.tipo,
+            'valor': self.valor,
+            'referencia': self.referencia,
+            'escore': self.escore,
+            'criado_em': self.criado_em.isoformat() if self.criado_em else None
+        }
+
+class VersaoTabela(db.Model):
+    # Incrementada a cada escrita na tabela; validador barato para ETag (ver versoes.py)
+    __tablename__ = 'versoes_tabelas'
+
+    tabela = db.Column(db.String(64), primary_key=True)
+    versao = db.Column(db.BigInteger, nullable=False, default=0)
+
 class Log(db.Model):
     __tablename__ = 'logs'
+    __table_args__ = (
+        # Índices usados pelos filtros de GET /api/logs (ordenados por data_hora DESC)
+        db.Index('ix_logs_data_hora', 'data_hora'),
+        db.Index('ix_logs_usuario_id_data_hora', 'usuario_id', 'data_hora'),
+        db.Index('ix_logs_acao_data_hora', 'acao', 'data_hora'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -143,4 +345,79 @@ class Log(db.Model):
             try:
                 db.session.rollback()
             except:
-                pass
\ No newline at end of file
+                pass
+
+class ChaveIdempotencia(db.Model):
+    # Resposta de um POST /api/leituras enviado com Idempotency-Key, devolvida
+    # de novo quando o cliente repete a mesma chave (ver idempotencia.py)
+    __tablename__ = 'chaves_idempotencia'
+
+    usuario_id = db.Column(db.Integer, primary_key=True)
+    chave = db.Column(db.String(255), primary_key=True)
+    status_code = db.Column(db.Integer, nullable=True)
+    resposta = db.Column(db.Text, nullable=True)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class SequenciaDispositivo(db.Model):
+    # Confirmação acumulada do envio em blocos de um dispositivo (ver lote_offline.py):
+    # todos os blocos até 'confirmado' foram gravados
+    __tablename__ = 'lotes_offline_dispositivos'
+
+    dispositivo = db.Column(db.String(100), primary_key=True)
+    # Dono da numeração: só ele (ou um administrador) envia e consulta blocos
+    usuario_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    confirmado = db.Column(db.Integer, nullable=False, default=0)
+    maior_recebido = db.Column(db.Integer, nullable=False, default=0)
+    atualizado_em = db.Column(db.DateTime, nullable=True)
+
+class BlocoOffline(db.Model):
+    # Bloco recebido fora de ordem, acima da confirmação acumulada; sai da
+    # tabela quando a lacuna antes dele é preenchida
+    __tablename__ = 'lotes_offline_blocos'
+
+    dispositivo = db.Column(db.String(100), primary_key=True)
+    seq = db.Column(db.Integer, primary_key=True)
+    quantidade = db.Column(db.Integer, nullable=False)
+    # Bloco recusado (conteúdo inválido): conta como recebido para a confirmação avançar
+    rejeitado = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    recebido_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class Dispositivo(db.Model):
+    # Incubadora que envia leituras com chave própria em vez de login (ver dispositivos.py).
+    # Guarda só o HMAC do segredo; a chave completa é mostrada uma única vez.
+    __tablename__ = 'dispositivos'
+
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), unique=True, nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    identificador = db.Column(db.String(16), unique=True, nullable=False)
+    resumo_segredo = db.Column(db.String(64), nullable=False)
+    ativo = db.Column(db.Boolean, nullable=False, default=True)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+    usuario = db.relationship('User')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'nome': self.nome,
+            'usuario_id': self.usuario_id,
+            'identificador': self.identificador,
+            'ativo': self.ativo,
+            'criado_em': self.criado_em.isoformat() if self.criado_em else None
+        }
+
+class TokenRevogado(db.Model):
+    # JWT encerrado antes do exp (logout), pelo jti; a linha pode sair depois de
+    # expira_em. Sem FK para users: a revogação vale mesmo se o usuário for
+    # removido. O id crescente é o cursor da atualização incremental (ver revogacao.py).
+    __tablename__ = 'tokens_revogados'
+    __table_args__ = (
+        db.Index('ix_tokens_revogados_expira_em', 'expira_em'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(32), unique=True, nullable=False)
+    usuario_id = db.Column(db.Integer, nullable=True)
+    expira_em = db.Column(db.DateTime, nullable=False)
+    revogado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,70 @@
+# paginacao.py - Paginação por cursor (keyset) sobre (data_inicial, id)
+
+import base64
+import json
+
+from sqlalchemy import and_, or_, tuple_
+
+from ingestao import converter_data
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(data_inicial, id):
+    """
+    Gera um cursor opaco a partir da última linha da página
+    """
+    chave = [data_inicial.isoformat() if data_inicial else None, id]
+    return base64.urlsafe_b64encode(json.dumps(chave).encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """
+    Devolve (data_inicial, id) a partir do cursor recebido do cliente
+    """
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        data_inicial, id = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        return converter_data(data_inicial), int(id)
+    except (TypeError, ValueError):
+        raise CursorInvalido('Cursor inválido')
+
+
+def ordenar_recentes(query, modelo):
+    """
+    Ordenação estável usada pelo cursor: data_inicial DESC (nulos primeiro), id DESC.
+    É a ordem de uma varredura reversa do índice (lote, data_inicial, id).
+    """
+    return query.order_by(modelo.data_inicial.desc().nullsfirst(), modelo.id.desc())
+
+
+def aplicar_cursor(query, modelo, cursor):
+    """
+    Filtra as linhas que vêm depois do cursor na ordenação de ordenar_recentes
+    """
+    data_inicial, id = decodificar_cursor(cursor)
+
+    if data_inicial is None:
+        return query.filter(or_(
+            and_(modelo.data_inicial.is_(None), modelo.id < id),
+            modelo.data_inicial.isnot(None)
+        ))
+
+    return query.filter(tuple_(modelo.data_inicial, modelo.id) < (data_inicial, id))
+
+
+def obter_limite(valor, padrao, maximo, nome='limite'):
+    """
+    Converte o parâmetro 'nome' (limite, pontos...) aplicando o teto do servidor
+    """
+    if valor is None:
+        return padrao
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"Parâmetro '{nome}' deve ser um número inteiro")
+    if limite < 1:
+        raise ValueError(f"Parâmetro '{nome}' deve ser maior que zero")
+    return min(limite, maximo)
@@ -0,0 +1,167 @@
+# particoes.py - Partições mensais de leituras por data_inicial (PostgreSQL)
+
+import re
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+from extensions import db
+
+TABELA = 'leituras'
+PARTICAO_PADRAO = 'leituras_default'
+_PADRAO_NOME = re.compile(r'^leituras_(\d{4})_(\d{2})$')
+
+
+def inicio_do_mes(data):
+    return datetime(data.year, data.month, 1)
+
+
+def somar_meses(data, meses):
+    indice = data.year * 12 + data.month - 1 + meses
+    return datetime(indice // 12, indice % 12 + 1, 1)
+
+
+def nome_particao(inicio):
+    return f'{TABELA}_{inicio:%Y_%m}'
+
+
+def mes_da_particao(nome):
+    """
+    Devolve o primeiro dia do mês de uma partição 'leituras_AAAA_MM' (None para as demais)
+    """
+    encontrado = _PADRAO_NOME.match(nome)
+    if not encontrado:
+        return None
+    return datetime(int(encontrado.group(1)), int(encontrado.group(2)), 1)
+
+
+def meses_entre(inicio, fim):
+    """
+    Primeiro dia de cada mês de 'inicio' até o mês de 'fim', inclusive
+    """
+    meses = []
+    atual = inicio_do_mes(inicio)
+    while atual <= fim:
+        meses.append(atual)
+        atual = somar_meses(atual, 1)
+    return meses
+
+
+def listar_particoes(conexao):
+    """
+    Nomes das partições anexadas a leituras
+    """
+    return [linha[0] for linha in conexao.execute(text("""
+        SELECT filha.relname
+        FROM pg_inherits
+        JOIN pg_class filha ON filha.oid = pg_inherits.inhrelid
+        JOIN pg_class pai ON pai.oid = pg_inherits.inhparent
+        WHERE pai.relname = :tabela
+        ORDER BY filha.relname
+    """), {'tabela': TABELA})]
+
+
+def criar_particao(conexao, inicio):
+    """
+    Cria a partição do mês de 'inicio'. Linhas desse mês que tenham caído na
+    partição padrão são movidas para a nova antes do ATTACH.
+    """
+    inicio = inicio_do_mes(inicio)
+    fim = somar_meses(inicio, 1)
+    nome = nome_particao(inicio)
+    limites = {'inicio': inicio, 'fim': fim}
+
+    conexao.execute(text(f'CREATE TABLE {nome} (LIKE {TABELA} INCLUDING DEFAULTS)'))
+    conexao.execute(text(f"""
+        WITH movidas AS (
+            DELETE FROM {PARTICAO_PADRAO}
+            WHERE data_inicial >= :inicio AND data_inicial < :fim
+            RETURNING *
+        )
+        INSERT INTO {nome} SELECT * FROM movidas
+    """), limites)
+    conexao.execute(text(
+        f"ALTER TABLE {TABELA} ATTACH PARTITION {nome} "
+        f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fim.isoformat()}')"
+    ))
+    return nome
+
+
+def desanexar_particao(conexao, nome, remover=False):
+    """
+    Retira a partição de leituras (a tabela continua existindo, salvo com remover=True)
+    """
+    conexao.execute(text(f'ALTER TABLE {TABELA} DETACH PARTITION {nome}'))
+    if remover:
+        conexao.execute(text(f'DROP TABLE {nome}'))
+
+
+def manter_particoes(conexao, meses_futuros=3, reter_meses=None, remover=False, agora=None):
+    """
+    Garante partições do mês atual até 'meses_futuros' à frente e, se 'reter_meses'
+    for informado, desanexa as partições anteriores a essa janela
+    """
+    agora = agora or datetime.utcnow()
+    existentes = {mes_da_particao(nome): nome for nome in listar_particoes(conexao)}
+    existentes.pop(None, None)
+
+    criadas = []
+    for mes in meses_entre(agora, somar_meses(agora, meses_futuros)):
+        if mes not in existentes:
+            criadas.append(criar_particao(conexao, mes))
+
+    desanexadas = []
+    if reter_meses:
+        limite = somar_meses(inicio_do_mes(agora), -reter_meses)
+        for mes, nome in sorted(existentes.items()):
+            if mes < limite:
+                desanexar_particao(conexao, nome, remover)
+                desanexadas.append(nome)
+
+    return {'criadas': criadas, 'desanexadas': desanexadas}
+
+
+particoes_cli = AppGroup('particoes', help='Gerencia as partições mensais da tabela leituras.')
+
+
+@particoes_cli.command('manter')
+@click.option('--meses-futuros', type=int, default=None,
+              help='Meses à frente com partição pré-criada (padrão: PARTICOES_MESES_FUTUROS).')
+@click.option('--reter-meses', type=int, default=None,
+              help='Desanexa partições mais antigas que N meses (padrão: PARTICOES_RETER_MESES).')
+@click.option('--remover', is_flag=True, help='Remove (DROP) as partições desanexadas.')
+def manter_command(meses_futuros, reter_meses, remover):
+    """Cria partições futuras e desanexa as antigas (agendar diariamente no cron)."""
+    if db.engine.dialect.name != 'postgresql':
+        click.echo('Particionamento disponível apenas no PostgreSQL.')
+        return
+
+    if meses_futuros is None:
+        meses_futuros = current_app.config['PARTICOES_MESES_FUTUROS']
+    if reter_meses is None:
+        reter_meses = current_app.config['PARTICOES_RETER_MESES']
+
+    with db.engine.begin() as conexao:
+        resultado = manter_particoes(conexao, meses_futuros, reter_meses, remover)
+
+    for nome in resultado['criadas']:
+        click.echo(f'Criada: {nome}')
+    for nome in resultado['desanexadas']:
+        click.echo(f"{'Removida' if remover else 'Desanexada'}: {nome}")
+    if not resultado['criadas'] and not resultado['desanexadas']:
+        click.echo('Nada a fazer.')
+
+
+@particoes_cli.command('listar')
+def listar_command():
+    """Lista as partições de leituras."""
+    if db.engine.dialect.name != 'postgresql':
+        click.echo('Particionamento disponível apenas no PostgreSQL.')
+        return
+
+    with db.engine.connect() as conexao:
+        for nome in listar_particoes(conexao):
+            click.echo(nome)
@@ -0,0 +1,165 @@
+# revogacao.py - Revogação de JWT (logout) conferida por filtro de Bloom e conjunto exato em memória
+
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+from extensions import db
+from models import TokenRevogado
+from versoes import obter_versoes
+
+# Ids relidos abaixo do último visto: um logout cuja transação confirmou depois
+# de outra com id maior ainda é encontrado na próxima atualização
+SOBREPOSICAO_IDS = 64
+
+
+class FiltroBloom:
+    """
+    Conjunto aproximado de tamanho fixo: 'in' nunca dá falso negativo e dá
+    falso positivo com probabilidade ~'taxa_falsos' até 'capacidade' itens
+    """
+
+    def __init__(self, capacidade, taxa_falsos=0.01):
+        self.capacidade = max(1, capacidade)
+        self.bits = max(64, math.ceil(-self.capacidade * math.log(taxa_falsos) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / self.capacidade * math.log(2)))
+        self._vetor = bytearray((self.bits + 7) // 8)
+
+    def _posicoes(self, item):
+        # Hash duplo (Kirsch-Mitzenmacher): k posições a partir de um único resumo
+        resumo = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(resumo[:8], 'little')
+        h2 = int.from_bytes(resumo[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def adicionar(self, item):
+        for posicao in self._posicoes(item):
+            self._vetor[posicao >> 3] |= 1 << (posicao & 7)
+
+    def __contains__(self, item):
+        return all(self._vetor[posicao >> 3] & (1 << (posicao & 7)) for posicao in self._posicoes(item))
+
+
+class RegistroRevogacoes:
+    """
+    jti revogados e ainda não expirados, em memória. O filtro de Bloom responde
+    o caso comum (token não revogado) sem consultar o conjunto nem o banco; um
+    positivo é confirmado no dicionário exato. Como em RegistroDispositivos, a
+    versão da tabela é conferida no máximo a cada 'intervalo_verificacao'
+    segundos e, quando muda, só as linhas novas são lidas.
+    """
+
+    def __init__(self, intervalo_verificacao=5, capacidade_inicial=1024):
+        self.intervalo_verificacao = intervalo_verificacao
+        self.capacidade_inicial = capacidade_inicial
+        self.versao = None
+        self.ultimo_id = 0
+        self.recargas = 0
+        self._verificado_em = 0
+        self._lock = threading.Lock()
+        self._expiracoes = {}
+        self._filtro = FiltroBloom(capacidade_inicial)
+
+    def revogado(self, jti):
+        self._atualizar()
+        return jti in self._filtro and jti in self._expiracoes
+
+    def adicionar(self, jti, expira_em):
+        with self._lock:
+            self._adicionar(jti, expira_em)
+
+    def invalidar(self):
+        self._verificado_em = 0
+
+    def _adicionar(self, jti, expira_em):
+        if jti in self._expiracoes:
+            return
+        # Conjunto exato antes do filtro: quem achar o jti no filtro o acha no conjunto
+        self._expiracoes[jti] = expira_em
+        if len(self._expiracoes) > self._filtro.capacidade:
+            self._reconstruir()
+        else:
+            self._filtro.adicionar(jti)
+
+    def _reconstruir(self):
+        # Filtro cheio: descarta os já expirados e dobra a capacidade
+        agora = datetime.utcnow()
+        self._expiracoes = {jti: expira for jti, expira in self._expiracoes.items() if expira > agora}
+        filtro = FiltroBloom(max(self.capacidade_inicial, 2 * len(self._expiracoes)))
+        for jti in self._expiracoes:
+            filtro.adicionar(jti)
+        self._filtro = filtro
+
+    def _atualizar(self):
+        agora = time.monotonic()
+        if self.versao is not None and agora - self._verificado_em < self.intervalo_verificacao:
+            return
+
+        with self._lock:
+            if self.versao is not None and agora - self._verificado_em < self.intervalo_verificacao:
+                return
+
+            versao = obter_versoes(['tokens_revogados'])[0]
+            if versao != self.versao:
+                novos = db.session.query(TokenRevogado.id, TokenRevogado.jti, TokenRevogado.expira_em).filter(
+                    TokenRevogado.id > self.ultimo_id - SOBREPOSICAO_IDS,
+                    TokenRevogado.expira_em > datetime.utcnow()
+                ).all()
+                for id, jti, expira_em in novos:
+                    self._adicionar(jti, expira_em)
+                    self.ultimo_id = max(self.ultimo_id, id)
+                self.versao = versao
+                self.recargas += 1
+            self._verificado_em = agora
+
+
+registro_revogacoes = RegistroRevogacoes()
+
+
+def init_app(app):
+    app.config.setdefault('REVOGACAO_REGISTRO_VERIFICACAO', 5)
+    app.config.setdefault('REVOGACAO_FILTRO_CAPACIDADE', 1024)
+    registro_revogacoes.intervalo_verificacao = app.config['REVOGACAO_REGISTRO_VERIFICACAO']
+    registro_revogacoes.capacidade_inicial = app.config['REVOGACAO_FILTRO_CAPACIDADE']
+
+
+def token_revogado(dados):
+    """
+    True se o payload decodificado pertence a um token revogado. Tokens
+    emitidos antes do jti existir não podem ser revogados e valem até o exp.
+    """
+    jti = dados.get('jti')
+    return jti is not None and registro_revogacoes.revogado(jti)
+
+
+def revogar_token(dados):
+    """
+    Registra a revogação do token na sessão atual (o commit fica a cargo de
+    quem chama) e já a aplica neste processo; os demais workers a veem na
+    próxima conferência de versão.
+    """
+    jti = dados.get('jti')
+    if jti is None:
+        return False
+
+    expira_em = datetime.utcfromtimestamp(dados['exp'])
+    if TokenRevogado.query.filter_by(jti=jti).first() is None:
+        db.session.add(TokenRevogado(jti=jti, usuario_id=dados.get('id'), expira_em=expira_em))
+    registro_revogacoes.adicionar(jti, expira_em)
+    return True
+
+
+revogacao_cli = AppGroup('revogacoes', help='Mantém a tabela tokens_revogados.')
+
+
+@revogacao_cli.command('limpar')
+def limpar_command():
+    """Remove as revogações de tokens já expirados."""
+    removidos = TokenRevogado.query.filter(TokenRevogado.expira_em <= datetime.utcnow()).delete()
+    db.session.commit()
+    click.echo(f'{removidos} revogações expiradas removidas.')
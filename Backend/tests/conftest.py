@@ -12,8 +12,12 @@ sys.path.insert(0, BACKEND_DIR)
 
 from app import app as flask_app
 from extensions import db
-from models import User, Parametro, Leitura, Log
+from models import (User, Parametro, Leitura, Log, AgregadoHora, AgregadoDia, AlarmeLeitura,
+                    AnomaliaLeitura, EstadoAnomalia, ChaveIdempotencia, SequenciaDispositivo,
+                    BlocoOffline, Dispositivo, TokenRevogado)
 from test_config import TestConfig
+from cache_parametros import invalidar_parametros
+from login import limite_ip, limite_usuario
 from datetime import datetime
 
 @pytest.fixture(scope='session')
@@ -44,10 +48,23 @@ def db_session(app):
     with app.app_context():
         # Limpar todos os dados antes de cada teste
         db.session.query(Log).delete()
+        db.session.query(AgregadoHora).delete()
+        db.session.query(AgregadoDia).delete()
+        db.session.query(AlarmeLeitura).delete()
+        db.session.query(AnomaliaLeitura).delete()
+        db.session.query(EstadoAnomalia).delete()
+        db.session.query(ChaveIdempotencia).delete()
+        db.session.query(SequenciaDispositivo).delete()
+        db.session.query(BlocoOffline).delete()
+        db.session.query(Dispositivo).delete()
+        db.session.query(TokenRevogado).delete()
         db.session.query(Leitura).delete()
         db.session.query(Parametro).delete()
         db.session.query(User).delete()
         db.session.commit()
+        invalidar_parametros()
+        limite_ip.limpar()
+        limite_usuario.limpar()
         
         yield db.session
         
@@ -112,6 +129,16 @@ def auth_headers_admin(token_usuario_admin):
         'Content-Type': 'application/json'
     }
 
+@pytest.fixture
+def headers_get_comum(token_usuario_comum):
+    """Headers HTTP de GET (sem corpo) com autenticação de usuário comum"""
+    return {'Authorization': f'Bearer {token_usuario_comum}'}
+
+@pytest.fixture
+def headers_get_admin(token_usuario_admin):
+    """Headers HTTP de GET (sem corpo) com autenticação de administrador"""
+    return {'Authorization': f'Bearer {token_usuario_admin}'}
+
 @pytest.fixture
 def parametro_exemplo(db_session, usuario_admin):
     """Cria um parâmetro de exemplo no banco"""
@@ -0,0 +1,94 @@
+"""
+Testes para os agregados por hora e por dia das leituras
+"""
+import pytest
+import json
+import statistics
+from datetime import datetime
+from extensions import db
+from models import Leitura, AgregadoHora, AgregadoDia
+from agregados import reconstruir_agregados
+
+
+def enviar_leituras(client, auth_headers, temperaturas, lote='LOTE_AGG', hora=10):
+    dados = [
+        {
+            'temperatura': t,
+            'umidade': 60.0,
+            'lote': lote,
+            'data_inicial': f'2024-05-01T{hora:02d}:{i:02d}:00'
+        }
+        for i, t in enumerate(temperaturas)
+    ]
+    response = client.post('/api/leituras', data=json.dumps(dados), headers=auth_headers)
+    assert response.status_code == 201
+
+
+class TestAgregadosIncrementais:
+    """Testes da atualização dos agregados na ingestão"""
+    
+    def test_ingestao_atualiza_hora_e_dia(self, client, auth_headers_comum, db_session):
+        """Testa que duas requisições se somam no mesmo intervalo"""
+        enviar_leituras(client, auth_headers_comum, [37.0, 37.5])
+        enviar_leituras(client, auth_headers_comum, [38.0, 36.5], hora=11)
+        
+        hora = AgregadoHora.query.filter_by(lote='LOTE_AGG', inicio=datetime(2024, 5, 1, 10)).one()
+        dia = AgregadoDia.query.filter_by(lote='LOTE_AGG', inicio=datetime(2024, 5, 1)).one()
+        
+        assert hora.quantidade == 2
+        assert dia.quantidade == 4
+        
+        estatisticas = dia.estatisticas('temperatura')
+        assert estatisticas['min'] == 36.5
+        assert estatisticas['max'] == 38.0
+        assert estatisticas['media'] == pytest.approx(37.25)
+        assert estatisticas['desvio_padrao'] == pytest.approx(statistics.stdev([37.0, 37.5, 38.0, 36.5]))
+        assert dia.estatisticas('pressao')['n'] == 0
+    
+    def test_reconstrucao_igual_ao_incremental(self, client, auth_headers_comum, db_session):
+        """Testa que reconstruir a partir das leituras dá o mesmo resultado"""
+        enviar_leituras(client, auth_headers_comum, [37.0, 37.5, 38.2])
+        antes = AgregadoDia.query.filter_by(lote='LOTE_AGG').one().to_dict()
+        
+        reconstruir_agregados(lote='LOTE_AGG')
+        db.session.commit()
+        db.session.expire_all()
+        
+        depois = AgregadoDia.query.filter_by(lote='LOTE_AGG').one().to_dict()
+        assert depois['quantidade'] == antes['quantidade']
+        assert depois['temperatura'] == pytest.approx(antes['temperatura'])
+    
+    def test_deletar_leitura_recalcula(self, client, auth_headers_comum, headers_get_comum, db_session):
+        """Testa que remover uma leitura atualiza o agregado do dia"""
+        enviar_leituras(client, auth_headers_comum, [37.0, 39.0])
+        leitura = Leitura.query.filter_by(temperatura=39.0).one()
+        
+        response = client.delete(f'/api/leituras/{leitura.id}', headers=headers_get_comum)
+        assert response.status_code == 200
+        
+        db.session.expire_all()
+        dia = AgregadoDia.query.filter_by(lote='LOTE_AGG').one()
+        assert dia.quantidade == 1
+        assert dia.temperatura_max == 37.0
+
+
+class TestAgregadosAPI:
+    """Testes do endpoint /api/leituras/agregados"""
+    
+    def test_listar_agregados_por_hora(self, client, auth_headers_comum, headers_get_comum, db_session):
+        """Testa a listagem dos agregados por hora em ordem cronológica"""
+        enviar_leituras(client, auth_headers_comum, [37.0])
+        enviar_leituras(client, auth_headers_comum, [38.0], hora=12)
+        
+        response = client.get('/api/leituras/agregados/hora?lote=LOTE_AGG', headers=headers_get_comum)
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [a['inicio'] for a in data] == ['2024-05-01T10:00:00', '2024-05-01T12:00:00']
+        assert data[1]['temperatura']['media'] == 38.0
+    
+    def test_granularidade_invalida(self, client, headers_get_comum, db_session):
+        """Testa que granularidade desconhecida retorna 404"""
+        response = client.get('/api/leituras/agregados/semana', headers=headers_get_comum)
+        
+        assert response.status_code == 404
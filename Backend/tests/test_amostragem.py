@@ -0,0 +1,87 @@
+"""
+Testes para a redução de séries (LTTB e min/max por bucket)
+"""
+import pytest
+import numpy as np
+from datetime import datetime, timedelta
+from amostragem import lttb, buckets_min_max, reduzir_series
+
+
+class TestLTTB:
+    """Testes do algoritmo Largest-Triangle-Three-Buckets"""
+    
+    def test_mantem_primeiro_e_ultimo_ponto(self):
+        """Testa que o primeiro e o último ponto sempre são mantidos"""
+        x = np.arange(1000, dtype=float)
+        y = np.sin(x / 50)
+        
+        indices = lttb(x, y, 100)
+        
+        assert len(indices) == 100
+        assert indices[0] == 0
+        assert indices[-1] == 999
+        assert np.all(np.diff(indices) > 0)
+    
+    def test_preserva_pico(self):
+        """Testa que um pico isolado não é perdido na redução"""
+        x = np.arange(10000, dtype=float)
+        y = np.full(10000, 37.5)
+        y[4321] = 45.0
+        
+        indices = lttb(x, y, 50)
+        
+        assert 4321 in indices
+    
+    def test_serie_menor_que_limite(self):
+        """Testa que séries pequenas são devolvidas inteiras"""
+        x = np.arange(10, dtype=float)
+        
+        assert lttb(x, x, 100).tolist() == list(range(10))
+
+    
+    @pytest.mark.parametrize('pontos, esperado', [(1, [0]), (2, [0, 9])])
+    def test_um_ou_dois_pontos(self, pontos, esperado):
+        """Testa que o limite de pontos vale mesmo abaixo de 3"""
+        x = np.arange(10, dtype=float)
+        
+        assert lttb(x, x, pontos).tolist() == esperado
+        assert lttb(x[:2], x[:2], pontos).tolist() == list(range(pontos))
+
+
+class TestBucketsMinMax:
+    """Testes da agregação min/max/média por bucket de tempo"""
+    
+    def test_agrega_por_bucket(self):
+        """Testa mínimo, máximo, média e contagem de cada bucket"""
+        x = np.arange(10, dtype=float)
+        y = np.arange(10, dtype=float)
+        
+        inicios, minimos, maximos, medias, contagens = buckets_min_max(x, y, 2)
+        
+        assert minimos.tolist() == [0.0, 5.0]
+        assert maximos.tolist() == [4.0, 9.0]
+        assert medias.tolist() == [2.0, 7.0]
+        assert contagens.tolist() == [5, 5]
+
+
+class TestReduzirSeries:
+    """Testes da redução das três séries de leituras"""
+    
+    def test_ignora_valores_nulos(self):
+        """Testa que valores nulos são descartados apenas na sua série"""
+        inicio = datetime(2024, 1, 1)
+        linhas = [
+            (inicio + timedelta(seconds=30 * i), 37.5, 60.0, None)
+            for i in range(20)
+        ]
+        
+        series = reduzir_series(linhas, 5)
+        
+        assert len(series['temperatura']['v']) == 5
+        assert series['temperatura']['t'][0] == '2024-01-01T00:00:00'
+        assert series['pressao']['v'] == []
+    
+    def test_metodo_invalido(self):
+        """Testa que método desconhecido gera erro"""
+        with pytest.raises(ValueError):
+            reduzir_series([], 10, 'media')
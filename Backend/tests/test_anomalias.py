@@ -0,0 +1,119 @@
+"""
+Testes do detector contínuo de anomalias por lote
+"""
+import pytest
+from datetime import datetime, timedelta
+from anomalias import avaliar
+from models import AnomaliaLeitura, EstadoAnomalia
+
+CFG = {'alfa': 0.2, 'janela': 50, 'aquecimento': 10, 'k_pico': 4.0,
+       'k_deriva': 1.0, 'travado_n': 5}
+
+
+def estado_vazio():
+    return EstadoAnomalia(lote='L', metrica='temperatura', n=0, media=0.0, m2=0.0,
+                          ewma=None, ewm_var=0.0, ultimo=None, repeticoes=0, em_deriva=False)
+
+
+def alimentar(estado, valores):
+    detectadas = []
+    for valor in valores:
+        detectadas.extend(tipo for tipo, _, _ in avaliar(estado, valor, CFG))
+    return detectadas
+
+
+def oscilando(quantidade, base=37.5):
+    return [base + (0.1 if i % 2 else -0.1) for i in range(quantidade)]
+
+
+class TestAvaliar:
+    """Testes das regras de pico, sensor travado e deriva"""
+
+    def test_pico(self):
+        """Testa que um salto isolado é marcado só depois do aquecimento"""
+        estado = estado_vazio()
+        assert alimentar(estado, [37.5, 45.0]) == []
+
+        estado = estado_vazio()
+        assert alimentar(estado, oscilando(20)) == []
+        assert alimentar(estado, [45.0]) == ['pico']
+
+    def test_travado_marcado_uma_vez(self):
+        """Testa que a sequência de valores idênticos gera um único alarme"""
+        estado = estado_vazio()
+        detectadas = alimentar(estado, [37.5] * 12)
+
+        assert detectadas.count('travado') == 1
+        assert alimentar(estado, [37.6, 37.6]) == []
+
+    def test_deriva(self):
+        """Testa que a subida lenta e sustentada é marcada ao entrar na deriva"""
+        estado = estado_vazio()
+        alimentar(estado, oscilando(40))
+        detectadas = alimentar(estado, [37.5 + 0.05 * i for i in range(1, 30)])
+
+        assert detectadas.count('deriva') == 1
+        assert estado.em_deriva
+
+    def test_janela_limita_n(self):
+        """Testa que n não passa do tamanho da janela"""
+        estado = estado_vazio()
+        alimentar(estado, oscilando(120))
+
+        assert estado.n == CFG['janela']
+        assert estado.media == pytest.approx(37.5, abs=0.01)
+
+
+class TestAnomaliasIngestao:
+    """Testes da detecção em POST /api/leituras e de GET /api/leituras/anomalias"""
+
+    def postar(self, client, headers, temperaturas, inicio=datetime(2024, 3, 1, 10, 0)):
+        return client.post('/api/leituras', headers=headers, json=[
+            {'lote': 'LOTE_ANOMALIA', 'temperatura': t, 'umidade': 60.0 + (i % 3),
+             'data_inicial': (inicio + timedelta(minutes=i)).isoformat()}
+            for i, t in enumerate(temperaturas)
+        ])
+
+    def test_estado_persiste_entre_requisicoes(self, client, auth_headers_comum, headers_get_comum,
+                                               db_session):
+        """Testa que o pico é detectado usando o histórico de requisições anteriores"""
+        response = self.postar(client, auth_headers_comum, oscilando(40))
+        assert response.status_code == 201
+        assert response.get_json()['anomalias'] == 0
+
+        response = self.postar(client, auth_headers_comum, [45.0],
+                               inicio=datetime(2024, 3, 1, 11, 0))
+        assert response.get_json()['anomalias'] == 1
+
+        response = client.get('/api/leituras/anomalias?lote=LOTE_ANOMALIA&tipo=pico',
+                              headers=headers_get_comum)
+        dados = response.get_json()
+
+        assert response.status_code == 200
+        assert len(dados['anomalias']) == 1
+        assert dados['anomalias'][0]['metrica'] == 'temperatura'
+        assert dados['anomalias'][0]['valor'] == 45.0
+
+        estados = {e['metrica']: e for e in dados['estado']}
+        assert estados['temperatura']['n'] == 41
+        assert estados['pressao']['n'] == 0
+
+    def test_leituras_fora_de_ordem(self, client, auth_headers_comum, db_session):
+        """Testa que o lote é avaliado em ordem de data_inicial"""
+        inicio = datetime(2024, 3, 1, 10, 0)
+        leituras = [{'lote': 'LOTE_ANOMALIA', 'temperatura': t,
+                     'data_inicial': (inicio + timedelta(minutes=i)).isoformat()}
+                    for i, t in enumerate(oscilando(15))]
+
+        response = client.post('/api/leituras', headers=auth_headers_comum,
+                               json=list(reversed(leituras)))
+
+        assert response.status_code == 201
+        estado = EstadoAnomalia.query.get(('LOTE_ANOMALIA', 'temperatura'))
+        assert estado.ultimo == leituras[-1]['temperatura']
+
+    def test_filtro_invalido(self, client, headers_get_comum, db_session):
+        """Testa que data inválida retorna 400"""
+        response = client.get('/api/leituras/anomalias?desde=ontem', headers=headers_get_comum)
+
+        assert response.status_code == 400
@@ -337,3 +337,300 @@ class TestTokenJWT:
         
         assert user is not None
         assert user.is_admin is True
+
+
+class TestCacheUsuarios:
+    """Testes do cache de usuários autenticados usado por token_required"""
+    
+    def test_requisicao_autenticada_preenche_cache(self, client, usuario_comum, token_usuario_comum):
+        """Testa que a primeira requisição grava o usuário no cache"""
+        from auth_cache import usuarios_cache
+        usuarios_cache.clear()
+        
+        response = client.post(
+            '/api/logout',
+            headers={'Authorization': f'Bearer {token_usuario_comum}'}
+        )
+        
+        assert response.status_code == 200
+        usuario = usuarios_cache.get(usuario_comum.id)
+        assert usuario is not None
+        assert usuario.username == usuario_comum.username
+    
+    def test_cache_evita_consulta_ao_banco(self, app, usuario_comum):
+        """Testa que um acerto no cache não consulta a tabela users"""
+        from sqlalchemy import event
+        from extensions import db
+        from auth_cache import obter_usuario_autenticado
+        
+        obter_usuario_autenticado(usuario_comum.id)
+        consultas = []
+        
+        def contar(conn, cursor, statement, *args):
+            consultas.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', contar)
+        try:
+            usuario = obter_usuario_autenticado(usuario_comum.id)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', contar)
+        
+        assert usuario.id == usuario_comum.id
+        assert consultas == []
+    
+    def test_alteracao_do_usuario_invalida_cache(self, app, db_session, usuario_comum):
+        """Testa que alterar o usuário remove a entrada do cache"""
+        from auth_cache import obter_usuario_autenticado
+        
+        assert obter_usuario_autenticado(usuario_comum.id).is_admin is False
+        
+        usuario_comum.is_admin = True
+        db_session.commit()
+        
+        assert obter_usuario_autenticado(usuario_comum.id).is_admin is True
+    
+    def test_alteracao_em_outro_worker(self, app, db_session, usuario_comum, monkeypatch):
+        """Testa que uma escrita sem os eventos deste processo é vista pela versão de users"""
+        from sqlalchemy import text
+        from auth_cache import obter_usuario_autenticado, versao_usuarios
+        from versoes import marcar_alteradas
+        monkeypatch.setattr(versao_usuarios, 'intervalo_verificacao', 0)
+        
+        assert obter_usuario_autenticado(usuario_comum.id).is_admin is False
+        
+        # SQL direto, como outro worker: nenhum evento do ORM invalida o cache local
+        db_session.execute(text('UPDATE users SET is_admin = :admin WHERE id = :id'),
+                           {'admin': True, 'id': usuario_comum.id})
+        marcar_alteradas('users')
+        db_session.commit()
+        
+        assert obter_usuario_autenticado(usuario_comum.id).is_admin is True
+    
+    def test_cache_lru_expira_e_descarta(self):
+        """Testa expiração por TTL e descarte do item menos usado"""
+        from cache import CacheLRU
+        
+        cache = CacheLRU(tamanho_max=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        
+        cache.ttl = -1
+        cache.set('d', 4)
+        assert cache.get('d') is None
+
+
+class TestLimiteLogin:
+    """Testes do limite de tentativas e do pool de verificação de senha de /api/login"""
+    
+    @pytest.fixture
+    def verificacoes(self, monkeypatch):
+        """Conta as chamadas reais a check_password_hash"""
+        import login
+        chamadas = []
+        original = login.check_password_hash
+        
+        def contar(*args):
+            chamadas.append(args)
+            return original(*args)
+        
+        monkeypatch.setattr(login, 'check_password_hash', contar)
+        return chamadas
+    
+    def entrar(self, client, password='senha123', username='usuario_teste', ip='10.0.0.1'):
+        return client.post(
+            '/api/login',
+            json={'username': username, 'password': password},
+            environ_base={'REMOTE_ADDR': ip}
+        )
+    
+    def test_balde_tokens(self):
+        """Testa consumo, espera e restauração do token bucket"""
+        from login import BaldeTokens
+        
+        balde = BaldeTokens(capacidade=2, por_minuto=6)
+        
+        assert balde.consumir('a') == 0
+        assert balde.consumir('a') == 0
+        assert balde.consumir('a') == pytest.approx(10, abs=0.1)
+        assert balde.consumir('b') == 0
+        
+        balde.restaurar('a')
+        assert balde.espera('a') == 0
+    
+    def test_falhas_bloqueiam_usuario_sem_verificar_senha(self, client, usuario_comum, verificacoes, monkeypatch):
+        """Testa que, esgotadas as falhas do usuário, nem a senha certa é verificada"""
+        from login import limite_usuario
+        monkeypatch.setattr(limite_usuario, 'capacidade', 3)
+        
+        falhas = [self.entrar(client, 'errada', ip=f'10.0.0.{i}').status_code for i in range(3)]
+        response = self.entrar(client, ip='10.0.0.9')
+        
+        assert falhas == [401, 401, 401]
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) > 0
+        assert len(verificacoes) == 3
+    
+    def test_limite_por_ip(self, client, usuario_comum, monkeypatch):
+        """Testa que o IP é limitado mesmo variando o usuário"""
+        from login import limite_ip
+        monkeypatch.setattr(limite_ip, 'capacidade', 2)
+        
+        respostas = [self.entrar(client, username=f'usuario_{i}').status_code for i in range(3)]
+        outro_ip = self.entrar(client, ip='10.0.0.2')
+        
+        assert respostas == [401, 401, 429]
+        assert outro_ip.status_code == 200
+    
+    def test_limite_por_ip_ignora_x_real_ip(self, client, usuario_comum, monkeypatch):
+        """Testa que variar X-Real-IP não dá ao cliente um balde novo"""
+        from login import limite_ip
+        monkeypatch.setattr(limite_ip, 'capacidade', 2)
+        
+        respostas = [client.post(
+            '/api/login',
+            json={'username': 'usuario_teste', 'password': 'errada'},
+            headers={'X-Real-IP': f'192.168.0.{i}'},
+            environ_base={'REMOTE_ADDR': '10.0.0.1'}
+        ).status_code for i in range(3)]
+        
+        assert respostas == [401, 401, 429]
+    
+    def test_usuario_inexistente_verifica_hash(self, client, db_session, verificacoes):
+        """Testa que usuário inexistente também paga um hash (sem vazar pelo tempo)"""
+        response = self.entrar(client, username='ninguem')
+        
+        assert response.status_code == 401
+        assert len(verificacoes) == 1
+    
+    def test_sucesso_restaura_usuario(self, client, usuario_comum, monkeypatch):
+        """Testa que um login bem-sucedido zera as falhas do usuário"""
+        from login import limite_usuario
+        monkeypatch.setattr(limite_usuario, 'capacidade', 2)
+        
+        self.entrar(client, 'errada')
+        assert self.entrar(client).status_code == 200
+        self.entrar(client, 'errada')
+        
+        assert self.entrar(client).status_code == 200
+    
+    def test_verificacao_em_cache(self, client, usuario_comum, verificacoes):
+        """Testa que logins repetidos com a mesma senha não refazem o hash"""
+        assert self.entrar(client).status_code == 200
+        assert self.entrar(client).status_code == 200
+        assert self.entrar(client, 'errada').status_code == 401
+        
+        assert len(verificacoes) == 2
+    
+    def test_fila_cheia(self, client, usuario_comum, verificacoes, monkeypatch):
+        """Testa que sem vaga na fila a tentativa é recusada com 503 sem calcular o hash"""
+        import threading
+        from login import pool_verificacao
+        pool_verificacao._garantir_executor()
+        monkeypatch.setattr(pool_verificacao, '_vagas', threading.Semaphore(0))
+        
+        response = self.entrar(client)
+        
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert verificacoes == []
+
+
+class TestRevogacaoToken:
+    """Testes da revogação de tokens no logout"""
+    
+    def test_token_tem_jti(self, app, usuario_comum):
+        """Testa que cada token recebe um jti próprio"""
+        import jwt
+        segredo = app.config['JWT_SECRET_KEY']
+        
+        dados1 = jwt.decode(usuario_comum.generate_auth_token(segredo), segredo, algorithms=['HS256'])
+        dados2 = jwt.decode(usuario_comum.generate_auth_token(segredo), segredo, algorithms=['HS256'])
+        
+        assert len(dados1['jti']) == 32
+        assert dados1['jti'] != dados2['jti']
+    
+    def test_logout_revoga_token(self, app, client, usuario_comum, db_session):
+        """Testa que o token usado no logout deixa de valer e os demais não"""
+        from models import TokenRevogado
+        token = usuario_comum.generate_auth_token(app.config['JWT_SECRET_KEY'])
+        outro = usuario_comum.generate_auth_token(app.config['JWT_SECRET_KEY'])
+        
+        response = client.post('/api/logout', headers={'Authorization': f'Bearer {token}'})
+        depois = client.post('/api/logout', headers={'Authorization': f'Bearer {token}'})
+        
+        assert response.status_code == 200
+        assert depois.status_code == 401
+        assert TokenRevogado.query.filter_by(usuario_id=usuario_comum.id).count() == 1
+        assert client.get('/api/leituras/alarmes', headers={'Authorization': f'Bearer {outro}'}).status_code == 200
+    
+    def test_revogacao_vista_por_outro_worker(self, app, usuario_comum, db_session):
+        """Testa que outro registro (outro worker) carrega só as revogações novas"""
+        import jwt
+        from revogacao import RegistroRevogacoes, revogar_token
+        segredo = app.config['JWT_SECRET_KEY']
+        
+        outro_worker = RegistroRevogacoes(intervalo_verificacao=0)
+        primeiro = jwt.decode(usuario_comum.generate_auth_token(segredo), segredo, algorithms=['HS256'])
+        revogar_token(primeiro)
+        db_session.commit()
+        assert outro_worker.revogado(primeiro['jti'])
+        ultimo_id = outro_worker.ultimo_id
+        
+        segundo = jwt.decode(usuario_comum.generate_auth_token(segredo), segredo, algorithms=['HS256'])
+        assert not outro_worker.revogado(segundo['jti'])
+        revogar_token(segundo)
+        db_session.commit()
+        
+        assert outro_worker.revogado(segundo['jti'])
+        assert outro_worker.ultimo_id == ultimo_id + 1
+    
+    def test_nao_revogado_sem_consulta_ao_banco(self, app, usuario_comum, db_session):
+        """Testa que, entre conferências de versão, a checagem não consulta o banco"""
+        from sqlalchemy import event
+        from extensions import db
+        from revogacao import RegistroRevogacoes
+        
+        registro = RegistroRevogacoes(intervalo_verificacao=60)
+        registro.revogado('aquecimento')
+        consultas = []
+        
+        def contar(conn, cursor, statement, *args):
+            consultas.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', contar)
+        try:
+            resultado = [registro.revogado(f'jti{i}') for i in range(100)]
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', contar)
+        
+        assert not any(resultado)
+        assert consultas == []
+    
+    def test_filtro_bloom_cresce(self):
+        """Testa que o filtro é refeito com mais capacidade sem perder itens"""
+        from datetime import datetime, timedelta
+        from revogacao import RegistroRevogacoes, FiltroBloom
+        
+        filtro = FiltroBloom(100)
+        for i in range(100):
+            filtro.adicionar(f'a{i}')
+        assert all(f'a{i}' in filtro for i in range(100))
+        assert sum(f'b{i}' in filtro for i in range(1000)) < 50
+        
+        registro = RegistroRevogacoes(capacidade_inicial=4)
+        registro.versao = 0
+        registro._verificado_em = float('inf')
+        expira = datetime.utcnow() + timedelta(hours=1)
+        for i in range(10):
+            registro.adicionar(f'j{i}', expira)
+        registro.adicionar('velho', datetime.utcnow() - timedelta(hours=1))
+        registro.adicionar('novo', expira)
+        
+        assert all(registro.revogado(f'j{i}') for i in range(10))
+        assert registro._filtro.capacidade >= 10
+        assert not registro.revogado('outro')
@@ -0,0 +1,150 @@
+"""
+Testes dos backends de cache e do cache de empresas/lotes
+"""
+import pytest
+import time
+import cache_parametros
+from cache import CacheLRU, CacheSQLite, criar_cache
+from cache_parametros import RegistroParametros
+from models import Parametro
+
+
+class TestCacheSQLite:
+    """Testes do backend em arquivo SQLite compartilhado"""
+
+    @pytest.fixture
+    def caminho(self, tmp_path):
+        return str(tmp_path / 'cache.sqlite3')
+
+    def test_compartilhado_entre_instancias(self, caminho):
+        """Testa que duas instâncias (como dois workers) veem as mesmas chaves"""
+        worker_a = CacheSQLite(caminho)
+        worker_b = CacheSQLite(caminho)
+
+        worker_a.set(('lotes', 'Empresa A'), ['LOTE_1', 'LOTE_2'])
+        assert worker_b.get(('lotes', 'Empresa A')) == ['LOTE_1', 'LOTE_2']
+
+        worker_b.clear()
+        assert worker_a.get(('lotes', 'Empresa A')) is None
+
+    def test_expiracao(self, caminho):
+        """Testa que itens vencidos não são devolvidos"""
+        cache = CacheSQLite(caminho, ttl=0.05)
+        cache.set('empresas', ['Empresa A'])
+
+        time.sleep(0.1)
+
+        assert cache.get('empresas', 'ausente') == 'ausente'
+        assert len(cache) == 0
+
+    def test_tamanho_maximo(self, caminho):
+        """Testa que o arquivo não passa de tamanho_max itens"""
+        cache = CacheSQLite(caminho, tamanho_max=3)
+        for i in range(5):
+            cache.set(f'chave{i}', i)
+
+        assert len(cache) == 3
+        assert cache.get('chave4') == 4
+
+    def test_criar_cache(self, caminho):
+        """Testa a escolha do backend pelo nome"""
+        assert isinstance(criar_cache('memoria', caminho=caminho), CacheLRU)
+        assert isinstance(criar_cache('sqlite', caminho=caminho), CacheSQLite)
+        with pytest.raises(ValueError):
+            criar_cache('redis')
+
+
+class TestCacheParametros:
+    """Testes do cache de GET /api/empresas e /api/lotes"""
+
+    def test_lotes_vem_do_cache(self, client, headers_get_admin, db_session, multiplos_parametros):
+        """Testa que a segunda consulta só confere a versão, sem refazer o DISTINCT"""
+        from sqlalchemy import event
+        from extensions import db
+
+        primeira = client.get('/api/lotes', headers=headers_get_admin).get_json()
+        consultas = []
+
+        def contar(conn, cursor, statement, *args):
+            consultas.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', contar)
+        try:
+            assert cache_parametros.listar_lotes() == primeira
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', contar)
+
+        assert len(consultas) == 1
+        assert 'versoes_tabelas' in consultas[0]
+
+    def test_escrita_de_outro_worker_vale_na_hora(self, client, headers_get_admin, db_session, multiplos_parametros):
+        """Testa que uma escrita sem invalidar_parametros (outro worker) já muda as listas"""
+        etag = client.get('/api/lotes', headers=headers_get_admin).headers['ETag']
+
+        db_session.add(Parametro(empresa='Empresa Z', lote='LOTE_Z', temp_ideal=37.5, umid_ideal=60.0))
+        db_session.commit()
+        response = client.get('/api/lotes', headers={**headers_get_admin, 'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert 'LOTE_Z' in response.get_json()
+
+    def test_criar_parametro_invalida(self, client, headers_get_admin, auth_headers_admin, multiplos_parametros):
+        """Testa que POST /api/parametros limpa o cache de empresas"""
+        client.get('/api/empresas', headers=headers_get_admin)
+
+        client.post('/api/parametros', headers=auth_headers_admin, json={
+            'empresa': 'Empresa Nova', 'lote': 'LOTE_N', 'temp_ideal': 37.5, 'umid_ideal': 60.0
+        })
+
+        assert 'Empresa Nova' in client.get('/api/empresas', headers=headers_get_admin).get_json()
+
+
+class TestRegistroParametros:
+    """Testes do registro indexado de valores ideais"""
+
+    def test_indices(self, app, db_session, multiplos_parametros):
+        """Testa as buscas por (empresa, lote), por lote e por sala"""
+        multiplos_parametros[0].id_sala = 7
+        db_session.commit()
+        registro = RegistroParametros(intervalo_verificacao=0)
+
+        (ideal,) = registro.por_empresa_lote('Empresa A', 'LOTE_A1')
+        assert ideal.temp_ideal == 37.5
+        assert [p.empresa for p in registro.por_lote('LOTE_B1')] == ['Empresa B']
+        assert [p.lote for p in registro.por_sala(7)] == ['LOTE_A1']
+        assert registro.por_empresa_lote('Empresa A', 'LOTE_B1') == ()
+
+    def test_recarrega_so_quando_a_versao_muda(self, app, db_session, multiplos_parametros):
+        """Testa que a recarga acontece apenas após escritas em parametro"""
+        registro = RegistroParametros(intervalo_verificacao=0)
+        registro.por_lote('LOTE_A1')
+        registro.por_lote('LOTE_A2')
+        assert registro.recargas == 1
+
+        multiplos_parametros[1].temp_ideal = 38.1
+        db_session.commit()
+
+        assert registro.por_lote('LOTE_A2')[0].temp_ideal == 38.1
+        assert registro.recargas == 2
+
+    def test_intervalo_de_verificacao(self, app, db_session, multiplos_parametros):
+        """Testa que dentro do intervalo o registro não consulta o banco"""
+        registro = RegistroParametros(intervalo_verificacao=60)
+        registro.por_lote('LOTE_A1')
+
+        multiplos_parametros[0].temp_ideal = 39.0
+        db_session.commit()
+        assert registro.por_lote('LOTE_A1')[0].temp_ideal == 37.5
+
+        registro.invalidar()
+        assert registro.por_lote('LOTE_A1')[0].temp_ideal == 39.0
+
+    def test_aquecer_carrega_na_subida(self, app, db_session, multiplos_parametros, monkeypatch):
+        """Testa que aquecer() carrega o registro antes da primeira consulta"""
+        registro = RegistroParametros(intervalo_verificacao=60)
+        monkeypatch.setattr(cache_parametros, 'registro_parametros', registro)
+
+        cache_parametros.aquecer()
+
+        assert registro.recargas == 1
+        assert registro.versao is not None
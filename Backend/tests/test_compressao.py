@@ -0,0 +1,115 @@
+"""
+Testes dos corpos comprimidos em POST /api/leituras e da compressão das respostas
+"""
+import pytest
+import gzip
+import json
+import zlib
+from models import Leitura
+
+
+def lote(quantidade, nome='LOTE_GZ'):
+    return [{'umidade': 60.0, 'temperatura': 37.5, 'lote': nome,
+             'data_inicial': f'2024-07-01T{i // 3600:02d}:{(i // 60) % 60:02d}:{i % 60:02d}'}
+            for i in range(quantidade)]
+
+
+class TestCorpoComprimido:
+    """Testes de Content-Encoding no envio de leituras"""
+
+    def test_gzip(self, client, auth_headers_comum, db_session):
+        """Testa lote JSON enviado com gzip"""
+        headers = dict(auth_headers_comum, **{'Content-Encoding': 'gzip'})
+
+        response = client.post('/api/leituras', headers=headers,
+                               data=gzip.compress(json.dumps(lote(500)).encode()))
+
+        assert response.status_code == 201
+        assert response.get_json()['quantidade'] == 500
+        assert Leitura.query.filter_by(lote='LOTE_GZ').count() == 500
+
+    def test_zstd(self, client, auth_headers_comum, db_session):
+        """Testa lote JSON enviado com zstd"""
+        zstandard = pytest.importorskip('zstandard')
+        headers = dict(auth_headers_comum, **{'Content-Encoding': 'zstd'})
+
+        response = client.post('/api/leituras', headers=headers,
+                               data=zstandard.ZstdCompressor().compress(json.dumps(lote(10)).encode()))
+
+        assert response.status_code == 201
+        assert response.get_json()['quantidade'] == 10
+
+    def test_limite_descomprimido(self, app, client, auth_headers_comum, db_session):
+        """Testa que um corpo que cresce além do limite é recusado com 413 sem inserir nada"""
+        limite_anterior = app.config['CORPO_DESCOMPRIMIDO_MAX']
+        app.config['CORPO_DESCOMPRIMIDO_MAX'] = 10 * 1024
+        try:
+            corpo = gzip.compress(json.dumps(lote(1000)).encode())
+            response = client.post('/api/leituras', data=corpo,
+                                   headers=dict(auth_headers_comum, **{'Content-Encoding': 'gzip'}))
+        finally:
+            app.config['CORPO_DESCOMPRIMIDO_MAX'] = limite_anterior
+
+        assert len(corpo) < 10 * 1024
+        assert response.status_code == 413
+        assert Leitura.query.filter_by(lote='LOTE_GZ').count() == 0
+
+    def test_codificacao_nao_suportada(self, client, auth_headers_comum, db_session):
+        """Testa que Content-Encoding desconhecido recebe 415"""
+        response = client.post('/api/leituras', data=b'...',
+                               headers=dict(auth_headers_comum, **{'Content-Encoding': 'br'}))
+
+        assert response.status_code == 415
+        assert 'gzip' in response.headers['Accept-Encoding']
+
+
+class TestRespostaComprimida:
+    """Testes da negociação de Accept-Encoding nas consultas"""
+
+    @pytest.fixture
+    def leituras(self, db_session):
+        db_session.add_all([Leitura(umidade=60.0, temperatura=37.5, lote='LOTE_GZ') for _ in range(50)])
+        db_session.commit()
+
+    def test_lista_comprimida(self, client, token_usuario_comum, leituras):
+        """Testa gzip em GET /api/leituras mantendo o ETag fraco"""
+        response = client.get('/api/leituras?lote=LOTE_GZ', headers={
+            'Authorization': f'Bearer {token_usuario_comum}',
+            'Accept-Encoding': 'gzip'
+        })
+
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert response.headers['ETag'].startswith('W/')
+        assert len(json.loads(gzip.decompress(response.data))) == 50
+
+    def test_fluxo_comprimido(self, client, token_usuario_comum, leituras):
+        """Testa que a exportação em fluxo continua em fluxo, comprimida parte a parte"""
+        response = client.get('/api/leituras?lote=LOTE_GZ&stream=1', headers={
+            'Authorization': f'Bearer {token_usuario_comum}',
+            'Accept-Encoding': 'gzip'
+        })
+
+        assert response.is_streamed
+        assert response.headers['Content-Encoding'] == 'gzip'
+        partes = list(response.response)
+        descompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        # Cada parte é decodificável ao chegar (descarregada com Z_SYNC_FLUSH)
+        assert descompressor.decompress(partes[0]).startswith(b'[')
+        texto = b''.join(descompressor.decompress(parte) for parte in partes[1:])
+
+        assert descompressor.eof
+        assert len(json.loads(b'[' + texto)) == 50
+
+    def test_sem_accept_encoding(self, client, token_usuario_comum, leituras):
+        """Testa que sem Accept-Encoding (ou em resposta pequena) nada é comprimido"""
+        headers = {'Authorization': f'Bearer {token_usuario_comum}'}
+
+        completa = client.get('/api/leituras?lote=LOTE_GZ', headers=headers)
+        pequena = client.get('/api/leituras?lote=LOTE_GZ&limite=1',
+                             headers=dict(headers, **{'Accept-Encoding': 'gzip'}))
+
+        assert 'Content-Encoding' not in completa.headers
+        assert len(completa.get_json()) == 50
+        assert 'Content-Encoding' not in pequena.headers
@@ -28,3 +28,19 @@ class TestConfig(Config):
     
     # Configurações de logging para testes
     LOG_TO_STDOUT = False
+    
+    # Logs gravados de forma síncrona para que os testes possam consultá-los na hora
+    LOG_ASYNC = False
+    
+    # Leituras distribuídas aos assinantes SSE na própria requisição, sem thread
+    LEITURAS_STREAM_ASYNC = False
+    LEITURAS_STREAM_HEARTBEAT = 0.01
+    
+    # Registro de parâmetros confere a versão da tabela a cada consulta
+    PARAMETROS_REGISTRO_VERIFICACAO = 0
+    
+    # Registro de dispositivos confere a versão da tabela a cada autenticação
+    DISPOSITIVOS_REGISTRO_VERIFICACAO = 0
+    
+    # Registro de revogações confere a versão da tabela a cada requisição
+    REVOGACAO_REGISTRO_VERIFICACAO = 0
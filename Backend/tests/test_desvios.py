@@ -0,0 +1,71 @@
+"""
+Testes da comparação das leituras com os valores ideais do lote
+"""
+import pytest
+import numpy as np
+from desvios import pontuar_leituras
+from ingestao import normalizar_leituras
+from models import AlarmeLeitura
+
+TOLERANCIAS = {'temperatura': 0.5, 'umidade': 5.0, 'pressao': 10.0}
+
+
+class TestPontuacao:
+    """Testes do cálculo vetorizado de desvios"""
+
+    def test_desvios_e_faixa(self, app, db_session, multiplos_parametros):
+        """Testa desvio e marcação por lote, com lote sem parâmetro e valores nulos"""
+        linhas = normalizar_leituras([
+            {'lote': 'LOTE_A1', 'temperatura': 37.6, 'umidade': 60.0},
+            {'lote': 'LOTE_A1', 'temperatura': 38.5, 'umidade': 70.0},
+            {'lote': 'LOTE_B1', 'temperatura': 36.0, 'umidade': None},
+            {'lote': 'SEM_PARAMETRO', 'temperatura': 50.0, 'umidade': 10.0}
+        ])
+
+        resultado = pontuar_leituras(linhas, TOLERANCIAS)
+
+        desvios, fora = resultado['temperatura']
+        np.testing.assert_allclose(desvios[:3], [0.1, 1.0, -1.3], atol=1e-9)
+        assert np.isnan(desvios[3])
+        assert fora.tolist() == [False, True, True, False]
+
+        desvios, fora = resultado['umidade']
+        assert fora.tolist() == [False, True, False, False]
+
+        # LOTE_A1 não tem pressao_ideal: nada é marcado
+        assert not resultado['pressao'][1].any()
+
+
+class TestAlarmesIngestao:
+    """Testes dos alarmes gravados por POST /api/leituras"""
+
+    def test_post_grava_alarmes(self, client, auth_headers_comum, headers_get_comum, db_session,
+                                multiplos_parametros):
+        """Testa que o lote gera um alarme por métrica fora da faixa"""
+        response = client.post('/api/leituras', headers=auth_headers_comum, json=[
+            {'lote': 'LOTE_A1', 'temperatura': 37.5, 'umidade': 60.0,
+             'data_inicial': '2024-03-01T10:00:00'},
+            {'lote': 'LOTE_A1', 'temperatura': 39.0, 'umidade': 50.0,
+             'data_inicial': '2024-03-01T10:01:00'},
+            {'lote': 'LOTE_A2', 'temperatura': 37.8, 'umidade': 62.0,
+             'data_inicial': '2024-03-01T10:02:00'}
+        ])
+
+        assert response.status_code == 201
+        assert response.get_json()['alarmes'] == 2
+        assert AlarmeLeitura.query.count() == 2
+
+        alarmes = client.get('/api/leituras/alarmes?lote=LOTE_A1&metrica=temperatura',
+                             headers=headers_get_comum).get_json()
+        assert len(alarmes) == 1
+        assert alarmes[0]['valor'] == 39.0
+        assert alarmes[0]['ideal'] == 37.5
+        assert alarmes[0]['desvio'] == pytest.approx(1.5)
+        assert alarmes[0]['data_inicial'] == '2024-03-01T10:01:00'
+
+    def test_lote_sem_parametro_nao_alarma(self, client, auth_headers_comum, db_session):
+        """Testa que lotes sem parâmetro cadastrado não geram alarmes"""
+        response = client.post('/api/leituras', headers=auth_headers_comum,
+                               json={'lote': 'LOTE_X', 'temperatura': 45.0})
+
+        assert response.get_json()['alarmes'] == 0
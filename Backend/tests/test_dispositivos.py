@@ -0,0 +1,103 @@
+"""
+Testes das chaves de API por dispositivo
+"""
+import pytest
+from dispositivos import registro_dispositivos
+from models import Leitura
+
+
+class TestDispositivos:
+    """Testes do cadastro e da autenticação por chave de dispositivo"""
+
+    LEITURA = {'umidade': 60.0, 'temperatura': 37.5, 'lote': 'LOTE_DISP'}
+
+    def cadastrar(self, client, auth_headers_admin, nome='incubadora-1'):
+        response = client.post('/api/dispositivos', headers=auth_headers_admin, json={'nome': nome})
+        assert response.status_code == 201
+        return response.get_json()
+
+    def headers(self, chave):
+        return {'Authorization': f'Bearer {chave}', 'Content-Type': 'application/json'}
+
+    def test_chave_autentica_envio(self, client, auth_headers_admin, db_session):
+        """Testa que a chave gerada envia leituras sem login"""
+        dados = self.cadastrar(client, auth_headers_admin)
+
+        response = client.post('/api/leituras', headers=self.headers(dados['chave']), json=self.LEITURA)
+
+        assert dados['chave'].startswith('emb_' + dados['dispositivo']['identificador'] + '_')
+        assert 'resumo_segredo' not in dados['dispositivo']
+        assert response.status_code == 201
+        assert Leitura.query.filter_by(lote='LOTE_DISP').count() == 1
+
+    def test_chave_invalida(self, client, auth_headers_admin, db_session):
+        """Testa segredo trocado e identificador desconhecido"""
+        chave = self.cadastrar(client, auth_headers_admin)['chave']
+
+        segredo_errado = client.post('/api/leituras', headers=self.headers(chave[:-4] + 'abcd'),
+                                     json=self.LEITURA)
+        desconhecido = client.post('/api/leituras', headers=self.headers('emb_0000000000000000_xyz'),
+                                   json=self.LEITURA)
+
+        assert segredo_errado.status_code == 401
+        assert desconhecido.status_code == 401
+
+    def test_sem_consulta_ao_banco_por_requisicao(self, app, client, auth_headers_admin, db_session):
+        """Testa que o registro só é recarregado quando a tabela muda"""
+        chave = self.cadastrar(client, auth_headers_admin)['chave']
+        client.post('/api/leituras', headers=self.headers(chave), json=self.LEITURA)
+        recargas = registro_dispositivos.recargas
+
+        for _ in range(3):
+            client.get('/api/leituras/alarmes', headers={'Authorization': f'Bearer {chave}'})
+
+        assert registro_dispositivos.recargas == recargas
+
+    def test_revogar_e_renovar(self, client, auth_headers_admin, db_session):
+        """Testa que a chave revogada ou substituída deixa de valer"""
+        dados = self.cadastrar(client, auth_headers_admin)
+        id = dados['dispositivo']['id']
+
+        client.delete(f'/api/dispositivos/{id}', headers=auth_headers_admin)
+        revogada = client.post('/api/leituras', headers=self.headers(dados['chave']), json=self.LEITURA)
+
+        nova = client.post(f'/api/dispositivos/{id}/chave', headers=auth_headers_admin).get_json()['chave']
+        antiga = client.post('/api/leituras', headers=self.headers(dados['chave']), json=self.LEITURA)
+        renovada = client.post('/api/leituras', headers=self.headers(nova), json=self.LEITURA)
+
+        assert revogada.status_code == 401
+        assert antiga.status_code == 401
+        assert renovada.status_code == 201
+
+    def test_dispositivo_nao_e_administrador(self, client, auth_headers_admin, auth_headers_comum, db_session):
+        """Testa que só administradores cadastram e que a chave não dá acesso de administrador"""
+        chave = self.cadastrar(client, auth_headers_admin)['chave']
+
+        comum = client.post('/api/dispositivos', headers=auth_headers_comum, json={'nome': 'outro'})
+        pela_chave = client.get('/api/dispositivos', headers={'Authorization': f'Bearer {chave}'})
+
+        assert comum.status_code == 403
+        assert pela_chave.status_code == 403
+
+    def test_lote_offline_do_proprio_dispositivo(self, client, auth_headers_admin, db_session):
+        """Testa que o bloco assume o nome do dispositivo e recusa o de outro"""
+        chave = self.cadastrar(client, auth_headers_admin)['chave']
+        headers = self.headers(chave)
+
+        proprio = client.post('/api/leituras/lote-offline', headers=headers,
+                              json={'seq': 1, 'leituras': [self.LEITURA]})
+        alheio = client.post('/api/leituras/lote-offline', headers=headers,
+                             json={'dispositivo': 'incubadora-2', 'seq': 1, 'leituras': [self.LEITURA]})
+
+        assert proprio.status_code == 201
+        assert proprio.get_json()['dispositivo'] == 'incubadora-1'
+        assert alheio.status_code == 403
+
+    def test_chave_hmac_separada_do_jwt(self, app):
+        """Testa a derivação HKDF (vetor da RFC 5869) e que a chave não é o segredo do JWT"""
+        from dispositivos import derivar_chave
+
+        okm = derivar_chave(bytes([0x0b] * 22), b'', 42)
+        assert okm.hex() == ('8da4e775a563c18f715f802a063c5a31b8a11f5c5ee1879ec3454e5f'
+                             '3c738d2d9d201395faa4b61a96c8')
+        assert app.config['DISPOSITIVOS_HMAC_CHAVE'] != app.config['JWT_SECRET_KEY'].encode()
@@ -0,0 +1,81 @@
+"""
+Testes de regressão de plano de consulta: as consultas quentes devem usar índice
+"""
+import pytest
+from sqlalchemy import text
+from extensions import db
+from models import Leitura, Log, Parametro
+from paginacao import ordenar_recentes
+
+
+def plano_de_consulta(query):
+    """Retorna o plano da consulta como texto, no formato do banco em uso"""
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+
+    if db.engine.dialect.name == 'postgresql':
+        # Com seqscan desligado o planejador só escolhe varredura sequencial
+        # quando nenhum índice atende à consulta
+        db.session.execute(text('SET LOCAL enable_seqscan = off'))
+        linhas = db.session.execute(text(f'EXPLAIN {sql}')).fetchall()
+        db.session.rollback()
+        return '\n'.join(l[0] for l in linhas)
+
+    linhas = db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')).fetchall()
+    return '\n'.join(l[-1] for l in linhas)
+
+
+def usa_indice(plano, indice):
+    return indice in plano and 'Seq Scan' not in plano
+
+
+class TestPlanosDeConsulta:
+    """Garante que os formatos de consulta de app.py continuam indexados"""
+
+    def test_leituras_por_lote_ordenadas(self, app, db_session):
+        """GET /api/leituras?lote=... (paginação por cursor)"""
+        query = ordenar_recentes(Leitura.query.filter(Leitura.lote == 'LOTE001'), Leitura).limit(100)
+
+        assert usa_indice(plano_de_consulta(query), 'ix_leituras_lote_data_inicial_id')
+
+    def test_serie_por_lote(self, app, db_session):
+        """GET /api/leituras/serie?lote=..."""
+        query = db.session.query(
+            Leitura.data_inicial, Leitura.temperatura, Leitura.umidade, Leitura.pressao
+        ).filter(
+            Leitura.data_inicial.isnot(None), Leitura.lote == 'LOTE001'
+        ).order_by(Leitura.data_inicial.asc())
+
+        assert usa_indice(plano_de_consulta(query), 'ix_leituras_lote_data_inicial_id')
+
+    def test_leituras_por_faixa_de_tempo(self, app, db_session):
+        """GET /api/leituras?desde=...&ate=... sem lote"""
+        query = Leitura.query.filter(
+            Leitura.data_inicial >= '2024-01-01', Leitura.data_inicial <= '2024-01-31'
+        )
+
+        assert usa_indice(plano_de_consulta(query), 'ix_leituras_data_inicial_brin')
+
+    def test_logs_por_usuario(self, app, db_session):
+        """GET /api/logs?usuario_id=..."""
+        query = Log.query.filter(Log.usuario_id == 1).order_by(Log.data_hora.desc()).limit(100)
+
+        assert usa_indice(plano_de_consulta(query), 'ix_logs_usuario_id_data_hora')
+
+    def test_logs_recentes(self, app, db_session):
+        """GET /api/logs sem filtros"""
+        query = Log.query.order_by(Log.data_hora.desc()).limit(100)
+
+        assert usa_indice(plano_de_consulta(query), 'ix_logs_data_hora')
+
+    def test_logs_por_acao(self, app, db_session):
+        """GET /api/logs?acao_prefixo=..."""
+        from app import filtro_prefixo
+        query = Log.query.filter(*filtro_prefixo(Log.acao, 'LOGIN')).order_by(Log.data_hora.desc()).limit(100)
+
+        assert usa_indice(plano_de_consulta(query), 'ix_logs_acao_data_hora')
+
+    def test_parametros_por_empresa_e_lote(self, app, db_session):
+        """GET /api/parametros?empresa=...&lote=..."""
+        query = Parametro.query.filter_by(empresa='Empresa A', lote='LOTE_A1')
+
+        assert usa_indice(plano_de_consulta(query), 'ix_parametro_empresa_lote')
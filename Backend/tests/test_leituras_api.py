@@ -3,7 +3,7 @@ Testes de API para endpoints de leituras
 """
 import pytest
 import json
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from models import Leitura
 
 
@@ -175,6 +175,16 @@ class TestLeiturasAPI:
         assert leitura.umidade == umidade_original
         assert leitura.temperatura == 38.5
     
+    def test_atualizar_leitura_data_inicial_nula(self, client, auth_headers_comum, leitura_exemplo):
+        """Testa que data_inicial não pode ser apagada na atualização"""
+        response = client.put(
+            f'/api/leituras/{leitura_exemplo.id}',
+            data=json.dumps({'data_inicial': None}),
+            headers=auth_headers_comum
+        )
+        
+        assert response.status_code == 400
+    
     def test_deletar_leitura_sucesso(self, client, auth_headers_comum, leitura_exemplo):
         """Testa deleção de leitura"""
         leitura_id = leitura_exemplo.id
@@ -409,3 +419,677 @@ class TestLeiturasIntegracao:
         
         assert leitura1 is not None
         assert leitura2 is not None
+
+
+class TestLeiturasIngestaoLote:
+    """Testes do caminho de inserção em lote de leituras"""
+    
+    def test_criar_leituras_em_lote(self, client, auth_headers_comum):
+        """Testa inserção de um lote grande em uma única requisição"""
+        dados = [
+            {
+                'umidade': 60.0,
+                'temperatura': 37.0 + (i % 10) / 10,
+                'lote': 'LOTE_BACKFILL',
+                'data_inicial': f'2024-01-01T{i // 3600:02d}:{(i // 60) % 60:02d}:{i % 60:02d}'
+            }
+            for i in range(1000)
+        ]
+        
+        response = client.post(
+            '/api/leituras',
+            data=json.dumps(dados),
+            headers=auth_headers_comum
+        )
+        
+        assert response.status_code == 201
+        data = json.loads(response.data)
+        assert data['quantidade'] == 1000
+        assert Leitura.query.filter_by(lote='LOTE_BACKFILL').count() == 1000
+    
+    def test_lote_grande_por_copy(self, app, client, auth_headers_comum, db_session):
+        """Testa o caminho COPY + tabela temporária do PostgreSQL, com duplicadas"""
+        from extensions import db
+        if db.engine.dialect.name != 'postgresql':
+            pytest.skip('COPY só é usado no PostgreSQL')
+        
+        quantidade = app.config['LEITURAS_COPY_MINIMO']
+        dados = [
+            {'umidade': 60.0, 'temperatura': 37.0, 'lote': 'LOTE_COPY', 'sensor': 'S1',
+             'data_inicial': (datetime(2024, 1, 1) + timedelta(seconds=i)).isoformat()}
+            for i in range(quantidade)
+        ]
+        
+        primeira = client.post('/api/leituras', json=dados, headers=auth_headers_comum)
+        segunda = client.post('/api/leituras', json=dados, headers=auth_headers_comum)
+        
+        assert primeira.status_code == 201
+        assert primeira.get_json()['quantidade'] == quantidade
+        assert segunda.get_json()['duplicadas'] == quantidade
+        assert Leitura.query.filter_by(lote='LOTE_COPY').count() == quantidade
+    
+    def test_criar_leitura_valor_invalido(self, client, auth_headers_comum, db_session):
+        """Testa que valor numérico inválido rejeita o lote inteiro"""
+        dados = [
+            {'umidade': 60.0, 'temperatura': 37.5, 'lote': 'LOTE_INVALIDO'},
+            {'umidade': 'abc', 'temperatura': 37.5, 'lote': 'LOTE_INVALIDO'}
+        ]
+        
+        response = client.post(
+            '/api/leituras',
+            data=json.dumps(dados),
+            headers=auth_headers_comum
+        )
+        
+        assert response.status_code == 400
+        assert Leitura.query.filter_by(lote='LOTE_INVALIDO').count() == 0
+    
+    def test_criar_leitura_valor_nao_finito(self, client, auth_headers_comum, db_session):
+        """Testa que NaN, infinito e booleanos são recusados nomeando o campo"""
+        for valor, campo in (('NaN', 'temperatura'), ('Infinity', 'umidade'), ('true', 'pressao')):
+            leituras = [{'temperatura': 37.5, 'umidade': 60.0, 'lote': 'LOTE_NAN',
+                         'data_inicial': f'2024-01-01T10:00:{i:02d}'} for i in range(40)]
+            leituras[17][campo] = '__valor__'
+            # NaN/Infinity sem aspas, como o json do Python e muitos firmwares emitem
+            corpo = json.dumps(leituras).replace('"__valor__"', valor)
+            
+            response = client.post('/api/leituras', data=corpo, headers=auth_headers_comum)
+            
+            assert response.status_code == 400
+            assert f"'{campo}'" in response.get_json()['message']
+        assert Leitura.query.filter_by(lote='LOTE_NAN').count() == 0
+    
+    def test_normalizar_leitura_datas_iso(self):
+        """Testa conversão de datas ISO, inclusive com sufixo Z"""
+        from ingestao import normalizar_leitura
+        
+        linha = normalizar_leitura({
+            'temperatura': '37.5',
+            'lote': 'L1',
+            'data_inicial': '2024-01-01T10:00:00Z',
+            'data_final': '2024-01-21T10:00:00'
+        })
+        
+        assert linha == (None, 37.5, None, 'L1', datetime(2024, 1, 1, 10), datetime(2024, 1, 21, 10), '')
+    
+    def test_linhas_para_csv_distingue_nulo(self):
+        """Testa que o CSV do COPY diferencia NULL de string vazia e escapa aspas"""
+        from ingestao import linhas_para_csv
+        
+        buffer = linhas_para_csv([(58.5, None, None, 'L"1', datetime(2024, 1, 1, 10), None)])
+        
+        assert buffer.getvalue() == '58.5,,,"L""1",2024-01-01T10:00:00,\n'
+
+
+class TestLeiturasPaginacao:
+    """Testes de paginação por cursor e filtros de tempo em GET /api/leituras"""
+    
+    @pytest.fixture
+    def leituras_sequenciais(self, db_session):
+        leituras = [
+            Leitura(
+                umidade=60.0,
+                temperatura=37.0,
+                lote='LOTE_PAG',
+                # Pares com a mesma data (sensores distintos) testam o desempate por id
+                sensor=f'S{i % 2}',
+                data_inicial=datetime(2024, 1, 1, 10, i // 2)
+            )
+            for i in range(7)
+        ] + [
+            Leitura(umidade=60.0, temperatura=37.0, lote='LOTE_PAG', data_inicial=None)
+            for _ in range(2)
+        ]
+        db_session.add_all(leituras)
+        db_session.commit()
+        return leituras
+    
+    def test_paginar_todas_as_leituras(self, client, headers_get_comum, leituras_sequenciais):
+        """Testa que percorrer os cursores retorna cada leitura uma única vez"""
+        ids = []
+        cursor = None
+        
+        while True:
+            url = '/api/leituras?lote=LOTE_PAG&limite=3'
+            if cursor:
+                url += f'&cursor={cursor}'
+            response = client.get(url, headers=headers_get_comum)
+            assert response.status_code == 200
+            
+            data = json.loads(response.data)
+            ids.extend(l['id'] for l in data['leituras'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        
+        assert len(ids) == 9
+        assert sorted(ids) == sorted(l.id for l in leituras_sequenciais)
+    
+    def test_filtro_desde_ate(self, client, headers_get_comum, leituras_sequenciais):
+        """Testa filtros de intervalo de tempo"""
+        response = client.get(
+            '/api/leituras?lote=LOTE_PAG&desde=2024-01-01T10:01:00&ate=2024-01-01T10:02:00',
+            headers=headers_get_comum
+        )
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert len(data) == 4
+    
+    def test_limite_maximo_servidor(self, app, client, headers_get_comum, leituras_sequenciais):
+        """Testa que o limite pedido é reduzido ao teto do servidor"""
+        limite_anterior = app.config['LEITURAS_LIMITE_MAX']
+        app.config['LEITURAS_LIMITE_MAX'] = 5
+        try:
+            response = client.get('/api/leituras?limite=1000', headers=headers_get_comum)
+            legado = client.get('/api/leituras', headers=headers_get_comum)
+        finally:
+            app.config['LEITURAS_LIMITE_MAX'] = limite_anterior
+        
+        data = json.loads(response.data)
+        assert len(data['leituras']) == 5
+        assert data['next_cursor'] is not None
+        
+        assert legado.status_code == 400
+        assert legado.get_json()['limite_max'] == 5
+    
+    def test_lista_simples_nao_corta(self, app, client, headers_get_comum, leituras_sequenciais):
+        """Testa que sem limite/cursor a lista vem inteira quando cabe no teto"""
+        limite_anterior = app.config['LEITURAS_LIMITE_MAX']
+        app.config['LEITURAS_LIMITE_MAX'] = len(leituras_sequenciais)
+        try:
+            response = client.get('/api/leituras', headers=headers_get_comum)
+        finally:
+            app.config['LEITURAS_LIMITE_MAX'] = limite_anterior
+        
+        assert response.status_code == 200
+        assert len(json.loads(response.data)) == len(leituras_sequenciais)
+    
+    def test_cursor_invalido(self, client, headers_get_comum, db_session):
+        """Testa que cursor malformado retorna 400"""
+        response = client.get('/api/leituras?cursor=invalido', headers=headers_get_comum)
+        
+        assert response.status_code == 400
+
+
+class TestLeiturasSerie:
+    """Testes do endpoint de séries reduzidas para gráficos"""
+    
+    def test_serie_limita_pontos(self, client, token_usuario_comum, db_session):
+        """Testa que cada série retorna no máximo o número de pontos pedido"""
+        db_session.add_all([
+            Leitura(
+                umidade=60.0,
+                temperatura=37.0 + (i % 7) / 10,
+                pressao=1013.0,
+                lote='LOTE_SERIE',
+                data_inicial=datetime(2024, 1, 1, i // 60, i % 60)
+            )
+            for i in range(600)
+        ])
+        db_session.commit()
+        
+        response = client.get(
+            '/api/leituras/serie?lote=LOTE_SERIE&pontos=50',
+            headers={'Authorization': f'Bearer {token_usuario_comum}'}
+        )
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['total'] == 600
+        for nome in ('temperatura', 'umidade', 'pressao'):
+            assert len(data['series'][nome]['v']) == 50
+    
+    @pytest.mark.parametrize('pontos', [1, 2])
+    def test_serie_poucos_pontos(self, client, token_usuario_comum, db_session, pontos):
+        """Testa o limite de pontos abaixo de 3, nos dois métodos"""
+        db_session.add_all([
+            Leitura(umidade=60.0, temperatura=37.0 + i / 10, pressao=1013.0, lote='LOTE_SERIE',
+                    data_inicial=datetime(2024, 1, 1, 0, i))
+            for i in range(10)
+        ])
+        db_session.commit()
+        
+        for metodo, campo in (('lttb', 'v'), ('minmax', 'avg')):
+            response = client.get(
+                f'/api/leituras/serie?lote=LOTE_SERIE&pontos={pontos}&metodo={metodo}',
+                headers={'Authorization': f'Bearer {token_usuario_comum}'}
+            )
+            
+            assert response.status_code == 200
+            assert len(response.get_json()['series']['temperatura'][campo]) == pontos
+    
+    def test_serie_minmax(self, client, token_usuario_comum, multiplas_leituras):
+        """Testa o método min/max por bucket"""
+        response = client.get(
+            '/api/leituras/serie?lote=LOTE001&metodo=minmax&pontos=10',
+            headers={'Authorization': f'Bearer {token_usuario_comum}'}
+        )
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert sum(data['series']['temperatura']['count']) == 2
+    
+    def test_serie_pontos_invalido(self, client, token_usuario_comum, db_session):
+        """Testa que a mensagem de erro cita o parâmetro 'pontos'"""
+        response = client.get(
+            '/api/leituras/serie?pontos=0',
+            headers={'Authorization': f'Bearer {token_usuario_comum}'}
+        )
+        
+        assert response.status_code == 400
+        assert "'pontos'" in response.get_json()['message']
+    
+    def test_serie_metodo_invalido(self, client, token_usuario_comum, db_session):
+        """Testa que método desconhecido retorna 400"""
+        response = client.get(
+            '/api/leituras/serie?metodo=media',
+            headers={'Authorization': f'Bearer {token_usuario_comum}'}
+        )
+        
+        assert response.status_code == 400
+
+
+class TestLeiturasExportacaoFluxo:
+    """Testes da exportação em fluxo (JSON e NDJSON)"""
+    
+    @pytest.fixture
+    def muitas_leituras(self, app, db_session):
+        db_session.add_all([
+            Leitura(umidade=60.0, temperatura=37.0, lote='LOTE_EXP', sensor='S1',
+                    data_inicial=datetime(2024, 1, 1) + timedelta(minutes=i))
+            for i in range(1500)
+        ])
+        db_session.commit()
+    
+    def test_stream_json_sem_limite(self, app, client, token_usuario_comum, muitas_leituras):
+        """Testa que stream=1 devolve todas as linhas, acima do teto de paginação"""
+        limite_anterior = app.config['LEITURAS_LIMITE_MAX']
+        app.config['LEITURAS_LIMITE_MAX'] = 100
+        try:
+            response = client.get(
+                '/api/leituras?lote=LOTE_EXP&stream=1',
+                headers={'Authorization': f'Bearer {token_usuario_comum}'}
+            )
+            em_fluxo = response.is_streamed
+            data = json.loads(response.get_data())
+        finally:
+            app.config['LEITURAS_LIMITE_MAX'] = limite_anterior
+        
+        assert response.status_code == 200
+        assert em_fluxo
+        assert len(data) == 1500
+        assert data[0]['data_inicial'] == '2024-01-02T00:59:00'
+    
+    def test_stream_ndjson(self, client, token_usuario_comum, muitas_leituras):
+        """Testa a negociação de application/x-ndjson pelo cabeçalho Accept"""
+        response = client.get(
+            '/api/leituras?lote=LOTE_EXP',
+            headers={
+                'Authorization': f'Bearer {token_usuario_comum}',
+                'Accept': 'application/x-ndjson'
+            }
+        )
+        
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        linhas = response.get_data(as_text=True).strip().split('\n')
+        assert len(linhas) == 1500
+        primeira = json.loads(linhas[0])
+        assert primeira['lote'] == 'LOTE_EXP'
+        assert primeira == Leitura.query.get(primeira['id']).to_dict()
+    
+    def test_stream_vazio(self, client, token_usuario_comum, db_session):
+        """Testa que exportação sem linhas é um array vazio válido"""
+        response = client.get(
+            '/api/leituras?lote=INEXISTENTE&stream=1',
+            headers={'Authorization': f'Bearer {token_usuario_comum}'}
+        )
+        
+        assert json.loads(response.get_data()) == []
+
+
+class TestLeiturasExportacaoColunar:
+    """Testes da exportação em Parquet, Arrow IPC e CSV"""
+    
+    @pytest.fixture
+    def leituras_exportacao(self, app, db_session):
+        db_session.add_all([
+            Leitura(umidade=60.0 + i, temperatura=37.0, pressao=None, lote='LOTE_COL', sensor='S1',
+                    data_inicial=datetime(2024, 1, 1) + timedelta(minutes=i))
+            for i in range(2500)
+        ])
+        db_session.commit()
+    
+    def _exportar(self, client, token, formato):
+        return client.get(
+            f'/api/leituras/export?formato={formato}&lote=LOTE_COL',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+    
+    def test_exportar_parquet(self, client, token_usuario_comum, leituras_exportacao):
+        """Testa que o Parquet exportado tem todas as linhas e tipos corretos"""
+        pq = pytest.importorskip('pyarrow.parquet')
+        import io
+        
+        response = self._exportar(client, token_usuario_comum, 'parquet')
+        
+        assert response.status_code == 200
+        assert 'leituras.parquet' in response.headers['Content-Disposition']
+        tabela = pq.read_table(io.BytesIO(response.get_data()))
+        assert tabela.num_rows == 2500
+        assert str(tabela.schema.field('data_inicial').type) == 'timestamp[us]'
+        assert tabela.column('pressao').null_count == 2500
+    
+    def test_exportar_arrow(self, client, token_usuario_comum, leituras_exportacao):
+        """Testa o fluxo Arrow IPC, lido em record batches"""
+        pa = pytest.importorskip('pyarrow')
+        
+        response = self._exportar(client, token_usuario_comum, 'arrow')
+        
+        assert response.status_code == 200
+        leitor = pa.ipc.open_stream(response.get_data())
+        tabela = leitor.read_all()
+        assert tabela.num_rows == 2500
+        assert tabela.column('lote')[0].as_py() == 'LOTE_COL'
+        assert tabela.column('sensor')[0].as_py() == 'S1'
+    
+    def test_exportar_csv(self, client, token_usuario_comum, leituras_exportacao):
+        """Testa o CSV com cabeçalho e campos nulos vazios"""
+        response = self._exportar(client, token_usuario_comum, 'csv')
+        
+        linhas = response.get_data(as_text=True).strip().splitlines()
+        assert response.mimetype == 'text/csv'
+        assert linhas[0] == 'id,umidade,temperatura,pressao,lote,sensor,data_inicial,data_final'
+        assert len(linhas) == 2501
+        assert ',,LOTE_COL,S1,2024-01-02T17:39:00,' in linhas[1]
+    
+    def test_formato_invalido(self, client, token_usuario_comum, db_session):
+        """Testa que formato desconhecido retorna 400"""
+        response = self._exportar(client, token_usuario_comum, 'xlsx')
+        
+        assert response.status_code == 400
+
+
+class TestLeiturasSincronizacao:
+    """Testes da sincronização incremental por desde_id"""
+    
+    @pytest.fixture
+    def leituras_sync(self, app, db_session):
+        leituras = [
+            Leitura(umidade=60.0, temperatura=37.0, lote='LOTE_A' if i % 2 else 'LOTE_B',
+                    data_inicial=datetime(2024, 1, 1) + timedelta(minutes=i))
+            for i in range(6)
+        ]
+        db_session.add_all(leituras)
+        db_session.commit()
+        return [l.id for l in leituras]
+    
+    def test_somente_novas_leituras(self, client, headers_get_comum, leituras_sync, db_session):
+        """Testa que só voltam leituras acima da marca d'água, com a nova marca"""
+        response = client.get(f'/api/leituras?desde_id={leituras_sync[3]}', headers=headers_get_comum)
+        data = response.get_json()
+        
+        assert response.status_code == 200
+        assert [l['id'] for l in data['leituras']] == leituras_sync[4:]
+        assert data['desde_id'] == leituras_sync[-1]
+        assert data['mais'] is False
+        
+        db_session.add(Leitura(umidade=61.0, temperatura=37.5, lote='LOTE_A'))
+        db_session.commit()
+        
+        data = client.get(f"/api/leituras?desde_id={data['desde_id']}", headers=headers_get_comum).get_json()
+        assert len(data['leituras']) == 1
+        assert data['leituras'][0]['umidade'] == 61.0
+    
+    def test_marca_inicial(self, client, headers_get_comum, leituras_sync):
+        """Testa que desde_id=ultimo devolve o maior id, mesmo com filtro de lote"""
+        data = client.get('/api/leituras?desde_id=ultimo&lote=LOTE_B', headers=headers_get_comum).get_json()
+        
+        assert data == {'leituras': [], 'desde_id': max(leituras_sync), 'mais': False}
+    
+    def test_paginas_e_lote(self, client, headers_get_comum, leituras_sync):
+        """Testa o limite por página, o indicador 'mais' e o filtro de lote"""
+        data = client.get(
+            f'/api/leituras?desde_id={leituras_sync[0] - 1}&lote=LOTE_A&limite=2',
+            headers=headers_get_comum
+        ).get_json()
+        
+        assert [l['id'] for l in data['leituras']] == [leituras_sync[1], leituras_sync[3]]
+        assert data['mais'] is True
+        
+        data = client.get(
+            f"/api/leituras?desde_id={data['desde_id']}&lote=LOTE_A&limite=2",
+            headers=headers_get_comum
+        ).get_json()
+        assert [l['id'] for l in data['leituras']] == [leituras_sync[5]]
+        assert data['mais'] is False
+    
+    def test_sem_novidades_mantem_marca(self, client, headers_get_comum, leituras_sync):
+        """Testa que sem leituras novas a marca d'água não muda"""
+        data = client.get(f'/api/leituras?desde_id={leituras_sync[-1]}', headers=headers_get_comum).get_json()
+        
+        assert data == {'leituras': [], 'desde_id': leituras_sync[-1], 'mais': False}
+    
+    def test_desde_id_invalido(self, client, headers_get_comum, db_session):
+        """Testa que desde_id não numérico retorna 400"""
+        response = client.get('/api/leituras?desde_id=abc', headers=headers_get_comum)
+        
+        assert response.status_code == 400
+
+
+class TestLeiturasCondicional:
+    """Testes de ETag / If-None-Match em GET /api/leituras"""
+    
+    def test_304_sem_alteracoes(self, client, headers_get_comum, multiplas_leituras):
+        """Testa que o mesmo ETag devolve 304 sem corpo"""
+        primeira = client.get('/api/leituras?limite=10', headers=headers_get_comum)
+        etag = primeira.headers['ETag']
+        
+        segunda = client.get('/api/leituras?limite=10', headers={**headers_get_comum, 'If-None-Match': etag})
+        
+        assert primeira.status_code == 200
+        assert segunda.status_code == 304
+        assert segunda.get_data() == b''
+        assert segunda.headers['ETag'] == etag
+    
+    def test_etag_muda_com_filtros(self, client, headers_get_comum, multiplas_leituras):
+        """Testa que filtros diferentes geram ETags diferentes"""
+        etag = client.get('/api/leituras?limite=10', headers=headers_get_comum).headers['ETag']
+        
+        response = client.get('/api/leituras?limite=5', headers={**headers_get_comum, 'If-None-Match': etag})
+        
+        assert response.status_code == 200
+    
+    def test_etag_muda_apos_escritas(self, client, headers_get_comum, auth_headers_comum, multiplas_leituras):
+        """Testa que POST, PUT e DELETE de leituras invalidam o ETag"""
+        def etag_atual():
+            return client.get('/api/leituras?limite=10', headers=headers_get_comum).headers['ETag']
+        
+        ids = [l.id for l in multiplas_leituras]
+        etags = [etag_atual()]
+        client.post('/api/leituras', headers=auth_headers_comum, json={'umidade': 60.0, 'lote': 'LOTE_ETAG'})
+        etags.append(etag_atual())
+        client.put(f'/api/leituras/{ids[0]}', headers=auth_headers_comum,
+                   json={'umidade': 99.0})
+        etags.append(etag_atual())
+        client.delete(f'/api/leituras/{ids[1]}', headers=headers_get_comum)
+        etags.append(etag_atual())
+        
+        assert len(set(etags)) == 4
+    
+    def test_versao_incrementada_so_apos_commit(self, app, db_session):
+        """Testa que a ingestão não trava versoes_tabelas dentro da sua transação"""
+        from sqlalchemy import event
+        from extensions import db
+        from ingestao import normalizar_leituras, inserir_leituras
+        from versoes import obter_versoes
+        
+        comandos = []
+        
+        def registrar(conn, cursor, statement, *args):
+            comandos.append(statement)
+        
+        antes = obter_versoes(['leituras'])[0]
+        db_session.commit()
+        event.listen(db.engine, 'before_cursor_execute', registrar)
+        try:
+            inserir_leituras(normalizar_leituras({'umidade': 60.0, 'lote': 'LOTE_VERSAO'}))
+            durante = [c for c in comandos if 'versoes_tabelas' in c]
+            db_session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', registrar)
+        
+        assert durante == []
+        assert obter_versoes(['leituras'])[0] == antes + 1
+        
+        inserir_leituras(normalizar_leituras({'umidade': 61.0, 'lote': 'LOTE_VERSAO'}))
+        db_session.rollback()
+        db_session.commit()
+        
+        assert obter_versoes(['leituras'])[0] == antes + 1
+
+
+class TestLeiturasIdempotencia:
+    """Testes da deduplicação de reenvios em POST /api/leituras"""
+    
+    LEITURAS = [
+        {'umidade': 60.0, 'temperatura': 37.5, 'lote': 'LOTE_REENVIO',
+         'data_inicial': '2024-05-01T10:00:00'},
+        {'umidade': 61.0, 'temperatura': 37.6, 'lote': 'LOTE_REENVIO',
+         'data_inicial': '2024-05-01T10:01:00'}
+    ]
+    
+    def test_reenvio_nao_duplica(self, client, auth_headers_comum, db_session):
+        """Testa que o mesmo lote reenviado conta como duplicado e não soma nos agregados"""
+        from models import AgregadoHora
+        
+        primeira = client.post('/api/leituras', json=self.LEITURAS, headers=auth_headers_comum)
+        segunda = client.post('/api/leituras', json=self.LEITURAS + [
+            {'umidade': 62.0, 'temperatura': 37.7, 'lote': 'LOTE_REENVIO',
+             'data_inicial': '2024-05-01T10:02:00'}
+        ], headers=auth_headers_comum)
+        
+        assert primeira.status_code == 201
+        assert segunda.status_code == 201
+        assert segunda.get_json()['quantidade'] == 1
+        assert segunda.get_json()['duplicadas'] == 2
+        assert Leitura.query.filter_by(lote='LOTE_REENVIO').count() == 3
+        assert AgregadoHora.query.filter_by(lote='LOTE_REENVIO').one().quantidade == 3
+    
+    def test_duplicada_no_mesmo_lote_e_sensores(self, client, auth_headers_comum, db_session):
+        """Testa repetição dentro da mesma requisição e mesma data em sensores distintos"""
+        leitura = self.LEITURAS[0]
+        response = client.post('/api/leituras', json=[
+            leitura, leitura, dict(leitura, sensor='S2')
+        ], headers=auth_headers_comum)
+        
+        data = response.get_json()
+        assert data['quantidade'] == 2
+        assert data['duplicadas'] == 1
+    
+    def test_sem_data_inicial_recebe_hora_de_chegada(self, client, auth_headers_comum, db_session):
+        """Testa que leituras sem data_inicial são datadas na chegada e não colidem entre si"""
+        antes = datetime.utcnow()
+        leitura = {'umidade': 60.0, 'temperatura': 37.5, 'lote': 'LOTE_SEM_DATA'}
+        
+        response = client.post('/api/leituras', json=[leitura, leitura, leitura],
+                               headers=auth_headers_comum)
+        
+        assert response.get_json()['quantidade'] == 3
+        datas = [l.data_inicial for l in Leitura.query.filter_by(lote='LOTE_SEM_DATA')]
+        assert len(set(datas)) == 3
+        assert all(data >= antes for data in datas)
+    
+    def test_idempotency_key_repete_resposta(self, client, auth_headers_comum, db_session):
+        """Testa que a mesma Idempotency-Key devolve a resposta original sem inserir"""
+        headers = dict(auth_headers_comum, **{'Idempotency-Key': 'envio-42'})
+        # Sem data_inicial cada envio recebe a hora de chegada: só a Idempotency-Key evita a duplicação
+        leituras = [{'umidade': 60.0, 'temperatura': 37.5, 'lote': 'LOTE_CHAVE'}]
+        
+        primeira = client.post('/api/leituras', json=leituras, headers=headers)
+        segunda = client.post('/api/leituras', json=leituras, headers=headers)
+        outra = client.post('/api/leituras', json=leituras, headers=auth_headers_comum)
+        
+        assert primeira.status_code == segunda.status_code == 201
+        assert segunda.get_json() == primeira.get_json()
+        assert segunda.headers['Idempotent-Replayed'] == 'true'
+        assert 'Idempotent-Replayed' not in primeira.headers
+        assert outra.get_json()['quantidade'] == 1
+        assert Leitura.query.filter_by(lote='LOTE_CHAVE').count() == 2
+    
+    def test_idempotency_key_liberada_apos_erro(self, client, auth_headers_comum, db_session):
+        """Testa que uma requisição rejeitada não consome a chave"""
+        headers = dict(auth_headers_comum, **{'Idempotency-Key': 'envio-43'})
+        
+        invalida = client.post('/api/leituras', json=[{'umidade': 'abc', 'lote': 'LOTE_CHAVE'}],
+                               headers=headers)
+        valida = client.post('/api/leituras', json=self.LEITURAS, headers=headers)
+        
+        assert invalida.status_code == 400
+        assert valida.status_code == 201
+        assert valida.get_json()['quantidade'] == 2
+
+
+class TestLeiturasFormatosBinarios:
+    """Testes de POST /api/leituras com MessagePack, CBOR e lote colunar"""
+    
+    def test_msgpack_lista(self, client, auth_headers_comum, db_session):
+        """Testa lista de objetos em MessagePack com data no timestamp nativo"""
+        msgpack = pytest.importorskip('msgpack')
+        
+        corpo = msgpack.packb([
+            {'temperatura': 37.5, 'umidade': 60.0, 'lote': 'LOTE_BIN',
+             'data_inicial': datetime(2024, 6, 1, 13, 0, tzinfo=timezone.utc)},
+            {'temperatura': 37.6, 'umidade': 61.0, 'lote': 'LOTE_BIN',
+             'data_inicial': '2024-06-01T10:01:00-03:00'}
+        ], datetime=True)
+        headers = dict(auth_headers_comum, **{'Content-Type': 'application/msgpack'})
+        
+        response = client.post('/api/leituras', data=corpo, headers=headers)
+        
+        assert response.status_code == 201
+        datas = [l.data_inicial for l in Leitura.query.filter_by(lote='LOTE_BIN').order_by(Leitura.id)]
+        assert datas == [datetime(2024, 6, 1, 13, 0), datetime(2024, 6, 1, 13, 1)]
+    
+    def test_cbor_colunar(self, client, auth_headers_comum, db_session):
+        """Testa lote colunar em CBOR com lote comum e datas em segundos desde a época"""
+        cbor2 = pytest.importorskip('cbor2')
+        inicio = int((datetime(2024, 6, 1, 12, 0) - datetime(1970, 1, 1)).total_seconds())
+        
+        corpo = cbor2.dumps({
+            'lote': 'LOTE_BIN',
+            'temperatura': [37.5, 37.6, 37.7],
+            'umidade': [60.0, None, 62.0],
+            'data_inicial': [inicio, inicio + 60, inicio + 120]
+        })
+        headers = dict(auth_headers_comum, **{'Content-Type': 'application/cbor'})
+        
+        response = client.post('/api/leituras', data=corpo, headers=headers)
+        
+        assert response.status_code == 201
+        assert response.get_json()['quantidade'] == 3
+        leituras = Leitura.query.filter_by(lote='LOTE_BIN').order_by(Leitura.data_inicial).all()
+        assert [l.umidade for l in leituras] == [60.0, None, 62.0]
+        assert leituras[2].data_inicial == datetime(2024, 6, 1, 12, 2)
+    
+    def test_colunar_tamanhos_diferentes(self, client, auth_headers_comum, db_session):
+        """Testa que colunas de tamanhos diferentes rejeitam o lote"""
+        response = client.post('/api/leituras', headers=auth_headers_comum, json={
+            'lote': 'LOTE_BIN', 'temperatura': [37.5, 37.6], 'umidade': [60.0]
+        })
+        
+        assert response.status_code == 400
+        assert Leitura.query.filter_by(lote='LOTE_BIN').count() == 0
+    
+    def test_corpo_invalido_e_tipo_nao_suportado(self, client, auth_headers_comum, db_session):
+        """Testa MessagePack corrompido e Content-Type desconhecido"""
+        pytest.importorskip('msgpack')
+        
+        corrompido = client.post('/api/leituras', data=b'\xc1\xff',
+                                 headers=dict(auth_headers_comum, **{'Content-Type': 'application/msgpack'}))
+        texto = client.post('/api/leituras', data='37.5',
+                            headers=dict(auth_headers_comum, **{'Content-Type': 'text/plain'}))
+        
+        assert corrompido.status_code == 400
+        assert texto.status_code == 400
@@ -0,0 +1,107 @@
+"""
+Testes para a gravação assíncrona em lote de logs
+"""
+import pytest
+import queue
+from datetime import datetime
+from models import Log
+from log_sink import LogSink
+
+
+def registro_exemplo(acao):
+    return {
+        'usuario_id': None,
+        'usuario_nome': 'Anônimo',
+        'acao': acao,
+        'detalhes': None,
+        'endpoint': None,
+        'metodo_http': 'POST',
+        'ip_address': '127.0.0.1',
+        'user_agent': '',
+        'status_code': 200,
+        'data_hora': datetime.utcnow()
+    }
+
+
+@pytest.fixture
+def sink_async(app, db_session):
+    """LogSink com LOG_ASYNC ligado apenas durante o teste"""
+    configuracoes = {
+        'LOG_ASYNC': True,
+        'LOG_FILA_TAMANHO_MAX': 100,
+        'LOG_LOTE_TAMANHO': 50,
+        'LOG_LOTE_INTERVALO_MS': 50,
+        'LOG_POLITICA_FILA_CHEIA': 'descartar_novo'
+    }
+    anteriores = {k: app.config.get(k) for k in configuracoes}
+    app.config.update(configuracoes)
+
+    sink = LogSink()
+    sink.app = app
+    yield sink
+
+    sink.parar()
+    app.config.update(anteriores)
+
+
+class TestLogSink:
+    """Testes do gravador de logs em lote"""
+
+    def test_modo_sincrono_grava_imediatamente(self, app, db_session):
+        """Testa que com LOG_ASYNC desligado o log é gravado na hora"""
+        sink = LogSink()
+        sink.app = app
+
+        sink.enviar(registro_exemplo('SINK_SINCRONO'))
+
+        assert Log.query.filter_by(acao='SINK_SINCRONO').count() == 1
+
+    def test_modo_async_grava_ao_parar(self, sink_async):
+        """Testa que parar() grava todos os registros pendentes"""
+        for i in range(5):
+            assert sink_async.enviar(registro_exemplo('SINK_ASYNC'))
+
+        sink_async.parar()
+
+        assert Log.query.filter_by(acao='SINK_ASYNC').count() == 5
+        assert sink_async.gravados == 5
+
+    def test_fila_cheia_descarta_novo(self, app, sink_async):
+        """Testa política de descarte quando a fila atinge o limite"""
+        app.config['LOG_FILA_TAMANHO_MAX'] = 2
+        sink_async._fila = queue.Queue(maxsize=2)
+
+        resultados = [sink_async._enfileirar(registro_exemplo(f'SINK_{i}')) for i in range(3)]
+
+        assert resultados == [True, True, False]
+        assert sink_async.descartados == 1
+
+    def test_fila_cheia_descarta_antigo(self, app, sink_async):
+        """Testa que a política descartar_antigo mantém os registros mais novos"""
+        app.config['LOG_POLITICA_FILA_CHEIA'] = 'descartar_antigo'
+        sink_async._fila = queue.Queue(maxsize=2)
+
+        for i in range(3):
+            assert sink_async._enfileirar(registro_exemplo(f'SINK_{i}'))
+
+        sink_async.flush()
+
+        assert sink_async.descartados == 1
+        assert Log.query.filter_by(acao='SINK_0').count() == 0
+        assert Log.query.filter_by(acao='SINK_2').count() == 1
+
+    def test_descartar_antigo_sem_vaga_conta_uma_vez(self, app, sink_async):
+        """Testa que o registro recusado mesmo após tentar liberar vaga conta um descarte só"""
+        class FilaOcupada(queue.Queue):
+            # Outras threads esvaziam e reocupam a fila entre as chamadas
+            def put_nowait(self, item):
+                raise queue.Full
+
+            def get_nowait(self):
+                raise queue.Empty
+
+        app.config['LOG_POLITICA_FILA_CHEIA'] = 'descartar_antigo'
+        sink_async._fila = FilaOcupada()
+
+        assert not sink_async._enfileirar(registro_exemplo('SINK_PERDIDO'))
+        assert sink_async.descartados == 1
@@ -263,6 +263,57 @@ class TestLogCRUD:
         assert 'usuario' in logs[0].detalhes
 
 
+class TestDetalhesLog:
+    """Testes da captura e serialização dos detalhes dos logs"""
+    
+    def test_lote_grande_resumido(self, client, auth_headers_comum, db_session):
+        """Testa que um lote grande não é copiado inteiro para Log.detalhes"""
+        leituras = [
+            {'temperatura': 37.5, 'umidade': 60.0, 'lote': 'LOTE_LOG', 'sensor': f'S{i}',
+             'data_inicial': f'2026-01-01T00:{i // 60:02d}:{i % 60:02d}'}
+            for i in range(500)
+        ]
+        
+        response = client.post('/api/leituras', headers=auth_headers_comum, json=leituras)
+        
+        assert response.status_code == 201
+        log = Log.query.filter_by(acao='CRIAR_LEITURAS').one()
+        detalhes = json.loads(log.detalhes)
+        assert detalhes['dados_requisicao']['total_itens'] == 500
+        assert len(detalhes['dados_requisicao']['primeiros']) == 20
+        assert 'duracao_ms' in detalhes
+        assert len(log.detalhes) < 5000
+    
+    def test_get_com_content_type_json_sem_corpo(self, client, auth_headers_comum, db_session):
+        """Testa que o log não transforma um GET com Content-Type JSON e sem corpo em 400"""
+        response = client.get('/api/leituras/alarmes', headers=auth_headers_comum)
+        
+        assert auth_headers_comum['Content-Type'] == 'application/json'
+        assert response.status_code == 200
+    
+    def test_resumir_dados_remove_senhas_aninhadas(self):
+        """Testa remoção de senhas em qualquer nível e o resumo de listas"""
+        from logging_utils import resumir_dados
+        
+        dados = {'usuarios': [{'username': 'a', 'password': 'x'}] * 3, 'password_nova': 'y'}
+        
+        assert resumir_dados(dados, 2) == {
+            'usuarios': {'total_itens': 3, 'primeiros': [{'username': 'a'}, {'username': 'a'}]}
+        }
+    
+    def test_serializar_detalhes(self):
+        """Testa a serialização única dos detalhes, com texto pronto passando direto"""
+        from datetime import datetime
+        from log_sink import serializar_detalhes
+        
+        assert serializar_detalhes(None) is None
+        assert serializar_detalhes('texto pronto') == 'texto pronto'
+        assert json.loads(serializar_detalhes({'a': 1, 2: 'b', 'grande': 2 ** 70})) == {
+            'a': 1, '2': 'b', 'grande': 2 ** 70
+        }
+        assert json.loads(serializar_detalhes({'data': datetime(2026, 1, 1)}))['data'].startswith('2026-01-01')
+
+
 class TestLogsAPI:
     """Testes da API de consulta de logs"""
     
@@ -326,6 +377,25 @@ class TestLogsAPI:
         # Todos os logs devem conter LOGIN na ação
         for log in data:
             assert 'LOGIN' in log['acao']
+
+    def test_filtrar_logs_por_prefixo_da_acao(self, client, auth_headers_admin):
+        """Testa que 'acao' casa qualquer trecho e 'acao_prefixo' só o início, sem curingas"""
+        with client.application.test_request_context():
+            Log.registrar_log(None, 'LOGIN_SUCESSO', status_code=200)
+            Log.registrar_log(None, 'ERRO: LOGIN', status_code=500)
+
+        response = client.get('/api/logs?acao=LOGIN', headers=auth_headers_admin)
+        assert sorted(log['acao'] for log in response.get_json()) == ['ERRO: LOGIN', 'LOGIN_SUCESSO']
+
+        response = client.get('/api/logs?acao_prefixo=LOGIN', headers=auth_headers_admin)
+        assert [log['acao'] for log in response.get_json()] == ['LOGIN_SUCESSO']
+
+        response = client.get('/api/logs?acao_prefixo=%25', headers=auth_headers_admin)
+        assert response.get_json() == []
+
+        response = client.get('/api/logs?acao_prefixo=LOGIN%F4%8F%BF%BF', headers=auth_headers_admin)
+        assert response.status_code == 200
+        assert response.get_json() == []
     
     def test_limite_logs(self, client, auth_headers_admin):
         """Testa limite de logs retornados"""
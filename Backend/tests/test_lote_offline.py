@@ -0,0 +1,318 @@
+"""
+Testes do envio em blocos numerados (POST /api/leituras/lote-offline) e do cliente de referência
+"""
+import pytest
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from models import Leitura
+from cliente_offline import ClienteLoteOffline
+
+
+def leituras(quantidade, inicio=0, lote='LOTE_OFF'):
+    return [{'umidade': 60.0, 'temperatura': 37.5, 'lote': lote,
+             'data_inicial': f'2024-08-01T{i // 3600:02d}:{(i // 60) % 60:02d}:{i % 60:02d}'}
+            for i in range(inicio, inicio + quantidade)]
+
+
+class TestLoteOfflineAPI:
+    """Testes do endpoint de blocos offline"""
+
+    def enviar(self, client, headers, seq, quantidade=10, dispositivo='incubadora-1'):
+        return client.post('/api/leituras/lote-offline', headers=headers, json={
+            'dispositivo': dispositivo, 'seq': seq, 'leituras': leituras(quantidade, inicio=seq * 100)
+        })
+
+    def test_blocos_em_ordem(self, client, auth_headers_comum, db_session):
+        """Testa que cada bloco gravado avança a confirmação"""
+        primeiro = self.enviar(client, auth_headers_comum, 1)
+        segundo = self.enviar(client, auth_headers_comum, 2)
+
+        assert primeiro.status_code == 201
+        assert primeiro.get_json()['status'] == 'aceito'
+        assert segundo.get_json()['confirmado'] == 2
+        assert segundo.get_json()['faltando'] == []
+        assert Leitura.query.filter_by(lote='LOTE_OFF').count() == 20
+
+    def test_lacuna_e_preenchimento(self, client, auth_headers_comum, headers_get_comum, db_session):
+        """Testa que um bloco fora de ordem aponta a lacuna até ela ser preenchida"""
+        self.enviar(client, auth_headers_comum, 1)
+        fora_de_ordem = self.enviar(client, auth_headers_comum, 4).get_json()
+
+        assert fora_de_ordem['confirmado'] == 1
+        assert fora_de_ordem['faltando'] == [2, 3]
+
+        self.enviar(client, auth_headers_comum, 3)
+        completo = self.enviar(client, auth_headers_comum, 2).get_json()
+        estado = client.get('/api/leituras/lote-offline?dispositivo=incubadora-1', headers=headers_get_comum).get_json()
+
+        assert completo['confirmado'] == 4
+        assert estado == {'dispositivo': 'incubadora-1', 'confirmado': 4, 'maior_recebido': 4, 'faltando': []}
+
+    def test_bloco_repetido(self, client, auth_headers_comum, db_session):
+        """Testa que o reenvio de um bloco confirmado ou pendente não grava nada"""
+        self.enviar(client, auth_headers_comum, 1)
+        self.enviar(client, auth_headers_comum, 3)
+
+        confirmado = self.enviar(client, auth_headers_comum, 1)
+        acima = self.enviar(client, auth_headers_comum, 3)
+
+        assert confirmado.status_code == acima.status_code == 200
+        assert confirmado.get_json()['status'] == 'duplicado'
+        assert acima.get_json()['faltando'] == [2]
+        assert Leitura.query.filter_by(lote='LOTE_OFF').count() == 20
+
+    def test_dispositivos_independentes(self, client, auth_headers_comum, db_session):
+        """Testa que cada dispositivo tem a sua numeração"""
+        self.enviar(client, auth_headers_comum, 1, dispositivo='incubadora-1')
+        response = self.enviar(client, auth_headers_comum, 1, dispositivo='incubadora-2')
+
+        assert response.status_code == 201
+        assert response.get_json()['confirmado'] == 1
+
+    def test_bloco_invalido(self, app, client, auth_headers_comum, db_session):
+        """Testa envelope inválido e bloco acima do tamanho máximo"""
+        sem_seq = client.post('/api/leituras/lote-offline', headers=auth_headers_comum,
+                              json={'dispositivo': 'incubadora-1', 'leituras': []})
+
+        limite_anterior = app.config['LOTE_OFFLINE_MAX_LEITURAS']
+        app.config['LOTE_OFFLINE_MAX_LEITURAS'] = 5
+        try:
+            grande = self.enviar(client, auth_headers_comum, 1)
+        finally:
+            app.config['LOTE_OFFLINE_MAX_LEITURAS'] = limite_anterior
+
+        assert sem_seq.status_code == 400
+        assert grande.status_code == 413
+        assert Leitura.query.filter_by(lote='LOTE_OFF').count() == 0
+
+    def test_bloco_rejeitado_nao_trava_confirmacao(self, client, auth_headers_comum, db_session):
+        """Testa que um bloco recusado por conteúdo inválido não para a confirmação"""
+        from models import BlocoOffline
+        invalido = client.post('/api/leituras/lote-offline', headers=auth_headers_comum, json={
+            'dispositivo': 'incubadora-1', 'seq': 1, 'leituras': [{'temperatura': 'quente', 'lote': 'LOTE_OFF'}]
+        })
+        self.enviar(client, auth_headers_comum, 2)
+        terceiro = self.enviar(client, auth_headers_comum, 3)
+        reenvio = self.enviar(client, auth_headers_comum, 1)
+
+        assert invalido.status_code == 400
+        assert invalido.get_json()['status'] == 'rejeitado'
+        assert invalido.get_json()['confirmado'] == 1
+        assert terceiro.get_json()['confirmado'] == 3
+        assert terceiro.get_json()['faltando'] == []
+        assert reenvio.get_json()['status'] == 'duplicado'
+        assert BlocoOffline.query.count() == 0
+
+    def test_dispositivo_de_outro_usuario(self, app, client, auth_headers_comum, auth_headers_admin,
+                                          headers_get_comum, db_session):
+        """Testa que só o dono da numeração (ou um administrador) envia e consulta blocos"""
+        from models import User
+        outro = User(username='outro_usuario', email='outro@teste.com', is_admin=False)
+        outro.set_password('senha123')
+        db_session.add(outro)
+        db_session.commit()
+        headers_outro = {'Authorization': f"Bearer {outro.generate_auth_token(app.config['JWT_SECRET_KEY'])}"}
+
+        self.enviar(client, auth_headers_comum, 1)
+        envio = self.enviar(client, dict(headers_outro, **{'Content-Type': 'application/json'}), 2)
+        consulta = client.get('/api/leituras/lote-offline?dispositivo=incubadora-1', headers=headers_outro)
+        admin = client.get('/api/leituras/lote-offline?dispositivo=incubadora-1', headers=auth_headers_admin)
+
+        assert envio.status_code == 403
+        assert consulta.status_code == 403
+        assert admin.get_json()['confirmado'] == 1
+
+
+class ServidorSubstituto:
+    """
+    Servidor HTTP local com o mesmo protocolo do endpoint, em memória, que
+    pode falhar de propósito: 'erro' responde 503 sem gravar, 'sem_ack'
+    grava o bloco mas responde 503, como uma confirmação perdida na rede, e
+    'rejeitar' recusa o bloco com 400 registrando o seq, como o endpoint
+    """
+
+    def __init__(self):
+        self.confirmado = 0
+        self.recebidos = set()
+        self.leituras = []
+        self.falhas = []
+        self.tokens = {'valido'}
+
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def responder(self, status, corpo):
+                dados = json.dumps(corpo).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def autorizado(self):
+                if self.headers.get('Authorization', '')[len('Bearer '):] in servidor.tokens:
+                    return True
+                self.responder(401, {'message': 'Token inválido'})
+                return False
+
+            def do_GET(self):
+                if self.autorizado():
+                    dispositivo = parse_qs(urlparse(self.path).query)['dispositivo'][0]
+                    self.responder(200, servidor.estado(dispositivo))
+
+            def do_POST(self):
+                corpo = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                if not self.autorizado():
+                    return
+                falha = servidor.falhas.pop(0) if servidor.falhas else None
+                if falha == 'erro':
+                    return self.responder(503, {'message': 'Indisponível'})
+
+                duplicado = corpo['seq'] <= servidor.confirmado or corpo['seq'] in servidor.recebidos
+                if not duplicado:
+                    servidor.recebidos.add(corpo['seq'])
+                    if falha != 'rejeitar':
+                        servidor.leituras.extend(corpo['leituras'])
+                    while servidor.confirmado + 1 in servidor.recebidos:
+                        servidor.confirmado += 1
+
+                if falha == 'rejeitar':
+                    return self.responder(400, dict(servidor.estado(corpo['dispositivo']), status='rejeitado',
+                                                    seq=corpo['seq'], message='Bloco inválido'))
+
+                if falha == 'sem_ack':
+                    return self.responder(503, {'message': 'Indisponível'})
+                self.responder(200 if duplicado else 201, dict(
+                    servidor.estado(corpo['dispositivo']),
+                    status='duplicado' if duplicado else 'aceito',
+                    seq=corpo['seq'], quantidade=0 if duplicado else len(corpo['leituras'])
+                ))
+
+        self.http = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.http.server_port}/api'
+        self.thread = threading.Thread(target=self.http.serve_forever, daemon=True)
+
+    def estado(self, dispositivo):
+        maior = max(self.recebidos, default=0)
+        return {
+            'dispositivo': dispositivo,
+            'confirmado': self.confirmado,
+            'maior_recebido': maior,
+            'faltando': [s for s in range(self.confirmado + 1, maior) if s not in self.recebidos]
+        }
+
+
+class TestClienteLoteOffline:
+    """Testes do cliente de referência contra o servidor substituto"""
+
+    @pytest.fixture
+    def servidor(self):
+        servidor = ServidorSubstituto()
+        servidor.thread.start()
+        yield servidor
+        servidor.http.shutdown()
+        servidor.http.server_close()
+
+    def cliente(self, servidor, diretorio, **opcoes):
+        opcoes.setdefault('token', 'valido')
+        return ClienteLoteOffline(servidor.url, 'incubadora-1', str(diretorio), tamanho_bloco=200,
+                                  timeout=5, **opcoes)
+
+    def registrar(self, cliente, quantidade, inicio=0):
+        for leitura in leituras(quantidade, inicio):
+            cliente.registrar(leitura)
+
+    def test_envio_em_blocos(self, servidor, tmp_path):
+        """Testa que o buffer é enviado em blocos numerados e apagado após a confirmação"""
+        cliente = self.cliente(servidor, tmp_path)
+        self.registrar(cliente, 450)
+
+        resultado = cliente.enviar()
+
+        assert resultado == {'enviados': 3, 'leituras': 450, 'pendentes': 0, 'faltando': []}
+        assert len(servidor.leituras) == 450
+        assert servidor.confirmado == 3
+
+    def test_retoma_apos_falha(self, servidor, tmp_path):
+        """Testa que os blocos não enviados ficam guardados para a próxima tentativa"""
+        cliente = self.cliente(servidor, tmp_path)
+        self.registrar(cliente, 450)
+        servidor.falhas = [None, 'erro']
+
+        parcial = cliente.enviar()
+        self.registrar(cliente, 50, inicio=450)
+        final = cliente.enviar()
+
+        assert parcial['enviados'] == 1
+        assert parcial['pendentes'] == 2
+        assert final['pendentes'] == 0
+        assert len(servidor.leituras) == 500
+        assert servidor.confirmado == 4
+
+    def test_confirmacao_perdida(self, servidor, tmp_path):
+        """Testa que um bloco gravado sem confirmação não é gravado duas vezes"""
+        cliente = self.cliente(servidor, tmp_path)
+        self.registrar(cliente, 200)
+        servidor.falhas = ['sem_ack']
+
+        assert cliente.enviar()['pendentes'] == 1
+        # Reinício do dispositivo: nova instância sobre o mesmo armazenamento
+        resultado = self.cliente(servidor, tmp_path).enviar()
+
+        assert resultado['pendentes'] == 0
+        assert len(servidor.leituras) == 200
+
+    def test_token_renovado(self, servidor, tmp_path):
+        """Testa que um 401 renova o token e repete a requisição"""
+        logins = []
+
+        def obter_token():
+            logins.append(1)
+            return 'valido'
+
+        cliente = self.cliente(servidor, tmp_path, token='expirado', obter_token=obter_token)
+        self.registrar(cliente, 10)
+
+        assert cliente.enviar()['enviados'] == 1
+        assert len(logins) == 1
+
+    def test_armazenamento_perdido_nao_reutiliza_seq(self, servidor, tmp_path):
+        """Testa que, sem o estado local, a numeração continua após o maior seq do servidor"""
+        self.registrar(self.cliente(servidor, tmp_path / 'antes'), 400)
+        self.cliente(servidor, tmp_path / 'antes').enviar()
+
+        cliente = self.cliente(servidor, tmp_path / 'depois')
+        self.registrar(cliente, 10, inicio=400)
+        resultado = cliente.enviar()
+
+        assert resultado['enviados'] == 1
+        assert servidor.confirmado == 3
+        assert len(servidor.leituras) == 410
+
+    def test_bloco_rejeitado(self, servidor, tmp_path):
+        """Testa que o bloco recusado é guardado à parte e os seguintes são confirmados"""
+        cliente = self.cliente(servidor, tmp_path)
+        self.registrar(cliente, 600)
+        servidor.falhas = ['rejeitar']
+
+        resultado = cliente.enviar()
+
+        assert resultado == {'enviados': 2, 'leituras': 400, 'pendentes': 0, 'faltando': []}
+        assert servidor.confirmado == 3
+        assert (tmp_path / 'blocos' / f'{1:010d}.json.rejeitado').exists()
+
+    def test_servidor_fora_do_ar(self, tmp_path):
+        """Testa que sem servidor nada se perde"""
+        cliente = ClienteLoteOffline('http://127.0.0.1:9/api', 'incubadora-1', str(tmp_path),
+                                     token='valido', timeout=1)
+        self.registrar(cliente, 10)
+
+        resultado = cliente.enviar()
+
+        assert resultado['enviados'] == 0
+        assert (tmp_path / 'buffer.jsonl').exists()
@@ -313,3 +313,56 @@ class TestParametrosValidacao:
         )
         
         assert response.status_code == 201
+
+
+class TestParametrosCondicional:
+    """Testes de ETag / If-None-Match em lotes, empresas e parâmetros"""
+    
+    @pytest.mark.parametrize('url', [
+        '/api/lotes',
+        '/api/empresas',
+        '/api/parametros?empresa=Empresa%20A&lote=LOTE_A1'
+    ])
+    def test_304_sem_alteracoes(self, client, headers_get_admin, multiplos_parametros, url):
+        """Testa que o mesmo ETag devolve 304 sem corpo"""
+        etag = client.get(url, headers=headers_get_admin).headers['ETag']
+        
+        response = client.get(url, headers={**headers_get_admin, 'If-None-Match': etag})
+        
+        assert response.status_code == 304
+        assert response.get_data() == b''
+    
+    def test_etag_muda_apos_criar_e_atualizar(self, client, headers_get_admin, auth_headers_admin,
+                                              multiplos_parametros):
+        """Testa que POST e PUT de parâmetros invalidam o ETag de /api/lotes"""
+        etag = client.get('/api/lotes', headers=headers_get_admin).headers['ETag']
+        
+        client.post('/api/parametros', headers=auth_headers_admin, data=json.dumps({
+            'empresa': 'Empresa C', 'lote': 'LOTE_C1', 'temp_ideal': 37.5, 'umid_ideal': 60.0
+        }))
+        response = client.get('/api/lotes', headers={**headers_get_admin, 'If-None-Match': etag})
+        assert response.status_code == 200
+        assert 'LOTE_C1' in response.get_json()
+        
+        etag = response.headers['ETag']
+        client.put(f'/api/parametros/{multiplos_parametros[0].id}', headers=auth_headers_admin,
+                   data=json.dumps({'lote': 'LOTE_RENOMEADO'}))
+        response = client.get('/api/lotes', headers={**headers_get_admin, 'If-None-Match': etag})
+        assert response.status_code == 200
+        assert 'LOTE_RENOMEADO' in response.get_json()
+    
+    def test_corpo_acompanha_etag(self, client, headers_get_admin, db_session, multiplos_parametros, monkeypatch):
+        """Testa que um ETag novo nunca vem com as linhas antigas do registro em memória"""
+        from cache_parametros import registro_parametros
+        monkeypatch.setattr(registro_parametros, 'intervalo_verificacao', 60)
+        url = '/api/parametros?empresa=Empresa%20A&lote=LOTE_A1'
+        etag = client.get(url, headers=headers_get_admin).headers['ETag']
+        
+        # Escrita de outro worker: o registro deste processo não é invalidado
+        multiplos_parametros[0].temp_ideal = 39.0
+        db_session.commit()
+        response = client.get(url, headers={**headers_get_admin, 'If-None-Match': etag})
+        
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert response.get_json()[0]['temp_ideal'] == 39.0
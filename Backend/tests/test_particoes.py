@@ -0,0 +1,61 @@
+"""
+Testes para o gerenciamento de partições mensais de leituras
+"""
+import pytest
+from datetime import datetime
+import particoes
+from particoes import (
+    somar_meses, nome_particao, mes_da_particao, meses_entre, manter_particoes
+)
+
+
+class TestCalculoDeMeses:
+    """Testes das funções de calendário usadas nas partições"""
+    
+    def test_somar_meses_vira_o_ano(self):
+        """Testa soma e subtração de meses atravessando o ano"""
+        assert somar_meses(datetime(2025, 11, 15), 3) == datetime(2026, 2, 1)
+        assert somar_meses(datetime(2025, 1, 31), -1) == datetime(2024, 12, 1)
+    
+    def test_nome_e_mes_da_particao(self):
+        """Testa que o nome da partição é reversível"""
+        nome = nome_particao(datetime(2025, 6, 1))
+        
+        assert nome == 'leituras_2025_06'
+        assert mes_da_particao(nome) == datetime(2025, 6, 1)
+        assert mes_da_particao('leituras_default') is None
+    
+    def test_meses_entre(self):
+        """Testa a lista de meses de um intervalo"""
+        meses = meses_entre(datetime(2025, 11, 20), datetime(2026, 1, 5))
+        
+        assert meses == [datetime(2025, 11, 1), datetime(2025, 12, 1), datetime(2026, 1, 1)]
+
+
+class TestManterParticoes:
+    """Testes da rotina de manutenção (sem banco, operações registradas)"""
+    
+    @pytest.fixture
+    def operacoes(self, monkeypatch):
+        registro = {'criadas': [], 'desanexadas': []}
+        existentes = ['leituras_2025_01', 'leituras_2025_02', 'leituras_2025_06', 'leituras_default']
+        
+        monkeypatch.setattr(particoes, 'listar_particoes', lambda conexao: existentes)
+        monkeypatch.setattr(particoes, 'criar_particao',
+                            lambda conexao, mes: registro['criadas'].append(mes) or nome_particao(mes))
+        monkeypatch.setattr(particoes, 'desanexar_particao',
+                            lambda conexao, nome, remover=False: registro['desanexadas'].append(nome))
+        return registro
+    
+    def test_cria_apenas_meses_faltantes(self, operacoes):
+        """Testa que só os meses futuros sem partição são criados"""
+        resultado = manter_particoes(None, meses_futuros=2, agora=datetime(2025, 6, 10))
+        
+        assert resultado['criadas'] == ['leituras_2025_07', 'leituras_2025_08']
+        assert resultado['desanexadas'] == []
+    
+    def test_desanexa_fora_da_retencao(self, operacoes):
+        """Testa que partições antigas saem e a padrão nunca é tocada"""
+        resultado = manter_particoes(None, meses_futuros=0, reter_meses=4, agora=datetime(2025, 6, 10))
+        
+        assert resultado['desanexadas'] == ['leituras_2025_01']
@@ -0,0 +1,169 @@
+"""
+Testes do envio em tempo real (SSE) das leituras novas
+"""
+import pytest
+import json
+from models import Leitura
+from transmissao import hub_leituras, gerar_eventos
+
+
+def eventos(texto):
+    """Separa um trecho text/event-stream em dicionários campo -> valor"""
+    resultado = []
+    for bloco in texto.strip().split('\n\n'):
+        campos = dict(linha.split(': ', 1) for linha in bloco.split('\n') if ': ' in linha)
+        if 'data' in campos:
+            resultado.append(campos)
+    return resultado
+
+
+def inserir(db_session, lote, quantidade=1):
+    leituras = [Leitura(umidade=60.0, temperatura=37.5, lote=lote) for _ in range(quantidade)]
+    db_session.add_all(leituras)
+    db_session.commit()
+    return [l.id for l in leituras]
+
+
+class TestHubLeituras:
+    """Testes da distribuição das leituras às assinaturas"""
+
+    def test_distribui_por_lote(self, app, db_session):
+        """Testa que cada assinatura recebe só as leituras do seu lote"""
+        do_lote = hub_leituras.assinar('LOTE_SSE')
+        todas = hub_leituras.assinar()
+        try:
+            ids = inserir(db_session, 'LOTE_SSE') + inserir(db_session, 'OUTRO')
+            hub_leituras.publicar()
+
+            assert [do_lote.fila.get_nowait()[0]] == ids[:1]
+            assert do_lote.fila.empty()
+            assert [todas.fila.get_nowait()[0] for _ in range(2)] == ids
+        finally:
+            hub_leituras.cancelar(do_lote)
+            hub_leituras.cancelar(todas)
+
+    def test_post_leituras_publica(self, app, client, db_session, auth_headers_comum):
+        """Testa que POST /api/leituras entrega as leituras aos assinantes após o commit"""
+        assinatura = hub_leituras.assinar('LOTE_SSE')
+        try:
+            response = client.post('/api/leituras', headers=auth_headers_comum, json=[
+                {'umidade': 60.0, 'temperatura': 37.5, 'lote': 'LOTE_SSE'},
+                {'umidade': 61.0, 'temperatura': 37.6, 'lote': 'LOTE_SSE'}
+            ])
+
+            assert response.status_code == 201
+            assert assinatura.fila.qsize() == 2
+        finally:
+            hub_leituras.cancelar(assinatura)
+
+    def test_fila_cheia_encerra_assinatura(self, app, db_session):
+        """Testa que o cliente lento é desligado e recebe o que já estava na fila"""
+        limite_anterior = app.config['LEITURAS_STREAM_FILA_MAX']
+        app.config['LEITURAS_STREAM_FILA_MAX'] = 2
+        try:
+            assinatura = hub_leituras.assinar('LOTE_SSE')
+            inserir(db_session, 'LOTE_SSE', 3)
+            hub_leituras.publicar()
+        finally:
+            app.config['LEITURAS_STREAM_FILA_MAX'] = limite_anterior
+
+        assert assinatura.atrasada
+        assert assinatura not in hub_leituras._assinaturas
+
+        enviados = eventos(''.join(gerar_eventos(assinatura)))
+        assert len(enviados) == 2
+
+
+    def test_id_confirmado_fora_de_ordem(self, app, db_session, monkeypatch):
+        """Testa que o id N confirmado depois de N+1 é entregue, antes de N+1"""
+        assinatura = hub_leituras.assinar('LOTE_SSE')
+        try:
+            n = hub_leituras.ultimo_id + 1
+            # Transações 10 e 11 em andamento: uma delas pode ter reservado o id N
+            monkeypatch.setattr(hub_leituras, '_snapshot', lambda: (10, 12))
+            db_session.add(Leitura(id=n + 1, umidade=60.0, temperatura=37.5, lote='LOTE_SSE'))
+            db_session.commit()
+            hub_leituras.publicar()
+
+            assert assinatura.fila.empty()
+            assert hub_leituras.ultimo_id == n - 1
+
+            db_session.add(Leitura(id=n, umidade=61.0, temperatura=37.6, lote='LOTE_SSE'))
+            db_session.commit()
+            hub_leituras.publicar()
+
+            assert [assinatura.fila.get_nowait()[0] for _ in range(2)] == [n, n + 1]
+            assert hub_leituras.ultimo_id == n + 1
+        finally:
+            hub_leituras.cancelar(assinatura)
+
+    def test_lacuna_encerrada_e_pulada(self, app, db_session, monkeypatch):
+        """Testa que a lacuna é pulada quando as transações que a abriram terminam"""
+        assinatura = hub_leituras.assinar('LOTE_SSE')
+        try:
+            n = hub_leituras.ultimo_id + 1
+            monkeypatch.setattr(hub_leituras, '_snapshot', lambda: (10, 12))
+            db_session.add(Leitura(id=n + 1, umidade=60.0, temperatura=37.5, lote='LOTE_SSE'))
+            db_session.commit()
+            hub_leituras.publicar()
+            assert assinatura.fila.empty()
+
+            # O id N foi descartado (rollback): nenhuma transação anterior segue aberta
+            monkeypatch.setattr(hub_leituras, '_snapshot', lambda: (12, 14))
+            hub_leituras.publicar()
+
+            assert assinatura.fila.get_nowait()[0] == n + 1
+            assert hub_leituras._lacuna is None
+        finally:
+            hub_leituras.cancelar(assinatura)
+
+
+class TestStreamLeituras:
+    """Testes do endpoint GET /api/leituras/stream"""
+
+    def test_reenvio_por_last_event_id(self, client, db_session, token_usuario_comum):
+        """Testa que as leituras após o Last-Event-ID são reenviadas antes das novas"""
+        ids = inserir(db_session, 'LOTE_SSE', 3) + inserir(db_session, 'OUTRO')
+
+        response = client.get('/api/leituras/stream?lote=LOTE_SSE', headers={
+            'Authorization': f'Bearer {token_usuario_comum}',
+            'Last-Event-ID': str(ids[0])
+        })
+        partes = iter(response.response)
+        texto = b''.join(next(partes) for _ in range(4)).decode()
+        response.close()
+
+        assert response.mimetype == 'text/event-stream'
+        assert texto.startswith('retry: ')
+        enviados = eventos(texto)
+        assert [int(e['id']) for e in enviados] == ids[1:3]
+        assert json.loads(enviados[0]['data'])['lote'] == 'LOTE_SSE'
+        assert ': ping' in texto
+
+    def test_reset_quando_perdas_excedem_reenvio(self, app, client, db_session, token_usuario_comum):
+        """Testa o evento 'reset' quando há leituras perdidas demais para reenviar"""
+        ids = inserir(db_session, 'LOTE_SSE', 5)
+        limite_anterior = app.config['LEITURAS_STREAM_REENVIO_MAX']
+        app.config['LEITURAS_STREAM_REENVIO_MAX'] = 2
+        try:
+            response = client.get(f'/api/leituras/stream?desde_id={ids[0]}', headers={
+                'Authorization': f'Bearer {token_usuario_comum}'
+            })
+            partes = iter(response.response)
+            texto = b''.join(next(partes) for _ in range(2)).decode()
+            response.close()
+        finally:
+            app.config['LEITURAS_STREAM_REENVIO_MAX'] = limite_anterior
+
+        reset = eventos(texto)[0]
+        assert reset['event'] == 'reset'
+        assert json.loads(reset['data']) == {'desde_id': ids[0]}
+
+    def test_last_event_id_invalido(self, client, db_session, token_usuario_comum):
+        """Testa que Last-Event-ID não numérico retorna 400"""
+        response = client.get('/api/leituras/stream', headers={
+            'Authorization': f'Bearer {token_usuario_comum}',
+            'Last-Event-ID': 'abc'
+        })
+
+        assert response.status_code == 400
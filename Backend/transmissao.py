@@ -0,0 +1,317 @@
+# transmissao.py - Distribuição em tempo real (SSE) das leituras recém-inseridas
+
+import atexit
+import json
+import os
+import queue
+import select
+import threading
+import time
+
+from sqlalchemy import func, text
+
+from extensions import db
+from models import Leitura
+
+
+class Assinatura:
+    """
+    Fila de eventos de um cliente SSE. 'marca' é o último id já distribuído
+    quando o cliente entrou: o que vier depois chega pela fila.
+    """
+
+    __slots__ = ('lote', 'fila', 'marca', 'atrasada')
+
+    def __init__(self, lote, tamanho_fila):
+        self.lote = lote
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+        self.marca = 0
+        self.atrasada = False
+
+    def aceita(self, leitura):
+        return self.lote is None or self.lote == leitura['lote']
+
+
+class HubLeituras:
+    """
+    Uma thread por processo busca as leituras novas (id acima do último
+    distribuído) e as repassa às assinaturas daquele processo.
+
+    No PostgreSQL a thread fica em LISTEN no canal LEITURAS_STREAM_CANAL e
+    publicar() faz NOTIFY, acordando os hubs de todos os workers do Gunicorn.
+    Nos demais bancos o aviso vale só para o processo atual. Em qualquer caso
+    a thread também consulta a cada LEITURAS_STREAM_HEARTBEAT segundos, o que
+    cobre avisos perdidos.
+
+    Com LEITURAS_STREAM_ASYNC desligado (ex.: testes) não há thread e
+    publicar() distribui na hora, na thread de quem chamou.
+
+    ultimo_id só avança sobre ids contíguos: ids do SERIAL não confirmam em
+    ordem, e uma lacuna abaixo de uma leitura já visível pode ser uma
+    transação ainda aberta. A distribuição para na lacuna até que todas as
+    transações em andamento quando ela apareceu terminem (xmin do snapshot
+    do PostgreSQL) ou até LEITURAS_STREAM_LACUNA_MAX segundos; assim tudo
+    até ultimo_id já foi entregue e o reenvio por Last-Event-ID não perde
+    leituras confirmadas fora de ordem.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.ultimo_id = 0
+        self._assinaturas = set()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+        self._lacuna = None
+        self.descartadas = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LEITURAS_STREAM_ASYNC', True)
+        app.config.setdefault('LEITURAS_STREAM_CANAL', 'leituras_novas')
+        app.config.setdefault('LEITURAS_STREAM_HEARTBEAT', 15)
+        app.config.setdefault('LEITURAS_STREAM_FILA_MAX', 1000)
+        app.config.setdefault('LEITURAS_STREAM_REENVIO_MAX', 1000)
+        app.config.setdefault('LEITURAS_STREAM_LACUNA_MAX', 30)
+
+        self.app = app
+        atexit.register(self.parar)
+
+    @property
+    def usa_notify(self):
+        return db.engine.dialect.name == 'postgresql'
+
+    def assinar(self, lote=None):
+        if self.app.config['LEITURAS_STREAM_ASYNC']:
+            self._garantir_worker()
+        elif not self._assinaturas:
+            self.ultimo_id = self._maior_id()
+        assinatura = Assinatura(lote, self.app.config['LEITURAS_STREAM_FILA_MAX'])
+
+        with self._lock:
+            assinatura.marca = self.ultimo_id
+            self._assinaturas.add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            self._assinaturas.discard(assinatura)
+
+    def publicar(self):
+        """
+        Avisa que há leituras novas; chamar depois do commit da inserção
+        """
+        if self.app is None:
+            return
+
+        try:
+            if not self.app.config['LEITURAS_STREAM_ASYNC']:
+                self.distribuir()
+            elif self.usa_notify:
+                with db.engine.begin() as conexao:
+                    conexao.execute(text('SELECT pg_notify(:canal, \'\')'),
+                                    {'canal': self.app.config['LEITURAS_STREAM_CANAL']})
+            else:
+                self._acordar.set()
+        except Exception as e:
+            print(f"Erro ao publicar leituras novas: {str(e)}")
+
+    def distribuir(self):
+        """
+        Repassa às assinaturas as leituras com id acima de ultimo_id, em ordem
+        e sem pular ids que ainda podem ser confirmados
+        """
+        while True:
+            with self.app.app_context():
+                snapshot = self._snapshot()
+                leituras = [l.to_dict() for l in Leitura.query.filter(
+                    Leitura.id > self.ultimo_id
+                ).order_by(Leitura.id.asc()).limit(self.app.config['LEITURAS_STREAM_FILA_MAX']).all()]
+
+            if not leituras:
+                return
+
+            with self._lock:
+                for leitura in leituras:
+                    if leitura['id'] > self.ultimo_id + 1 and not self._lacuna_encerrada(snapshot):
+                        return
+                    for assinatura in list(self._assinaturas):
+                        if assinatura.aceita(leitura):
+                            self._entregar(assinatura, leitura)
+                    self.ultimo_id = leitura['id']
+                    self._lacuna = None
+
+            if len(leituras) < self.app.config['LEITURAS_STREAM_FILA_MAX']:
+                return
+
+    def parar(self, timeout=5.0):
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._parar.set()
+            self._acordar.set()
+            thread.join(timeout)
+
+        self._thread = None
+        self._parar.clear()
+
+    def _entregar(self, assinatura, leitura):
+        try:
+            assinatura.fila.put_nowait((leitura['id'], leitura))
+        except queue.Full:
+            # Cliente lento: a conexão é encerrada e ele retoma pelo Last-Event-ID
+            assinatura.atrasada = True
+            self._assinaturas.discard(assinatura)
+            self.descartadas += 1
+
+    def _garantir_worker(self):
+        # Como no log_sink, a thread é recriada em cada processo após o fork
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+
+            if self._pid != os.getpid():
+                self._assinaturas = set()
+
+            self.ultimo_id = self._maior_id()
+
+            self._pid = os.getpid()
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._executar, name='hub-leituras', daemon=True)
+            self._thread.start()
+
+    def _maior_id(self):
+        return db.session.query(func.max(Leitura.id)).scalar() or 0
+
+    def _snapshot(self):
+        # (xmin, xmax) do snapshot atual; None onde há um só escritor por vez
+        # (SQLite): lá um id maior visível implica que os menores já confirmaram
+        if not self.usa_notify:
+            return None
+        return tuple(db.session.execute(text(
+            'SELECT txid_snapshot_xmin(s), txid_snapshot_xmax(s) FROM txid_current_snapshot() s'
+        )).one())
+
+    def _lacuna_encerrada(self, snapshot):
+        """
+        True se os ids entre ultimo_id e a próxima leitura visível não virão
+        mais (rollback, conflito no ON CONFLICT DO NOTHING, remoção)
+        """
+        if snapshot is None:
+            return True
+
+        xmin, xmax = snapshot
+        agora = time.monotonic()
+        if self._lacuna is None or self._lacuna[0] != self.ultimo_id:
+            # Quem reservou os ids da lacuna já estava em andamento agora: txid < xmax
+            self._lacuna = (self.ultimo_id, xmax, agora)
+
+        _, xmax_lacuna, desde = self._lacuna
+        return xmin >= xmax_lacuna or agora - desde >= self.app.config['LEITURAS_STREAM_LACUNA_MAX']
+
+    def _executar(self):
+        escuta = None
+
+        while not self._parar.is_set():
+            try:
+                with self.app.app_context():
+                    if escuta is None and self.usa_notify:
+                        escuta = self._escutar()
+
+                # Com uma lacuna pendente a consulta se repete logo: o id pode ter
+                # sido descartado por uma transação que não fará NOTIFY
+                heartbeat = self.app.config['LEITURAS_STREAM_HEARTBEAT']
+                self._esperar(escuta, min(heartbeat, 0.5) if self._lacuna else heartbeat)
+                self.distribuir()
+            except Exception as e:
+                print(f"Erro no hub de leituras: {str(e)}")
+                if escuta is not None:
+                    try:
+                        escuta.close()
+                    except Exception:
+                        pass
+                    escuta = None
+                time.sleep(1)
+
+        if escuta is not None:
+            escuta.close()
+
+    def _escutar(self):
+        # Conexão própria, fora do pool e em autocommit, dedicada ao LISTEN
+        conexao = db.engine.raw_connection()
+        conexao.detach()
+        conexao.connection.autocommit = True
+        with conexao.connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {self.app.config['LEITURAS_STREAM_CANAL']}")
+        return conexao.connection
+
+    def _esperar(self, escuta, timeout):
+        if escuta is None:
+            self._acordar.wait(timeout)
+            self._acordar.clear()
+            return
+
+        if select.select([escuta], [], [], timeout)[0]:
+            escuta.poll()
+            escuta.notifies.clear()
+
+
+hub_leituras = HubLeituras()
+
+
+def evento_sse(dados, id=None, evento=None):
+    partes = []
+    if id is not None:
+        partes.append(f'id: {id}')
+    if evento:
+        partes.append(f'event: {evento}')
+    partes.append(f'data: {json.dumps(dados)}')
+    return '\n'.join(partes) + '\n\n'
+
+
+def gerar_eventos(assinatura, desde_id=None):
+    """
+    Fluxo text/event-stream de uma assinatura. Com desde_id (Last-Event-ID) as
+    leituras perdidas até a marca da assinatura são reenviadas antes das novas;
+    se passarem de LEITURAS_STREAM_REENVIO_MAX o cliente recebe 'reset' e deve
+    ressincronizar por GET /api/leituras?desde_id=.
+    """
+    app = hub_leituras.app
+    try:
+        yield 'retry: 3000\n\n'
+
+        if desde_id is not None and desde_id < assinatura.marca:
+            yield from _reenviar(assinatura, desde_id, app.config['LEITURAS_STREAM_REENVIO_MAX'])
+
+        # A conexão com o banco não fica presa durante o fluxo
+        db.session.remove()
+
+        while not assinatura.atrasada or not assinatura.fila.empty():
+            try:
+                id, leitura = assinatura.fila.get(timeout=app.config['LEITURAS_STREAM_HEARTBEAT'])
+            except queue.Empty:
+                yield ': ping\n\n'
+                continue
+            yield evento_sse(leitura, id, 'leitura')
+    finally:
+        hub_leituras.cancelar(assinatura)
+
+
+def _reenviar(assinatura, desde_id, maximo):
+    query = Leitura.query.filter(Leitura.id > desde_id, Leitura.id <= assinatura.marca)
+    if assinatura.lote is not None:
+        query = query.filter(Leitura.lote == assinatura.lote)
+
+    perdidas = query.order_by(Leitura.id.asc()).limit(maximo + 1).all()
+    if len(perdidas) > maximo:
+        yield evento_sse({'desde_id': desde_id}, evento='reset')
+        return
+
+    for leitura in perdidas:
+        yield evento_sse(leitura.to_dict(), leitura.id, 'leitura')
@@ -0,0 +1,131 @@
+# versoes.py - Versão por tabela e respostas condicionais (ETag / If-None-Match)
+
+import hashlib
+from functools import wraps
+
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import VersaoTabela
+
+# Tabelas cujas escritas mudam o ETag dos endpoints de leitura ou recarregam
+# os registros em memória (cache_parametros.py, dispositivos.py, revogacao.py, auth_cache.py)
+TABELAS_VERSIONADAS = ('leituras', 'parametro', 'dispositivos', 'tokens_revogados', 'users')
+
+
+def _comando_incremento(dialeto, tabela):
+    if dialeto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    comando = insert(VersaoTabela.__table__).values(tabela=tabela, versao=1)
+    return comando.on_conflict_do_update(
+        index_elements=['tabela'],
+        set_={'versao': VersaoTabela.__table__.c.versao + 1}
+    )
+
+
+def incrementar_versao(*tabelas, conexao):
+    for tabela in tabelas:
+        conexao.execute(_comando_incremento(conexao.dialect.name, tabela))
+
+
+def marcar_alteradas(*tabelas, sessao=None):
+    """
+    Agenda o incremento da versão das tabelas para depois do commit da sessão
+    (a de db, por padrão), numa transação curta e separada. Incrementar dentro
+    da transação da escrita travaria a linha da tabela em versoes_tabelas até o
+    commit e serializaria todas as ingestões simultâneas. Depois do commit, um
+    leitor no máximo vê os dados novos com a versão antiga por um instante, e
+    baixa de novo quando a versão muda; nunca guarda dados velhos sob a versão nova.
+    """
+    sessao = sessao or db.session()
+    sessao.info.setdefault('versoes_pendentes', set()).update(tabelas)
+
+
+def obter_versoes(tabelas):
+    linhas = dict(db.session.query(VersaoTabela.tabela, VersaoTabela.versao).filter(
+        VersaoTabela.tabela.in_(tabelas)
+    ).all())
+    return [linhas.get(tabela, 0) for tabela in tabelas]
+
+
+def calcular_etag(tabelas, current_user):
+    """
+    Versões das tabelas mais um resumo da URL (filtros) e do perfil do usuário
+    """
+    lidas = obter_versoes(tabelas)
+    # A rota pode passar a versão lida aos registros em memória (ver RegistroParametros)
+    g.versoes = dict(zip(tabelas, lidas))
+    versoes = '.'.join(str(v) for v in lidas)
+    consulta = f'{request.full_path}|{bool(current_user.is_admin)}'
+    return f'{versoes}-{hashlib.sha1(consulta.encode()).hexdigest()[:16]}'
+
+
+def condicional(*tabelas):
+    """
+    Decorator (abaixo de token_required) que responde 304 sem executar a rota
+    quando o If-None-Match ainda corresponde às versões atuais das tabelas.
+    A versão é lida antes da consulta: uma escrita concorrente no meio do caminho
+    no máximo faz o próximo pedido baixar os dados de novo.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(current_user, *args, **kwargs):
+            etag = calcular_etag(tabelas, current_user)
+
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(f(current_user, *args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            # ETag fraco: o mesmo conteúdo pode ser enviado comprimido ou não
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated
+    return decorator
+
+
+# Escritas pelo ORM (PUT/DELETE de leituras, parâmetros) marcam a tabela no
+# flush; inserções por Core chamam marcar_alteradas diretamente
+@event.listens_for(Session, 'after_flush')
+def _marcar_apos_flush(sessao, contexto):
+    alteradas = {
+        getattr(objeto, '__tablename__', None)
+        for objeto in (*sessao.new, *sessao.dirty, *sessao.deleted)
+    }
+    tabelas = [t for t in TABELAS_VERSIONADAS if t in alteradas]
+    if tabelas:
+        marcar_alteradas(*tabelas, sessao=sessao)
+
+
+@event.listens_for(Session, 'after_bulk_update')
+@event.listens_for(Session, 'after_bulk_delete')
+def _marcar_em_massa(contexto):
+    tabela = contexto.mapper.local_table.name
+    if tabela in TABELAS_VERSIONADAS:
+        marcar_alteradas(tabela, sessao=contexto.session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _incrementar_apos_commit(sessao):
+    tabelas = sessao.info.pop('versoes_pendentes', None)
+    if not tabelas:
+        return
+    try:
+        with sessao.get_bind().begin() as conexao:
+            incrementar_versao(*sorted(tabelas), conexao=conexao)
+    except Exception as e:
+        # Os dados já foram gravados; no pior caso o ETag só muda na próxima escrita
+        print(f"Erro ao incrementar versões {sorted(tabelas)}: {str(e)}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_pendentes(sessao):
+    sessao.info.pop('versoes_pendentes', None)
@@ -2,6 +2,15 @@
 
 const API_BASE_URL = "http://172.16.1.22:5001";
 
+// Máximo de pontos por gráfico pedidos a /leituras/serie
+const SERIE_PONTOS = 500;
+
+// Intervalo de atualização do painel enquanto o fluxo SSE estiver desconectado
+const INTERVALO_ATUALIZACAO_MS = 30000;
+
+// Espera para juntar várias leituras recebidas por SSE numa só atualização dos gráficos
+const ATRASO_GRAFICOS_MS = 1000;
+
 let loginForm, errorMessage, logoutBtn;
 
 const urlParams = new URLSearchParams(window.location.search);
@@ -510,6 +519,7 @@ function setupDashboardPage() {
         ? `Lote: ${loteSelecionado}`
         : "Lote: Todos";
       await fetchReadings(loteSelecionado);
+      connectReadingsStream(loteSelecionado);
     });
   }
 
@@ -521,47 +531,108 @@ function setupDashboardPage() {
     setupParametroModal();
   }
 
+  // Marca d'água (maior id já visto) do lote exibido no painel
+  const sincronizacao = { lote: null, desdeId: null };
+
+  // Fluxo SSE do lote exibido; sem ele o painel volta a consultar periodicamente
+  const fluxo = { controle: null, conectado: false, agendamento: null };
+
   fetchReadings();
+  connectReadingsStream();
+  setInterval(() => {
+    if (!document.hidden && !fluxo.conectado)
+      fetchReadings(loteFilter ? loteFilter.value : "");
+  }, INTERVALO_ATUALIZACAO_MS);
+
+  function connectReadingsStream(lote = "") {
+    if (fluxo.controle) fluxo.controle.abort();
+    fluxo.controle = new AbortController();
+
+    streamReadings(lote, fluxo.controle.signal, {
+      onStatus: (conectado) => {
+        fluxo.conectado = conectado;
+      },
+      onEvent: (evento, dados) => {
+        if (evento === "leitura") {
+          updateLastReading({
+            ...dados,
+            data_inicial: dados.data_inicial ? new Date(dados.data_inicial) : null,
+          });
+        }
+        // Leituras novas (ou 'reset') atualizam os gráficos uma vez por rajada
+        clearTimeout(fluxo.agendamento);
+        fluxo.agendamento = setTimeout(
+          () => fetchReadings(lote),
+          ATRASO_GRAFICOS_MS
+        );
+      },
+    });
+  }
 
   async function fetchReadings(lote = "") {
     try {
       console.log(`Buscando leituras para lote: ${lote}`);
       const token = localStorage.getItem("embryotech_token");
-      let url = `${API_BASE_URL}/leituras`;
-
-      if (lote) {
-        url += `?lote=${encodeURIComponent(lote)}`;
+      const filtroLote = lote ? `&lote=${encodeURIComponent(lote)}` : "";
+      const headers = { Authorization: `Bearer ${token}` };
+      const mesmoLote =
+        sincronizacao.lote === lote && sincronizacao.desdeId !== null;
+
+      let marca = null;
+
+      if (mesmoLote) {
+        // Só recarrega os gráficos se chegaram leituras desde a última busca
+        const { novas, desdeId } = await fetchNewReadings(
+          lote,
+          sincronizacao.desdeId
+        );
+        sincronizacao.desdeId = desdeId;
+        if (novas.length === 0) return;
+      } else {
+        // Marca d'água lida antes dos gráficos: nada gravado depois dela fica de fora
+        const marcaResponse = await fetch(
+          `${API_BASE_URL}/leituras?desde_id=ultimo${filtroLote}`,
+          { headers }
+        );
+        if (!marcaResponse.ok)
+          throw new Error(`Erro HTTP: ${marcaResponse.status}`);
+        marca = (await marcaResponse.json()).desde_id;
       }
 
-      const response = await fetch(url, {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-
-      if (!response.ok) throw new Error(`Erro HTTP: ${response.status}`);
-
-      let readings = await response.json();
-
-      // Processamento seguro das datas
-      readings = readings.map((r) => ({
-        ...r,
-        data_inicial: r.data_inicial ? new Date(r.data_inicial) : null,
-        data_final: r.data_final ? new Date(r.data_final) : null,
-      }));
-
-      // Ordenação segura
-      readings.sort((a, b) => {
-        const dateA = a.data_inicial ? new Date(a.data_inicial) : new Date(0);
-        const dateB = b.data_inicial ? new Date(b.data_inicial) : new Date(0);
-        return dateB - dateA;
-      });
+      // Última leitura e séries já reduzidas pelo servidor (no máximo SERIE_PONTOS pontos)
+      const [ultimaResponse, serieResponse] = await Promise.all([
+        fetch(`${API_BASE_URL}/leituras?limite=1${filtroLote}`, { headers }),
+        fetch(
+          `${API_BASE_URL}/leituras/serie?pontos=${SERIE_PONTOS}${filtroLote}`,
+          { headers }
+        ),
+      ]);
+
+      if (!ultimaResponse.ok)
+        throw new Error(`Erro HTTP: ${ultimaResponse.status}`);
+      if (!serieResponse.ok)
+        throw new Error(`Erro HTTP: ${serieResponse.status}`);
+
+      const { leituras } = await ultimaResponse.json();
+      const serie = await serieResponse.json();
+
+      // Marca registrada só com as respostas em mãos: após um erro, a próxima busca recarrega tudo
+      if (marca !== null) {
+        sincronizacao.lote = lote;
+        sincronizacao.desdeId = marca;
+      }
 
-      if (readings.length > 0) {
-        updateLastReading(readings[0]);
-        updateCharts([...readings].reverse());
+      if (leituras.length > 0) {
+        updateLastReading({
+          ...leituras[0],
+          data_inicial: leituras[0].data_inicial
+            ? new Date(leituras[0].data_inicial)
+            : null,
+        });
       } else {
         updateLastReading(null);
-        updateCharts([]);
       }
+      updateCharts(serie.series);
     } catch (error) {
       console.error("Erro ao buscar leituras:", error);
       showError(`Erro ao carregar leituras: ${error.message}`);
@@ -594,33 +665,28 @@ function setupDashboardPage() {
   `;
   }
 
-  function updateCharts(readings) {
-    readings.sort(
-      (a, b) => new Date(a.data_inicial) - new Date(b.data_inicial)
-    );
-    const labels = readings.map((r) => formatDate(r.data_inicial, true));
-    const temps = readings.map((r) => r.temperatura);
-    const umids = readings.map((r) => r.umidade);
-    const presses = readings.map((r) => r.pressao);
+  function updateCharts(series) {
+    // Cada série chega ordenada por data como { t: [...], v: [...] }
+    const labels = (serie) => serie.t.map((t) => formatDate(t, true));
 
     updateChart(
       tempChart,
-      labels,
-      temps,
+      labels(series.temperatura),
+      series.temperatura.v,
       "Temperatura (°C)",
       "rgba(255, 99, 132, 0.8)"
     );
     updateChart(
       umidChart,
-      labels,
-      umids,
+      labels(series.umidade),
+      series.umidade.v,
       "Umidade (%)",
       "rgba(54, 162, 235, 0.8)"
     );
     updateChart(
       pressChart,
-      labels,
-      presses,
+      labels(series.pressao),
+      series.pressao.v,
       "Pressão (hPa)",
       "rgba(3, 62, 253, 0.8)"
     );
@@ -673,9 +739,91 @@ function setupDashboardPage() {
   }
 }
 
+// Lê /leituras/stream (text/event-stream) com fetch, pois o EventSource não envia o
+// cabeçalho Authorization; reconecta com Last-Event-ID até o sinal ser abortado
+async function streamReadings(lote, sinal, { onEvent, onStatus }) {
+  const filtroLote = lote ? `?lote=${encodeURIComponent(lote)}` : "";
+  let ultimoId = null;
+
+  while (!sinal.aborted) {
+    try {
+      const headers = {
+        Authorization: `Bearer ${localStorage.getItem("embryotech_token")}`,
+      };
+      if (ultimoId !== null) headers["Last-Event-ID"] = ultimoId;
+
+      const response = await fetch(
+        `${API_BASE_URL}/leituras/stream${filtroLote}`,
+        { headers, signal: sinal }
+      );
+      if (!response.ok) throw new Error(`Erro HTTP: ${response.status}`);
+      onStatus(true);
+
+      const reader = response.body
+        .pipeThrough(new TextDecoderStream())
+        .getReader();
+      let pendente = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        pendente += value;
+
+        let fim;
+        while ((fim = pendente.indexOf("\n\n")) >= 0) {
+          const evento = {};
+          pendente
+            .slice(0, fim)
+            .split("\n")
+            .forEach((linha) => {
+              const separador = linha.indexOf(": ");
+              if (separador > 0)
+                evento[linha.slice(0, separador)] = linha.slice(separador + 2);
+            });
+          pendente = pendente.slice(fim + 2);
+
+          if (evento.id) ultimoId = evento.id;
+          if (evento.data) onEvent(evento.event, JSON.parse(evento.data));
+        }
+      }
+    } catch (error) {
+      if (sinal.aborted) return;
+      console.error("Erro no fluxo de leituras:", error);
+    }
+
+    onStatus(false);
+    await new Promise((resolve) => setTimeout(resolve, 3000));
+  }
+}
+
+// Segue as páginas de /leituras?desde_id= até alcançar as leituras mais recentes
+async function fetchNewReadings(lote, desdeId) {
+  const token = localStorage.getItem("embryotech_token");
+  const filtroLote = lote ? `&lote=${encodeURIComponent(lote)}` : "";
+  let novas = [];
+  let mais = true;
+
+  while (mais) {
+    const response = await fetch(
+      `${API_BASE_URL}/leituras?desde_id=${desdeId}${filtroLote}`,
+      { headers: { Authorization: `Bearer ${token}` } }
+    );
+    if (!response.ok) throw new Error(`Erro HTTP: ${response.status}`);
+
+    const pagina = await response.json();
+    novas = novas.concat(pagina.leituras);
+    desdeId = pagina.desde_id;
+    mais = pagina.mais;
+  }
+
+  return { novas, desdeId };
+}
+
+// Histórico já carregado; ao reabrir o modal só as leituras novas são buscadas
+const historico = { lote: null, desdeId: 0, leituras: [] };
+
 async function fetchHistoryReadings(lote = "") {
   try {
-    const token = localStorage.getItem("embryotech_token");
     const container = document.getElementById("readingsListContainer");
 
     if (!container) {
@@ -685,31 +833,32 @@ async function fetchHistoryReadings(lote = "") {
       return;
     }
 
-    container.innerHTML = "<p>Carregando histórico...</p>";
-
-    const url = lote
-      ? `${API_BASE_URL}/leituras?lote=${encodeURIComponent(lote)}`
-      : `${API_BASE_URL}/leituras`;
-
-    const response = await fetch(url, {
-      headers: { Authorization: `Bearer ${token}` },
-    });
-
-    if (!response.ok) throw new Error("Erro ao carregar histórico");
+    if (historico.lote !== lote) {
+      historico.lote = lote;
+      historico.desdeId = 0;
+      historico.leituras = [];
+      container.innerHTML = "<p>Carregando histórico...</p>";
+    }
 
-    let readings = await response.json();
+    const { novas, desdeId } = await fetchNewReadings(lote, historico.desdeId);
+    if (historico.lote !== lote) return;
 
     // Processamento das datas
-    readings = readings.map((r) => ({
-      ...r,
-      data_inicial: r.data_inicial ? new Date(r.data_inicial) : null,
-      data_final: r.data_final ? new Date(r.data_final) : null,
-    }));
+    const readings = novas
+      .map((r) => ({
+        ...r,
+        data_inicial: r.data_inicial ? new Date(r.data_inicial) : null,
+        data_final: r.data_final ? new Date(r.data_final) : null,
+      }))
+      .concat(historico.leituras);
 
     readings.sort(
       (a, b) => new Date(b.data_inicial) - new Date(a.data_inicial)
     );
 
+    historico.desdeId = desdeId;
+    historico.leituras = readings;
+
     updateReadingsList(readings);
     updateReadingsCount(readings.length);
   } catch (error) {